@@ -0,0 +1,44 @@
+import random
+import timeit
+
+from xiaomi_ndef import batch, tag, xiaomi
+from xiaomi_ndef.mi_connect import MiConnectData
+
+SAMPLES = 5000
+REPEAT = 5
+
+
+def main() -> None:
+    rng = random.Random(0)
+    write_time = [rng.getrandbits(32) for _ in range(SAMPLES)]
+    device_type = [rng.choice((tag.DeviceType.MI_TV, tag.DeviceType.MI_LAPTOP, tag.DeviceType.MI_PHONE)) for _ in range(SAMPLES)]
+    wifi_mac = [rng.randbytes(6) for _ in range(SAMPLES)]
+    bluetooth_mac = [rng.randbytes(6) for _ in range(SAMPLES)]
+    model = [rng.choice(("xiaomi.wifispeaker.x08c", "xiaomi.wifispeaker.l05b", None)) for _ in range(SAMPLES)]
+
+    def circulate_rows() -> None:
+        for row in zip(write_time, device_type, wifi_mac, bluetooth_mac):
+            MiConnectData.from_nfc_payload(xiaomi.new_circulate(*row)[1]).to_bytes()
+
+    def circulate_batch() -> None:
+        batch.encode_circulate_batch(write_time, device_type, wifi_mac, bluetooth_mac)
+
+    def sound_box_rows() -> None:
+        for row in zip(write_time, wifi_mac, bluetooth_mac, model):
+            MiConnectData.from_nfc_payload(xiaomi.new_mi_tap_sound_box(*row)[1]).to_bytes()
+
+    def sound_box_batch() -> None:
+        batch.encode_mi_tap_sound_box_batch(write_time, wifi_mac, bluetooth_mac, model)
+
+    for name, func in (
+            ("circulate rows", circulate_rows),
+            ("circulate batch", circulate_batch),
+            ("sound box rows", sound_box_rows),
+            ("sound box batch", sound_box_batch),
+    ):
+        seconds = min(timeit.repeat(func, number=1, repeat=REPEAT))
+        print(f"{name:>16}: {SAMPLES / seconds / 1000:.1f}k rows/s")
+
+
+if __name__ == "__main__":
+    main()
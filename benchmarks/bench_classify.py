@@ -0,0 +1,47 @@
+import timeit
+
+from xiaomi_ndef import classify, diagnostics, handoff, simulator, tag
+from xiaomi_ndef.mi_connect import get_protobuf_backend
+from xiaomi_ndef.nfc import HandoffNfcProtocol
+
+SAMPLES = 20000
+REPEAT = 5
+
+
+def _classify_decoded(data: bytes) -> classify.Template:
+    payload = diagnostics.decode(data).value
+    if payload is None:
+        return classify.Template.UNKNOWN
+    if payload.protocol == HandoffNfcProtocol:
+        suffix = payload.appData.enum_payloads_map.get(handoff.PayloadKey.ACTION_SUFFIX)
+        return {b"MIRROR": classify.Template.HANDOFF_SCREEN_MIRROR, b"TVCAST": classify.Template.HANDOFF_TV_CAST}.get(
+            suffix, classify.Template.UNKNOWN
+        )
+    action = getattr(payload.appData.records[-1], "action", None)
+    if action == tag.Action.CUSTOM:
+        return classify.Template.CIRCULATE
+    if action == tag.Action.AUTO:
+        return classify.Template.MI_TAP_SOUND_BOX
+    return classify.Template.EMPTY_MI_TAP if action == tag.Action.EMPTY else classify.Template.UNKNOWN
+
+
+def main() -> None:
+    generator = simulator.TrafficGenerator(simulator.TrafficMix(malformed_rate=0.05), seed=0)
+    traffic = [generator.frame()[0] for _ in range(SAMPLES)]
+    print(f"protobuf backend: {get_protobuf_backend().value}")
+
+    def decoded() -> None:
+        for data in traffic:
+            _classify_decoded(data)
+
+    def signatures() -> None:
+        for data in traffic:
+            classify.classify(data)
+
+    for name, func in (("full decode", decoded), ("signatures", signatures)):
+        seconds = min(timeit.repeat(func, number=1, repeat=REPEAT))
+        print(f"{name:>11}: {SAMPLES / seconds / 1000:.1f}k payloads/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+import random
+import zlib
+
+from xiaomi_ndef import compression, handoff, tag, xiaomi
+from xiaomi_ndef.mi_connect import MiConnectData
+
+SAMPLES = 5000
+TRAINING_SAMPLES = 500
+
+
+def _random_mac(rng: random.Random) -> bytes:
+    return rng.randbytes(6)
+
+
+def _payloads(rng: random.Random) -> list[bytes]:
+    builders = (
+        lambda: xiaomi.new_mi_tap_sound_box(rng.getrandbits(32), _random_mac(rng), _random_mac(rng), "xiaomi.wifispeaker.x08c"),
+        lambda: xiaomi.new_circulate(rng.getrandbits(32), tag.DeviceType.MI_TV, _random_mac(rng), _random_mac(rng)),
+        lambda: xiaomi.new_handoff_screen_mirror(handoff.DeviceType.PC, _random_mac(rng).hex(":"), rng.random() < 0.5),
+    )
+    return [MiConnectData.from_nfc_payload(rng.choice(builders)()[1]).to_bytes() for _ in range(SAMPLES)]
+
+
+def main() -> None:
+    rng = random.Random(0)
+    payloads = _payloads(rng)
+    raw_size = sum(len(i) for i in payloads)
+    plain_size = sum(len(zlib.compress(i, 9)) for i in payloads)
+    print(f"records {len(payloads)}, raw {raw_size} bytes, plain zlib ratio {raw_size / plain_size:.2f}")
+    for size in (256, 1024, 4096):
+        codec = compression.DictionaryCodec.train(payloads[:TRAINING_SAMPLES], size)
+        report = compression.measure(codec, payloads)
+        print(
+            f"dictionary {size:>5} bytes: ratio {report.ratio:.2f}, "
+            f"decode {report.records_per_second / 1000:.1f}k records/s, {report.bytes_per_second / 1e6:.1f} MB/s"
+        )
+
+
+if __name__ == "__main__":
+    main()
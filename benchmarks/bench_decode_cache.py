@@ -0,0 +1,52 @@
+import os
+import random
+import tempfile
+import timeit
+
+from xiaomi_ndef import cache, diagnostics, simulator
+from xiaomi_ndef.mi_connect import get_protobuf_backend
+
+SAMPLES = 5000
+DISTINCT_TAGS = 500
+REPEAT = 20
+
+
+def main() -> None:
+    generator = simulator.TrafficGenerator(simulator.TrafficMix(malformed_rate=0.05), seed=0)
+    tags = [generator.frame()[0] for _ in range(DISTINCT_TAGS)]
+    rng = random.Random(0)
+    traffic = [rng.choice(tags) for _ in range(SAMPLES)]
+    print(f"protobuf backend: {get_protobuf_backend().value}")
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "cache.db")
+        with cache.DecodeCache(path) as decode_cache:
+            decode_cache.decode_batch(traffic)
+
+        def cold() -> None:
+            diagnostics.decode_batch(traffic)
+
+        def warm() -> None:
+            # A restarted worker, the connection is opened inside the timed section.
+            with cache.DecodeCache(path) as restarted:
+                restarted.decode_batch(traffic)
+
+        def cold_distinct() -> None:
+            diagnostics.decode_batch(tags)
+
+        def warm_distinct() -> None:
+            # Every tag once, so every hit is served by the persistent layer.
+            with cache.DecodeCache(path, memory_size=0) as restarted:
+                restarted.decode_batch(tags)
+
+        for name, func, count in (
+                ("no cache", cold, SAMPLES),
+                ("warm cache", warm, SAMPLES),
+                ("no cache, distinct", cold_distinct, DISTINCT_TAGS),
+                ("warm disk, distinct", warm_distinct, DISTINCT_TAGS),
+        ):
+            seconds = min(timeit.repeat(func, number=1, repeat=REPEAT))
+            print(f"{name:>19}: {count / seconds / 1000:.1f}k payloads/s")
+
+
+if __name__ == "__main__":
+    main()
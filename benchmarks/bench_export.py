@@ -0,0 +1,41 @@
+import io
+import random
+import timeit
+
+from xiaomi_ndef import export, handoff, tag, xiaomi
+from xiaomi_ndef.mi_connect import MiConnectData
+
+SAMPLES = 2000
+REPEAT = 5
+
+
+def _payloads(rng: random.Random) -> list:
+    builders = (
+        lambda: xiaomi.new_mi_tap_sound_box(rng.getrandbits(32), rng.randbytes(6), rng.randbytes(6), "xiaomi.wifispeaker.x08c"),
+        lambda: xiaomi.new_circulate(rng.getrandbits(32), tag.DeviceType.MI_TV, rng.randbytes(6), rng.randbytes(6)),
+        lambda: xiaomi.new_handoff_screen_mirror(handoff.DeviceType.PC, rng.randbytes(6).hex(":"), rng.random() < 0.5),
+    )
+    return [rng.choice(builders)()[1] for _ in range(SAMPLES)]
+
+
+def main() -> None:
+    payloads = _payloads(random.Random(0))
+    mi_connect_data = [MiConnectData.from_nfc_payload(i) for i in payloads]
+
+    def repr_path() -> None:
+        file = io.StringIO()
+        for data, payload in zip(mi_connect_data, payloads):
+            file.write(repr(data))
+            file.write(repr(payload))
+            file.write("\n")
+
+    def json_lines_path() -> None:
+        export.JsonLinesWriter(io.StringIO()).write_all(payloads)
+
+    for name, func in (("repr", repr_path), ("json lines", json_lines_path)):
+        seconds = min(timeit.repeat(func, number=1, repeat=REPEAT))
+        print(f"{name:>10}: {SAMPLES / seconds / 1000:.1f}k rows/s")
+
+
+if __name__ == "__main__":
+    main()
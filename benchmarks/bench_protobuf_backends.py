@@ -0,0 +1,49 @@
+import os
+import subprocess
+import sys
+import timeit
+
+NUMBER = 20000
+BACKENDS = ("upb", "cpp", "python")
+
+
+def _run_worker() -> None:
+    from xiaomi_ndef import xiaomi, handoff
+    from xiaomi_ndef.mi_connect import MiConnectData, get_protobuf_backend
+
+    requested = os.environ["PROTOCOL_BUFFERS_PYTHON_IMPLEMENTATION"]
+    if get_protobuf_backend().value != requested:
+        print(f"{requested:<8} unavailable (loaded {get_protobuf_backend().value})")
+        return
+
+    payload = xiaomi.new_handoff_screen_mirror(handoff.DeviceType.PC, "00:00:00:00:00:00", True)[1]
+    data = MiConnectData.from_nfc_payload(payload).to_bytes()
+    mi_connect_data = MiConnectData.parse(data)
+
+    cases = (
+        ("parse", lambda: MiConnectData.parse(data)),
+        ("from_nfc_payload", lambda: MiConnectData.from_nfc_payload(payload)),
+        ("__repr__", lambda: repr(mi_connect_data)),
+    )
+    results = []
+    for name, func in cases:
+        elapsed = min(timeit.repeat(func, number=NUMBER, repeat=3))
+        results.append(f"{name} {elapsed / NUMBER * 1e6:8.2f} us")
+    print(f"{requested:<8} " + "  ".join(results))
+
+
+def main() -> None:
+    for backend in BACKENDS:
+        env = dict(os.environ, PROTOCOL_BUFFERS_PYTHON_IMPLEMENTATION=backend)
+        result = subprocess.run([sys.executable, __file__, "--worker"], env=env, capture_output=True, text=True)
+        if result.returncode != 0:
+            print(f"{backend:<8} failed: {result.stderr.strip().splitlines()[-1] if result.stderr else result.returncode}")
+        else:
+            print(result.stdout, end="")
+
+
+if __name__ == "__main__":
+    if "--worker" in sys.argv:
+        _run_worker()
+    else:
+        main()
@@ -0,0 +1,139 @@
+import timeit
+from io import BytesIO
+
+from xiaomi_ndef import tag, handoff, xiaomi
+from xiaomi_ndef._utils import UINT8_BYTES_SIZE, UINT16_BYTES_SIZE, UINT32_BYTES_SIZE
+from xiaomi_ndef._utils import read_uint8, read_uint16, read_uint32, read_bytes, write_uint8, write_uint16, write_uint32
+from xiaomi_ndef.base import UInt8BytesMap, UInt16BytesMap
+
+NUMBER = 20000
+
+
+# Hand-written layouts used before the schema codecs, kept here as the baseline.
+
+def _legacy_record_size(record: tag.NfcTagRecord) -> int:
+    if isinstance(record, tag.NfcTagDeviceRecord):
+        content_size = UINT16_BYTES_SIZE + 2 * UINT8_BYTES_SIZE + record.attributes_map.size()
+    else:
+        content_size = UINT16_BYTES_SIZE + 3 * UINT8_BYTES_SIZE + len(record.condition_parameters or b"")
+    return UINT8_BYTES_SIZE + UINT16_BYTES_SIZE + content_size
+
+
+def _legacy_tag_size(data: tag.NfcTagAppData) -> int:
+    return 4 * UINT8_BYTES_SIZE + UINT32_BYTES_SIZE + sum(_legacy_record_size(i) for i in data.records)
+
+
+def _legacy_tag_encode(data: tag.NfcTagAppData) -> bytes:
+    buffer = BytesIO(bytearray(_legacy_tag_size(data)))
+    write_uint8(buffer, data.major_version)
+    write_uint8(buffer, data.minor_version)
+    write_uint32(buffer, data.write_time)
+    write_uint8(buffer, data.flags)
+    write_uint8(buffer, len(data.records))
+    for record in data.records:
+        write_uint8(buffer, record.tag_type)
+        write_uint16(buffer, _legacy_record_size(record))
+        if isinstance(record, tag.NfcTagDeviceRecord):
+            write_uint16(buffer, record.device_type)
+            write_uint8(buffer, record.flags)
+            write_uint8(buffer, record.device_number)
+            record.attributes_map.encode_into(buffer)
+        else:
+            write_uint16(buffer, record.action)
+            write_uint8(buffer, record.condition)
+            write_uint8(buffer, record.device_number)
+            write_uint8(buffer, record.flags)
+            if record.condition_parameters:
+                buffer.write(record.condition_parameters)
+    return bytes(buffer.getvalue())
+
+
+def _legacy_record_decode(buffer: BytesIO) -> tag.NfcTagRecord:
+    record_type = read_uint8(buffer)
+    content = BytesIO(read_bytes(buffer, read_uint16(buffer) - UINT8_BYTES_SIZE - UINT16_BYTES_SIZE))
+    if record_type == 0x01:
+        return tag.NfcTagDeviceRecord(
+            device_type=read_uint16(content),
+            flags=read_uint8(content),
+            device_number=read_uint8(content),
+            attributes_map=UInt16BytesMap.read_from(BytesIO(content.read()))
+        )
+    return tag.NfcTagActionRecord(
+        action=read_uint16(content),
+        condition=read_uint8(content),
+        device_number=read_uint8(content),
+        flags=read_uint8(content),
+        condition_parameters=content.read()
+    )
+
+
+def _legacy_tag_decode(data: bytes) -> tag.NfcTagAppData:
+    buffer = BytesIO(data)
+    return tag.NfcTagAppData(
+        major_version=read_uint8(buffer),
+        minor_version=read_uint8(buffer),
+        write_time=read_uint32(buffer),
+        flags=read_uint8(buffer),
+        records=tuple(_legacy_record_decode(buffer) for _ in range(read_uint8(buffer)))
+    )
+
+
+def _legacy_handoff_size(data: handoff.HandoffAppData) -> int:
+    return (
+            4 * UINT8_BYTES_SIZE + UINT32_BYTES_SIZE + data.attributes_map.size() +
+            len(data.action.encode("utf-8")) + data.payloads_map.size()
+    )
+
+
+def _legacy_handoff_encode(data: handoff.HandoffAppData) -> bytes:
+    action_bytes = data.action.encode("utf-8")
+    buffer = BytesIO(bytearray(_legacy_handoff_size(data)))
+    write_uint8(buffer, data.major_version)
+    write_uint8(buffer, data.minor_version)
+    write_uint32(buffer, data.device_type)
+    write_uint8(buffer, len(data.attributes_map))
+    data.attributes_map.encode_into(buffer)
+    write_uint8(buffer, len(action_bytes))
+    buffer.write(action_bytes)
+    data.payloads_map.encode_into(buffer)
+    return bytes(buffer.getvalue())
+
+
+def _legacy_handoff_decode(data: bytes) -> handoff.HandoffAppData:
+    buffer = BytesIO(data)
+    return handoff.HandoffAppData(
+        major_version=read_uint8(buffer),
+        minor_version=read_uint8(buffer),
+        device_type=read_uint32(buffer),
+        attributes_map=UInt8BytesMap.read_from(buffer, read_uint8(buffer)),
+        action=read_bytes(buffer, read_uint8(buffer)).decode("utf-8"),
+        payloads_map=UInt8BytesMap.read_from(buffer)
+    )
+
+
+def _report(name: str, legacy, compiled) -> None:
+    legacy_time = min(timeit.repeat(legacy, number=NUMBER, repeat=5))
+    compiled_time = min(timeit.repeat(compiled, number=NUMBER, repeat=5))
+    print(
+        f"{name:<16} legacy {legacy_time / NUMBER * 1e6:7.2f} us  "
+        f"schema {compiled_time / NUMBER * 1e6:7.2f} us  "
+        f"speedup {legacy_time / compiled_time:5.2f}x"
+    )
+
+
+def main() -> None:
+    tag_data = xiaomi.new_mi_tap_sound_box(1684933764, b"\x00" * 6, b"\x00" * 6, "xiaomi.wifispeaker.x08c")[1].appData
+    handoff_data = xiaomi.new_handoff_screen_mirror(handoff.DeviceType.PC, "00:00:00:00:00:00", True)[1].appData
+    tag_bytes = tag_data.encode()
+    handoff_bytes = handoff_data.encode()
+    assert _legacy_tag_encode(tag_data) == tag_bytes
+    assert _legacy_handoff_encode(handoff_data) == handoff_bytes
+
+    _report("tag encode", lambda: _legacy_tag_encode(tag_data), tag_data.encode)
+    _report("tag decode", lambda: _legacy_tag_decode(tag_bytes), lambda: tag.NfcTagAppData.decode(BytesIO(tag_bytes)))
+    _report("handoff encode", lambda: _legacy_handoff_encode(handoff_data), handoff_data.encode)
+    _report("handoff decode", lambda: _legacy_handoff_decode(handoff_bytes), lambda: handoff.HandoffAppData.decode(BytesIO(handoff_bytes)))
+
+
+if __name__ == "__main__":
+    main()
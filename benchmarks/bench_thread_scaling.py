@@ -0,0 +1,48 @@
+import os
+import random
+import sys
+import sysconfig
+import time
+
+from xiaomi_ndef import diagnostics, handoff, tag, xiaomi
+from xiaomi_ndef.mi_connect import MiConnectData
+
+SAMPLES = 20000
+REPEAT = 3
+
+
+def _payloads(rng: random.Random) -> list[bytes]:
+    builders = (
+        lambda: xiaomi.new_mi_tap_sound_box(rng.getrandbits(32), rng.randbytes(6), rng.randbytes(6), "xiaomi.wifispeaker.x08c"),
+        lambda: xiaomi.new_circulate(rng.getrandbits(32), tag.DeviceType.MI_TV, rng.randbytes(6), rng.randbytes(6)),
+        lambda: xiaomi.new_handoff_screen_mirror(handoff.DeviceType.PC, rng.randbytes(6).hex(":"), rng.random() < 0.5),
+    )
+    return [MiConnectData.from_nfc_payload(rng.choice(builders)()[1]).to_bytes() for _ in range(SAMPLES)]
+
+
+def _gil_enabled() -> bool:
+    is_gil_enabled = getattr(sys, "_is_gil_enabled", None)
+    return is_gil_enabled() if is_gil_enabled is not None else True
+
+
+def main() -> None:
+    payloads = _payloads(random.Random(0))
+    free_threaded = bool(sysconfig.get_config_var("Py_GIL_DISABLED"))
+    print(f"python {sys.version.split()[0]}, free-threaded build {free_threaded}, GIL enabled {_gil_enabled()}")
+
+    start = time.perf_counter()
+    diagnostics.decode_batch(payloads)
+    baseline = SAMPLES / (time.perf_counter() - start)
+    print(f"{'sequential':>10}: {baseline / 1000:.1f}k records/s")
+
+    for workers in sorted({1, 2, 4, 8, os.cpu_count() or 1}):
+        best = 0.0
+        for _ in range(REPEAT):
+            start = time.perf_counter()
+            diagnostics.decode_batch_threaded(payloads, max_workers=workers)
+            best = max(best, SAMPLES / (time.perf_counter() - start))
+        print(f"{workers:>3} threads: {best / 1000:.1f}k records/s, {best / baseline:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,4 +3,4 @@ from .handoff import HandoffAppData
 from .mi_connect import MiConnectData
 from .nfc import XiaomiNfcPayload, XiaomiNfcProtocol, V1NfcProtocol, V2NfcProtocol, HandoffNfcProtocol
 from .tnf import XiaomiNdefTNF
-from .tag import NfcTagAppData, NfcTagRecord, NfcTagActionRecord, NfcTagDeviceRecord
+from .tag import NfcTagAppData, NfcTagRecord, NfcTagActionRecord, NfcTagDeviceRecord, NfcTagRawRecord
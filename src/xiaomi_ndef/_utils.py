@@ -1,3 +1,4 @@
+import enum
 from io import BytesIO
 from typing import Literal
 
@@ -5,6 +6,8 @@ UINT8_BYTES_SIZE = 1
 UINT16_BYTES_SIZE = 2
 UINT32_BYTES_SIZE = 4
 
+_HEX_TEXT_PREFIX = "hex:"
+
 
 def write_uint8(buffer: BytesIO, value: int, byteorder: Literal['big', 'little'] = "big") -> int:
     if value > 0xff or value < 0:
@@ -54,3 +57,34 @@ def read_bytes(buffer: BytesIO, size: int, strict: bool = True) -> bytes:
         raise ValueError(f"read bytes failed, read {len(value)} bytes, expected {size} bytes")
     else:
         return value
+
+
+def export_enum(value: enum.Enum, raw_value: int) -> str | int:
+    return raw_value if value.name == "UNKNOWN" else value.name
+
+
+def export_mac(data: bytes) -> str:
+    return data.hex(":").upper()
+
+
+def export_text(data: bytes) -> str:
+    # Text that is not UTF-8, or that would be mistaken for the marker, is exported as marked hex.
+    try:
+        value = data.decode("utf-8")
+    except UnicodeDecodeError:
+        return _HEX_TEXT_PREFIX + data.hex()
+    return _HEX_TEXT_PREFIX + data.hex() if value.startswith(_HEX_TEXT_PREFIX) else value
+
+
+def import_enum(enum_type: type[enum.Enum], value: str | int) -> int:
+    return enum_type[value].value if isinstance(value, str) else value
+
+
+def import_hex(value: str) -> bytes:
+    return bytes.fromhex(value.replace(":", ""))
+
+
+def import_text(value: str) -> bytes:
+    if value.startswith(_HEX_TEXT_PREFIX):
+        return bytes.fromhex(value[len(_HEX_TEXT_PREFIX):])
+    return value.encode("utf-8")
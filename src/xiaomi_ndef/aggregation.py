@@ -0,0 +1,292 @@
+import dataclasses
+import enum
+import math
+from collections import Counter
+from types import MappingProxyType
+from typing import Iterable, Mapping
+
+# noinspection PyPackageRequirements
+from google.protobuf import message
+
+from . import handoff, tag
+from ._utils import export_enum
+from .diagnostics import unwrap_ndef
+from .handoff import _APP_DATA_CODEC as _HANDOFF_APP_DATA_CODEC
+from .mi_connect import MiConnectData
+from .nfc import XiaomiNfcProtocol, V1NfcProtocol, V2NfcProtocol, HandoffNfcProtocol
+from .proto.MiConnectProtocol_pb2 import Container
+from .stream import StreamLayer
+from .tag import _TYPE_DEVICE, _TYPE_ACTION, _RECORD_HEADER, _APP_DATA_CODEC as _TAG_APP_DATA_CODEC
+from .tag import _DEVICE_RECORD_CODEC, _ACTION_RECORD_CODEC
+from .tnf import XiaomiNdefTNF
+
+_TAG_HEADER = _TAG_APP_DATA_CODEC.header
+_HANDOFF_HEADER = _HANDOFF_APP_DATA_CODEC.header
+
+_PROTOCOLS: Mapping[int, XiaomiNfcProtocol] = MappingProxyType({
+    protocol.flags: protocol for protocol in (V1NfcProtocol, V2NfcProtocol, HandoffNfcProtocol)
+})
+
+
+@enum.unique
+class Dimension(enum.Enum):
+    NDEF_TYPE = "ndef_type"
+    PROTOCOL = "protocol"
+    ACTION = "action"
+    TAG_DEVICE_TYPE = "tag_device_type"
+    HANDOFF_DEVICE_TYPE = "handoff_device_type"
+
+
+ALL_DIMENSIONS = frozenset(Dimension)
+_APP_DATA_DIMENSIONS = frozenset((Dimension.ACTION, Dimension.TAG_DEVICE_TYPE, Dimension.HANDOFF_DEVICE_TYPE))
+
+GroupKey = tuple[Dimension, str | int]
+
+
+def _tag_groups(data: bytes, dimensions: frozenset[Dimension]) -> list[GroupKey] | None:
+    if len(data) < _TAG_HEADER.size:
+        return None
+    records_size = _TAG_HEADER.unpack_from(data, 0)[4]
+    groups = []
+    offset = _TAG_HEADER.size
+    for _ in range(records_size):
+        if offset + _RECORD_HEADER.size > len(data):
+            return None
+        record_type, record_size = _RECORD_HEADER.unpack_from(data, offset)
+        content_offset = offset + _RECORD_HEADER.size
+        offset += record_size
+        if record_size < _RECORD_HEADER.size or offset > len(data):
+            return None
+        # Device type and action are the first field of their records, nothing else is read.
+        if record_type == _TYPE_DEVICE and Dimension.TAG_DEVICE_TYPE in dimensions:
+            dimension, enum_type, header = Dimension.TAG_DEVICE_TYPE, tag.DeviceType, _DEVICE_RECORD_CODEC.header
+        elif record_type == _TYPE_ACTION and Dimension.ACTION in dimensions:
+            dimension, enum_type, header = Dimension.ACTION, tag.Action, _ACTION_RECORD_CODEC.header
+        else:
+            continue
+        if content_offset + header.size > offset:
+            return None
+        value = header.unpack_from(data, content_offset)[0]
+        groups.append((dimension, export_enum(enum_type.parse(value), value)))
+    return groups
+
+
+def _handoff_groups(data: bytes, dimensions: frozenset[Dimension]) -> list[GroupKey] | None:
+    if Dimension.HANDOFF_DEVICE_TYPE not in dimensions:
+        return []
+    if len(data) < _HANDOFF_HEADER.size:
+        return None
+    value = _HANDOFF_HEADER.unpack_from(data, 0)[2]
+    return [(Dimension.HANDOFF_DEVICE_TYPE, export_enum(handoff.DeviceType.parse(value), value))]
+
+
+def extract_groups(
+        data: bytes,
+        layer: StreamLayer = StreamLayer.MI_CONNECT,
+        dimensions: Iterable[Dimension] = ALL_DIMENSIONS,
+        ndef_type: XiaomiNdefTNF = XiaomiNdefTNF.MI_CONNECT_SERVICE
+) -> list[GroupKey] | None:
+    dimensions = frozenset(dimensions)
+    if layer == StreamLayer.NDEF:
+        ndef_type, data, error = unwrap_ndef(data)
+        if error is not None:
+            return None
+    elif layer != StreamLayer.MI_CONNECT:
+        raise ValueError(f"Unsupported layer {layer}")
+    try:
+        mi_connect_data = MiConnectData(Container.FromString(data))
+    except (message.DecodeError, UnicodeDecodeError):
+        return None
+    if not mi_connect_data.is_valid_nfc_payload:
+        return None
+    payload = mi_connect_data.container.data
+    protocol = _PROTOCOLS.get(payload.flags[0])
+    if protocol is None:
+        return None
+    groups: list[GroupKey] = []
+    if Dimension.NDEF_TYPE in dimensions:
+        groups.append((Dimension.NDEF_TYPE, ndef_type.name))
+    if Dimension.PROTOCOL in dimensions:
+        groups.append((Dimension.PROTOCOL, repr(protocol)))
+    if dimensions.isdisjoint(_APP_DATA_DIMENSIONS):
+        return groups
+    if protocol == HandoffNfcProtocol:
+        app_groups = _handoff_groups(payload.appsData[0], dimensions)
+    else:
+        app_groups = _tag_groups(payload.appsData[0], dimensions)
+    if app_groups is None:
+        return None
+    groups.extend(app_groups)
+    return groups
+
+
+@dataclasses.dataclass
+class WindowAggregate:
+    start: float
+    end: float
+    total: int = 0
+    invalid: int = 0
+    counts: Counter[GroupKey] = dataclasses.field(default_factory=Counter)
+
+    def merge(self, other: 'WindowAggregate') -> None:
+        if (self.start, self.end) != (other.start, other.end):
+            raise ValueError(f"Window [{other.start}, {other.end}) does not match [{self.start}, {self.end})")
+        self.total += other.total
+        self.invalid += other.invalid
+        self.counts.update(other.counts)
+
+    def to_dict(self) -> dict:
+        groups: dict[str, dict[str, int]] = {}
+        for (dimension, value), count in sorted(self.counts.items(), key=lambda i: (i[0][0].value, str(i[0][1]))):
+            groups.setdefault(dimension.value, {})[str(value)] = count
+        return {"start": self.start, "end": self.end, "total": self.total, "invalid": self.invalid, **groups}
+
+
+@dataclasses.dataclass
+class _Pane:
+    total: int = 0
+    invalid: int = 0
+    counts: Counter[GroupKey] = dataclasses.field(default_factory=Counter)
+
+    def merge(self, other: '_Pane') -> None:
+        self.total += other.total
+        self.invalid += other.invalid
+        self.counts.update(other.counts)
+
+
+# Windows are aligned to multiples of step, not to the first event, so that aggregators fed by different
+# workers produce the same window bounds and can be merged. The first windows of a sliding aggregator
+# therefore start before the first event, e.g. [-7.5, 2.5) for size 10 and step 2.5 with traffic from 0,
+# and only count the traffic from the first event on.
+class WindowedAggregator:
+    def __init__(
+            self,
+            size: float,
+            step: float | None = None,
+            dimensions: Iterable[Dimension] = ALL_DIMENSIONS,
+            layer: StreamLayer = StreamLayer.MI_CONNECT,
+            ndef_type: XiaomiNdefTNF = XiaomiNdefTNF.MI_CONNECT_SERVICE
+    ) -> None:
+        step = size if step is None else step
+        if size <= 0 or step <= 0:
+            raise ValueError("size and step must be positive")
+        panes = size / step
+        if not math.isclose(panes, round(panes)):
+            raise ValueError("size must be a multiple of step")
+        if layer not in (StreamLayer.NDEF, StreamLayer.MI_CONNECT):
+            raise ValueError(f"Unsupported layer {layer}")
+        self.size: float = size
+        self.step: float = step
+        self.dimensions: frozenset[Dimension] = frozenset(dimensions)
+        self.layer: StreamLayer = layer
+        self.ndef_type: XiaomiNdefTNF = ndef_type
+        self.late: int = 0
+        # A window is the union of its panes, so only the panes of one window are kept.
+        self._window_panes = round(panes)
+        self._panes: dict[int, _Pane] = {}
+        self._newest: int | None = None
+        self._closed: list[WindowAggregate] = []
+
+    @property
+    def is_tumbling(self) -> bool:
+        return self._window_panes == 1
+
+    def _pane(self, timestamp: float) -> _Pane | None:
+        index = math.floor(timestamp / self.step)
+        if self._newest is None or index > self._newest:
+            self._advance(index)
+        elif index < self._newest:
+            # Windows ending before the newest pane are closed, an older event would only reach the open ones.
+            self.late += 1
+            return None
+        pane = self._panes.get(index)
+        if pane is None:
+            pane = self._panes[index] = _Pane()
+        return pane
+
+    def _window(self, last_pane: int) -> WindowAggregate:
+        first_pane = last_pane - self._window_panes + 1
+        window = WindowAggregate(start=first_pane * self.step, end=(last_pane + 1) * self.step)
+        for index in range(first_pane, last_pane + 1):
+            pane = self._panes.get(index)
+            if pane is not None:
+                window.total += pane.total
+                window.invalid += pane.invalid
+                window.counts.update(pane.counts)
+        return window
+
+    def _closing(self, index: int) -> list[WindowAggregate]:
+        if self._newest is None or not self._panes:
+            return []
+        # Windows ending in a gap without traffic are skipped, not emitted empty.
+        last = min(index - 1, max(self._panes) + self._window_panes - 1)
+        windows = (self._window(last_pane) for last_pane in range(self._newest, last + 1))
+        return [window for window in windows if window.total > 0]
+
+    def _advance(self, index: int) -> None:
+        self._closed.extend(self._closing(index))
+        self._newest = index
+        for old in [i for i in self._panes if i <= index - self._window_panes]:
+            del self._panes[old]
+
+    def add(self, data: bytes, timestamp: float) -> None:
+        pane = self._pane(timestamp)
+        if pane is None:
+            return
+        groups = extract_groups(data, self.layer, self.dimensions, self.ndef_type)
+        pane.total += 1
+        if groups is None:
+            pane.invalid += 1
+        else:
+            pane.counts.update(groups)
+
+    def add_all(self, items: Iterable[tuple[bytes, float]]) -> None:
+        for data, timestamp in items:
+            self.add(data, timestamp)
+
+    def advance(self, timestamp: float) -> None:
+        index = math.floor(timestamp / self.step)
+        if self._newest is None or index > self._newest:
+            self._advance(index)
+
+    def poll(self) -> list[WindowAggregate]:
+        # Merged aggregators hold one partial window per side, they are combined here.
+        closed, self._closed = self._closed, []
+        return merge_windows(closed)
+
+    def current(self) -> WindowAggregate | None:
+        if self._newest is None:
+            return None
+        return self._window(self._newest)
+
+    def merge(self, other: 'WindowedAggregator') -> None:
+        if (self.size, self.step, self.dimensions) != (other.size, other.step, other.dimensions):
+            raise ValueError("Aggregators with different windows or dimensions can not be merged")
+        if other._newest is None:
+            self.late += other.late
+            return
+        # Both sides close their own windows up to the common time, only the open panes are added together.
+        newest = other._newest if self._newest is None else max(self._newest, other._newest)
+        if self._newest is None or newest > self._newest:
+            self._advance(newest)
+        self._closed.extend(other._closed)
+        self._closed.extend(other._closing(newest))
+        for index, other_pane in other._panes.items():
+            if index <= newest - self._window_panes:
+                continue
+            pane = self._panes.get(index)
+            if pane is None:
+                pane = self._panes[index] = _Pane()
+            pane.merge(other_pane)
+        self.late += other.late
+
+
+def merge_windows(windows: Iterable[WindowAggregate]) -> list[WindowAggregate]:
+    merged: dict[tuple[float, float], WindowAggregate] = {}
+    for window in windows:
+        key = (window.start, window.end)
+        if key in merged:
+            merged[key].merge(window)
+        else:
+            merged[key] = WindowAggregate(window.start, window.end, window.total, window.invalid, Counter(window.counts))
+    return [merged[key] for key in sorted(merged)]
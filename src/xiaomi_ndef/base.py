@@ -1,9 +1,14 @@
 import abc
+import struct
 from collections import OrderedDict
 from io import BytesIO
 
 from ._utils import UINT8_BYTES_SIZE, UINT16_BYTES_SIZE
-from ._utils import read_uint8, read_uint16, read_bytes, write_uint8, write_uint16
+from ._utils import read_uint8, read_uint16, read_bytes
+from .interning import Interner
+
+_UINT8_ENTRY_HEADER = struct.Struct(">BB")
+_UINT16_ENTRY_HEADER = struct.Struct(">HH")
 
 
 class BinaryData(abc.ABC):
@@ -38,21 +43,27 @@ class UInt8BytesMap(OrderedDict[int, bytes], BinaryData):
             raise ValueError("value length must be in (0, 0xff]")
         super().__setitem__(__key, __value)
 
+    def __reduce_ex__(self, protocol):
+        # A zero key ends the encoded map, fall back to the default reduction.
+        if 0 in self:
+            return super().__reduce_ex__(protocol)
+        return _decode_uint8_bytes_map, (self.encode(),)
+
     def size(self) -> int:
         return sum(2 * UINT8_BYTES_SIZE + len(b) for b in self.values())
 
     def encode_into(self, buffer: BytesIO) -> None:
         for key, value in self.items():
-            write_uint8(buffer, key)
-            write_uint8(buffer, len(value))
+            buffer.write(_UINT8_ENTRY_HEADER.pack(key, len(value)))
             buffer.write(value)
 
     @staticmethod
-    def read_from(buffer: BytesIO, length: int | None = None) -> 'UInt8BytesMap':
+    def read_from(buffer: BytesIO, length: int | None = None, interner: Interner | None = None) -> 'UInt8BytesMap':
         bytes_map = UInt8BytesMap()
         i = 0
         while (length is None or i < length) and (key := read_uint8(buffer, False)):
-            bytes_map[key] = read_bytes(buffer, read_uint8(buffer))
+            value = read_bytes(buffer, read_uint8(buffer))
+            bytes_map[key] = interner.intern(value) if interner is not None else value
             i += 1
         return bytes_map
 
@@ -69,20 +80,34 @@ class UInt16BytesMap(OrderedDict[int, bytes], BinaryData):
             raise ValueError("value length must be in (0, 0xffff]")
         super().__setitem__(__key, __value)
 
+    def __reduce_ex__(self, protocol):
+        # A zero key ends the encoded map, fall back to the default reduction.
+        if 0 in self:
+            return super().__reduce_ex__(protocol)
+        return _decode_uint16_bytes_map, (self.encode(),)
+
     def size(self) -> int:
         return sum(2 * UINT16_BYTES_SIZE + len(b) for b in self.values())
 
     def encode_into(self, buffer: BytesIO) -> None:
         for key, value in self.items():
-            write_uint16(buffer, key)
-            write_uint16(buffer, len(value))
+            buffer.write(_UINT16_ENTRY_HEADER.pack(key, len(value)))
             buffer.write(value)
 
     @staticmethod
-    def read_from(buffer: BytesIO, length: int | None = None) -> 'UInt16BytesMap':
+    def read_from(buffer: BytesIO, length: int | None = None, interner: Interner | None = None) -> 'UInt16BytesMap':
         bytes_map = UInt16BytesMap()
         i = 0
         while (length is None or i < length) and (key := read_uint16(buffer, False)):
-            bytes_map[key] = read_bytes(buffer, read_uint16(buffer))
+            value = read_bytes(buffer, read_uint16(buffer))
+            bytes_map[key] = interner.intern(value) if interner is not None else value
             i += 1
         return bytes_map
+
+
+def _decode_uint8_bytes_map(data: bytes) -> UInt8BytesMap:
+    return UInt8BytesMap.read_from(BytesIO(data))
+
+
+def _decode_uint16_bytes_map(data: bytes) -> UInt16BytesMap:
+    return UInt16BytesMap.read_from(BytesIO(data))
@@ -0,0 +1,272 @@
+import array
+import dataclasses
+import functools
+import struct
+from typing import Any, Iterator, Sequence
+
+from .mi_connect import _PAYLOAD_NAME, _PAYLOAD_APP_ID, _PAYLOAD_DEVICE_TYPE
+from .ndef import encode_xiaomi_ndef_record
+from .nfc import XiaomiNfcProtocol, V1NfcProtocol, V2NfcProtocol
+from .proto.MiConnectProtocol_pb2 import Container, Payload
+from .tag import Action, Condition, DeviceAttribute, DeviceType, _TYPE_DEVICE, _TYPE_ACTION, _RECORD_HEADER
+from .tag import _APP_DATA_CODEC, _DEVICE_RECORD_CODEC, _ACTION_RECORD_CODEC
+from .tnf import XiaomiNdefTNF
+
+_WIRE_VARINT = 0
+_WIRE_LENGTH_DELIMITED = 2
+
+_CONTAINER_DATA = Container.DESCRIPTOR.fields_by_name["data"].number
+_PAYLOAD_VERSION_MAJOR = Payload.DESCRIPTOR.fields_by_name["versionMajor"].number
+_PAYLOAD_VERSION_MINOR = Payload.DESCRIPTOR.fields_by_name["versionMinor"].number
+_PAYLOAD_FLAGS = Payload.DESCRIPTOR.fields_by_name["flags"].number
+_PAYLOAD_NAME_FIELD = Payload.DESCRIPTOR.fields_by_name["name"].number
+_PAYLOAD_ID_HASH = Payload.DESCRIPTOR.fields_by_name["idHash"].number
+_PAYLOAD_DEVICE_TYPE_FIELD = Payload.DESCRIPTOR.fields_by_name["deviceType"].number
+_PAYLOAD_APPS_DATA = Payload.DESCRIPTOR.fields_by_name["appsData"].number
+_PAYLOAD_APP_IDS = Payload.DESCRIPTOR.fields_by_name["appIds"].number
+
+_TAG_HEADER_SIZE = _APP_DATA_CODEC.header.size
+_DEVICE_HEADER_SIZE = _DEVICE_RECORD_CODEC.header.size
+_ATTRIBUTE_HEADER_SIZE = 4
+_ACTION_RECORD_SIZE = _RECORD_HEADER.size + _ACTION_RECORD_CODEC.header.size
+
+_MAJOR_VERSION = 1
+_TAG_MAJOR_VERSION = 1
+_TAG_MINOR_VERSION = 0
+_ID_HASH = 0
+
+
+def _varint(value: int) -> bytes:
+    data = bytearray()
+    while value > 0x7f:
+        data.append((value & 0x7f) | 0x80)
+        value >>= 7
+    data.append(value)
+    return bytes(data)
+
+
+def _key(field_number: int, wire_type: int) -> bytes:
+    return _varint(field_number << 3 | wire_type)
+
+
+def _length_delimited(field_number: int, data: bytes) -> bytes:
+    return _key(field_number, _WIRE_LENGTH_DELIMITED) + _varint(len(data)) + data
+
+
+def _varint_field(field_number: int, value: int) -> bytes:
+    # proto3 leaves out scalar fields with the default value.
+    return _key(field_number, _WIRE_VARINT) + _varint(value) if value else b""
+
+
+@dataclasses.dataclass(frozen=True)
+class EncodedBatch:
+    data: bytes
+    offsets: array.array
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i: int) -> bytes:
+        if not -len(self) <= i < len(self):
+            raise IndexError("batch index out of range")
+        i %= len(self)
+        return self.data[self.offsets[i]:self.offsets[i + 1]]
+
+    def __iter__(self) -> Iterator[bytes]:
+        data = memoryview(self.data)
+        for start, end in zip(self.offsets, self.offsets[1:]):
+            yield bytes(data[start:end])
+
+
+@dataclasses.dataclass(frozen=True)
+class _RowLayout:
+    packer: struct.Struct
+    # Constant pieces in packing order, variable values go in between.
+    constants: tuple[bytes, ...]
+
+
+@functools.lru_cache(maxsize=256)
+def _row_layout(
+        protocol: XiaomiNfcProtocol,
+        minor_version: int,
+        action: int,
+        attribute_keys: tuple[int, ...],
+        value_sizes: tuple[int, ...],
+        ndef_type: XiaomiNdefTNF | None
+) -> _RowLayout:
+    device_record_size = _RECORD_HEADER.size + _DEVICE_HEADER_SIZE + sum(_ATTRIBUTE_HEADER_SIZE + i for i in value_sizes)
+    app_data_size = _TAG_HEADER_SIZE + device_record_size + _ACTION_RECORD_SIZE
+    payload_head = b"".join((
+        _varint_field(_PAYLOAD_VERSION_MAJOR, _MAJOR_VERSION),
+        _varint_field(_PAYLOAD_VERSION_MINOR, minor_version),
+        _length_delimited(_PAYLOAD_FLAGS, bytes((protocol.flags,))),
+        _length_delimited(_PAYLOAD_NAME_FIELD, _PAYLOAD_NAME.encode("utf-8")),
+        _length_delimited(_PAYLOAD_ID_HASH, bytes((_ID_HASH,))),
+        _varint_field(_PAYLOAD_DEVICE_TYPE_FIELD, _PAYLOAD_DEVICE_TYPE),
+        _key(_PAYLOAD_APPS_DATA, _WIRE_LENGTH_DELIMITED),
+        _varint(app_data_size),
+    ))
+    payload_tail = _length_delimited(_PAYLOAD_APP_IDS, _varint(_PAYLOAD_APP_ID))
+    payload_size = len(payload_head) + app_data_size + len(payload_tail)
+    container_head = _key(_CONTAINER_DATA, _WIRE_LENGTH_DELIMITED) + _varint(payload_size)
+    if ndef_type is not None:
+        container_size = len(container_head) + payload_size
+        record = encode_xiaomi_ndef_record(ndef_type, bytes(container_size))
+        container_head = record[:len(record) - container_size] + container_head
+
+    # write_time and device_type are the only variable integers, attribute values are the only variable bytes.
+    head = b"".join((
+        container_head,
+        payload_head,
+        struct.pack(">BB", _TAG_MAJOR_VERSION, _TAG_MINOR_VERSION),
+    ))
+    middle = b"".join((
+        struct.pack(">BB", 0, 2),  # flags, records
+        _RECORD_HEADER.pack(_TYPE_DEVICE, device_record_size),
+    ))
+    device_tail = bytes(2)  # flags, device_number
+    action_record = struct.pack(">BHHBBB", _TYPE_ACTION, _ACTION_RECORD_SIZE, action, Condition.AUTO, 0, 0) + payload_tail
+    attribute_headers = tuple(struct.pack(">HH", key, size) for key, size in zip(attribute_keys, value_sizes))
+
+    formats = [f"{len(head)}sI{len(middle)}sH{len(device_tail)}s"]
+    constants = [head, middle, device_tail]
+    for attribute_header, size in zip(attribute_headers, value_sizes):
+        formats.append(f"{_ATTRIBUTE_HEADER_SIZE}s{size}s")
+        constants.append(attribute_header)
+    formats.append(f"{len(action_record)}s")
+    constants.append(action_record)
+    return _RowLayout(struct.Struct(">" + "".join(formats)), tuple(constants))
+
+
+def _column(values: Any, name: str, size: int | None) -> Sequence:
+    # NumPy arrays and other array likes are converted once instead of per element.
+    # Fixed width bytes arrays strip trailing NULs on conversion, which would silently change MACs and other values.
+    if getattr(getattr(values, "dtype", None), "kind", None) == "S":
+        raise ValueError(f"Column {name} has a fixed width bytes dtype, use an object array or a 2-D uint8 array instead")
+    if hasattr(values, "tolist"):
+        values = values.tolist()
+    if size is not None and len(values) != size:
+        raise ValueError(f"Column {name} has {len(values)} rows, expected {size}")
+    return values
+
+
+def _attribute_value(value: Any) -> bytes:
+    if isinstance(value, bytes):
+        return value
+    elif isinstance(value, str):
+        return value.encode("utf-8")
+    elif isinstance(value, (bytearray, memoryview, list, tuple)):
+        return bytes(value)
+    else:
+        raise ValueError("value must be str or bytes")
+
+
+def _encode_rows(
+        protocol: XiaomiNfcProtocol,
+        minor_version: int,
+        action: int,
+        write_times: Sequence[int],
+        device_types: Sequence[int],
+        attribute_keys: Sequence[int],
+        attribute_columns: Sequence[Sequence[Any]],
+        ndef_type: XiaomiNdefTNF | None
+) -> EncodedBatch:
+    try:
+        return _pack_rows(protocol, minor_version, action, write_times, device_types, attribute_keys, attribute_columns, ndef_type)
+    except struct.error as e:
+        raise ValueError(f"value out of range: {e}") from e
+
+
+def _pack_rows(
+        protocol: XiaomiNfcProtocol,
+        minor_version: int,
+        action: int,
+        write_times: Sequence[int],
+        device_types: Sequence[int],
+        attribute_keys: Sequence[int],
+        attribute_columns: Sequence[Sequence[Any]],
+        ndef_type: XiaomiNdefTNF | None
+) -> EncodedBatch:
+    rows = []
+    offsets = array.array("Q", [0])
+    total = 0
+    for i in range(len(write_times)):
+        keys = []
+        values = []
+        for key, column in zip(attribute_keys, attribute_columns):
+            value = column[i]
+            if value is not None:
+                keys.append(key)
+                values.append(_attribute_value(value))
+        layout = _row_layout(protocol, minor_version, action, tuple(keys), tuple(len(i) for i in values), ndef_type)
+        rows.append((layout, values))
+        total += layout.packer.size
+        offsets.append(total)
+
+    data = bytearray(total)
+    for i, (layout, values) in enumerate(rows):
+        constants = layout.constants
+        arguments = [constants[0], write_times[i], constants[1], device_types[i], constants[2]]
+        for constant, value in zip(constants[3:], values):
+            arguments.append(constant)
+            arguments.append(value)
+        arguments.append(constants[-1])
+        layout.packer.pack_into(data, offsets[i], *arguments)
+    return EncodedBatch(bytes(data), offsets)
+
+
+def encode_circulate_batch(
+        write_time: Sequence[int],
+        device_type: Sequence[DeviceType | int],
+        wifi_mac: Sequence[bytes | str],
+        bluetooth_mac: Sequence[bytes | str],
+        ndef: bool = False
+) -> EncodedBatch:
+    write_time = _column(write_time, "write_time", None)
+    size = len(write_time)
+    wifi_mac = _column(wifi_mac, "wifi_mac", size)
+    bluetooth_mac = _column(bluetooth_mac, "bluetooth_mac", size)
+    if None in wifi_mac or None in bluetooth_mac:
+        raise ValueError("wifi_mac and bluetooth_mac are required")
+    return _encode_rows(
+        protocol=V2NfcProtocol,
+        minor_version=11,
+        action=Action.CUSTOM,
+        write_times=write_time,
+        device_types=_column(device_type, "device_type", size),
+        attribute_keys=(DeviceAttribute.WIFI_MAC_ADDRESS.attribute_value, DeviceAttribute.BLUETOOTH_MAC_ADDRESS.attribute_value),
+        attribute_columns=(wifi_mac, bluetooth_mac),
+        ndef_type=XiaomiNdefTNF.MI_CONNECT_SERVICE if ndef else None,
+    )
+
+
+def encode_mi_tap_sound_box_batch(
+        write_time: Sequence[int],
+        wifi_mac: Sequence[bytes | str | None] | None,
+        bluetooth_mac: Sequence[bytes | str],
+        model: Sequence[str | None] | None,
+        ndef: bool = False
+) -> EncodedBatch:
+    write_time = _column(write_time, "write_time", None)
+    size = len(write_time)
+    bluetooth_mac = _column(bluetooth_mac, "bluetooth_mac", size)
+    if None in bluetooth_mac:
+        raise ValueError("bluetooth_mac is required")
+    return _encode_rows(
+        protocol=V1NfcProtocol,
+        minor_version=2,
+        action=Action.AUTO,
+        write_times=write_time,
+        device_types=(DeviceType.MI_SOUND_BOX,) * size,
+        attribute_keys=(
+            DeviceAttribute.BLUETOOTH_MAC_ADDRESS.attribute_value,
+            DeviceAttribute.WIFI_MAC_ADDRESS.attribute_value,
+            DeviceAttribute.MODEL.attribute_value,
+        ),
+        attribute_columns=(
+            bluetooth_mac,
+            _column(wifi_mac, "wifi_mac", size) if wifi_mac is not None else (None,) * size,
+            _column(model, "model", size) if model is not None else (None,) * size,
+        ),
+        ndef_type=XiaomiNdefTNF.MI_CONNECT_SERVICE if ndef else None,
+    )
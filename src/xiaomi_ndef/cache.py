@@ -0,0 +1,419 @@
+import contextlib
+import dataclasses
+import hashlib
+import marshal
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Iterable, Iterator
+
+from . import diagnostics
+from .diagnostics import DecodeError, DecodeErrorKind, DecodeResult, DecodeSummary
+from .base import AppData, UInt8BytesMap, UInt16BytesMap
+from .handoff import HandoffAppData
+from .interning import Interner
+from .nfc import XiaomiNfcPayload, XiaomiNfcProtocol
+from .tag import NfcTagAppData, NfcTagRecord, NfcTagDeviceRecord, NfcTagActionRecord, NfcTagRawRecord
+
+_DIGEST_SIZE = 16
+_FORMAT_VERSION = 3
+_MARSHAL_VERSION = 4
+_DEFAULT_MAX_BYTES = 64 << 20
+_EVICT_RATIO = 0.9
+_TOUCH_BATCH_SIZE = 256
+_TOUCH_INTERVAL = 60 * 10 ** 9
+
+_MARK_ERROR = 0
+_MARK_PAYLOAD = 1
+_APP_DATA_TAG = 0
+_APP_DATA_HANDOFF = 1
+_RECORD_RAW = 0
+_RECORD_DEVICE = 1
+_RECORD_ACTION = 2
+_GET_BATCH_SIZE = 500
+_DEFAULT_MEMORY_SIZE = 4096
+
+# Sizes are kept by triggers so that every process sees the same total without scanning the table.
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key BLOB PRIMARY KEY,
+    value BLOB NOT NULL,
+    used INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS entries_used ON entries (used);
+CREATE TABLE IF NOT EXISTS meta (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO meta VALUES ('size', 0);
+INSERT OR IGNORE INTO meta VALUES ('format', {format});
+CREATE TRIGGER IF NOT EXISTS entries_insert AFTER INSERT ON entries BEGIN
+    UPDATE meta SET value = value + length(NEW.key) + length(NEW.value) WHERE name = 'size';
+END;
+CREATE TRIGGER IF NOT EXISTS entries_delete AFTER DELETE ON entries BEGIN
+    UPDATE meta SET value = value - length(OLD.key) - length(OLD.value) WHERE name = 'size';
+END;
+""".format(format=_FORMAT_VERSION)
+
+
+@dataclasses.dataclass(frozen=True)
+class CacheStats:
+    hits: int
+    memory_hits: int
+    misses: int
+    stores: int
+    evictions: int
+    entries: int
+    size_bytes: int
+
+    @property
+    def lookups(self) -> int:
+        return self.hits + self.misses
+
+    @property
+    def hit_rate(self) -> float:
+        return self.hits / self.lookups if self.lookups > 0 else 0.0
+
+
+def cache_key(data: bytes) -> bytes:
+    return hashlib.blake2b(data, digest_size=_DIGEST_SIZE).digest()
+
+
+def _record_fields(record: NfcTagRecord) -> tuple:
+    # Builders pass enum members as values, marshal only takes plain ints.
+    if isinstance(record, NfcTagDeviceRecord):
+        return _RECORD_DEVICE, int(record.device_type), record.flags, record.device_number, tuple(record.attributes_map.items())
+    elif isinstance(record, NfcTagActionRecord):
+        return _RECORD_ACTION, int(record.action), int(record.condition), record.device_number, record.flags, record.condition_parameters
+    else:
+        return _RECORD_RAW, record.tag_type, record.content
+
+
+def _app_data_fields(app_data: AppData) -> tuple:
+    if isinstance(app_data, NfcTagAppData):
+        return (
+            _APP_DATA_TAG, app_data.major_version, app_data.minor_version, app_data.write_time, app_data.flags,
+            tuple(_record_fields(record) for record in app_data.records)
+        )
+    elif isinstance(app_data, HandoffAppData):
+        return (
+            _APP_DATA_HANDOFF, app_data.major_version, app_data.minor_version, int(app_data.device_type),
+            tuple(app_data.attributes_map.items()), app_data.action, tuple(app_data.payloads_map.items())
+        )
+    else:
+        raise ValueError(f"Unsupported app data type: {type(app_data)}")
+
+
+def _bytes_map(map_type: type, items: tuple[tuple[int, bytes], ...], interner: Interner | None) -> Any:
+    # Entries were validated by the map when they were stored, skip the per item checks of __setitem__.
+    bytes_map = map_type()
+    set_item = OrderedDict.__setitem__
+    if interner is None:
+        for key, value in items:
+            set_item(bytes_map, key, value)
+    else:
+        for key, value in items:
+            set_item(bytes_map, key, interner.intern(value))
+    return bytes_map
+
+
+def _build_record(fields: tuple, interner: Interner | None) -> NfcTagRecord:
+    if fields[0] == _RECORD_DEVICE:
+        _, device_type, flags, device_number, attributes = fields
+        return NfcTagDeviceRecord(
+            device_type=device_type,
+            flags=flags,
+            device_number=device_number,
+            attributes_map=_bytes_map(UInt16BytesMap, attributes, interner),
+        )
+    elif fields[0] == _RECORD_ACTION:
+        _, action, condition, device_number, flags, condition_parameters = fields
+        return NfcTagActionRecord(
+            action=action,
+            condition=condition,
+            device_number=device_number,
+            flags=flags,
+            condition_parameters=condition_parameters,
+        )
+    else:
+        return NfcTagRawRecord(tag_type=fields[1], content=fields[2])
+
+
+def _build_app_data(fields: tuple, interner: Interner | None) -> AppData:
+    if fields[0] == _APP_DATA_TAG:
+        _, major_version, minor_version, write_time, flags, records = fields
+        return NfcTagAppData(
+            major_version=major_version,
+            minor_version=minor_version,
+            write_time=write_time,
+            flags=flags,
+            records=tuple(_build_record(record, interner) for record in records),
+        )
+    _, major_version, minor_version, device_type, attributes, action, payloads = fields
+    return HandoffAppData(
+        major_version=major_version,
+        minor_version=minor_version,
+        device_type=device_type,
+        attributes_map=_bytes_map(UInt8BytesMap, attributes, interner),
+        action=interner.intern(action) if interner is not None else action,
+        payloads_map=_bytes_map(UInt8BytesMap, payloads, interner),
+    )
+
+
+def serialize_result(result: DecodeResult[XiaomiNfcPayload]) -> bytes:
+    # Entries hold the decoded fields, a hit rebuilds the dataclasses without running the binary codecs again.
+    if result.error is not None:
+        fields = (_MARK_ERROR, result.error.kind.value, result.error.offset, result.error.message)
+    else:
+        payload = result.value
+        fields = (
+            _MARK_PAYLOAD, payload.protocol.flags, payload.major_version, payload.minor_version, payload.id_hash,
+            result.unknown_records, _app_data_fields(payload.appData)
+        )
+    return marshal.dumps(fields, _MARSHAL_VERSION)
+
+
+def deserialize_result(data: bytes, interner: Interner | None = None) -> DecodeResult[XiaomiNfcPayload]:
+    try:
+        fields = marshal.loads(data)
+    except (EOFError, ValueError, TypeError) as e:
+        raise ValueError(f"Corrupted cache entry: {e}") from e
+    if fields[0] == _MARK_ERROR:
+        _, kind, offset, message = fields
+        return DecodeResult(value=None, error=DecodeError(DecodeErrorKind(kind), offset, message))
+    _, flags, major_version, minor_version, id_hash, unknown_records, app_data = fields
+    return DecodeResult(
+        value=XiaomiNfcPayload(
+            major_version=major_version,
+            minor_version=minor_version,
+            id_hash=id_hash,
+            protocol=XiaomiNfcProtocol.parse(flags),
+            appData=_build_app_data(app_data, interner),
+        ),
+        unknown_records=unknown_records,
+    )
+
+
+class DecodeCache:
+    def __init__(
+            self,
+            path: str | os.PathLike,
+            max_bytes: int = _DEFAULT_MAX_BYTES,
+            memory_size: int = _DEFAULT_MEMORY_SIZE,
+            timeout: float = 30.0
+    ) -> None:
+        if max_bytes <= 0:
+            raise ValueError("max_bytes must be positive")
+        if memory_size < 0:
+            raise ValueError("memory_size must not be negative")
+        self.path = path
+        self.max_bytes: int = max_bytes
+        self.memory_size: int = memory_size
+        self.memory_hits: int = 0
+        self.hits: int = 0
+        self.misses: int = 0
+        self.stores: int = 0
+        self.evictions: int = 0
+        self._lock = threading.Lock()
+        self._touched: set[bytes] = set()
+        # Decoded results of the hottest tags are also kept in process, keyed by the raw bytes.
+        self._memory: OrderedDict[bytes, DecodeResult[XiaomiNfcPayload]] = OrderedDict()
+        # Every process has its own connection, WAL lets readers run while another process writes.
+        self._connection = sqlite3.connect(path, timeout=timeout, isolation_level=None, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.executescript(_SCHEMA)
+        with self._transaction():
+            version, = self._connection.execute("SELECT value FROM meta WHERE name = 'format'").fetchone()
+            if version != _FORMAT_VERSION:
+                self._connection.execute("DELETE FROM entries")
+                self._connection.execute("UPDATE meta SET value = ? WHERE name = 'format'", (_FORMAT_VERSION,))
+
+    @contextlib.contextmanager
+    def _transaction(self) -> Iterator[None]:
+        with self._lock:
+            self._connection.execute("BEGIN IMMEDIATE")
+            try:
+                yield
+            except BaseException:
+                self._connection.execute("ROLLBACK")
+                raise
+            self._connection.execute("COMMIT")
+
+    def _flush_touched(self) -> None:
+        # Hits only bump the usage time in batches, a write per lookup would serialize the readers.
+        touched, self._touched = self._touched, set()
+        now = time.time_ns()
+        self._connection.executemany("UPDATE entries SET used = ? WHERE key = ?", ((now, key) for key in touched))
+
+    def _evict(self) -> None:
+        size, = self._connection.execute("SELECT value FROM meta WHERE name = 'size'").fetchone()
+        if size <= self.max_bytes:
+            return
+        target = int(self.max_bytes * _EVICT_RATIO)
+        freed = 0
+        keys = []
+        for key, entry_size in self._connection.execute("SELECT key, length(key) + length(value) FROM entries ORDER BY used"):
+            keys.append((key,))
+            freed += entry_size
+            if size - freed <= target:
+                break
+        self._connection.executemany("DELETE FROM entries WHERE key = ?", keys)
+        self.evictions += len(keys)
+
+    def _count(self, hit: bool) -> None:
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+
+    def _lookup(self, keys: list[bytes]) -> dict[bytes, bytes]:
+        stale = time.time_ns() - _TOUCH_INTERVAL
+        with self._lock:
+            found = {}
+            for key, value, used in self._connection.execute(
+                    f"SELECT key, value, used FROM entries WHERE key IN ({', '.join('?' * len(keys))})", keys
+            ):
+                found[key] = value
+                # Eviction order only needs to be approximate, recently used entries are not written again.
+                if used < stale:
+                    self._touched.add(key)
+            flush = len(self._touched) >= _TOUCH_BATCH_SIZE
+        if flush:
+            with self._transaction():
+                self._flush_touched()
+        return found
+
+    def _remember(self, data: bytes, result: DecodeResult[XiaomiNfcPayload]) -> None:
+        if self.memory_size == 0:
+            return
+        with self._lock:
+            self._memory[data] = result
+            if len(self._memory) > self.memory_size:
+                self._memory.popitem(last=False)
+
+    def _recall(self, data: bytes) -> DecodeResult[XiaomiNfcPayload] | None:
+        with self._lock:
+            result = self._memory.get(data)
+            if result is not None:
+                self._memory.move_to_end(data)
+                self.hits += 1
+                self.memory_hits += 1
+        return result
+
+    def get(self, data: bytes, interner: Interner | None = None) -> DecodeResult[XiaomiNfcPayload] | None:
+        data = bytes(data)
+        result = self._recall(data)
+        if result is not None:
+            return result
+        key = cache_key(data)
+        value = self._lookup([key]).get(key)
+        self._count(value is not None)
+        if value is None:
+            return None
+        result = deserialize_result(value, interner)
+        self._remember(data, result)
+        return result
+
+    def put_many(self, items: Iterable[tuple[bytes, DecodeResult[XiaomiNfcPayload]]]) -> None:
+        now = time.time_ns()
+        rows = []
+        for data, result in items:
+            try:
+                value = serialize_result(result)
+            except ValueError:
+                # Results the entry format can't hold are decoded again next time instead of failing the caller.
+                continue
+            rows.append((cache_key(data), value, now))
+        with self._transaction():
+            self._connection.executemany("INSERT INTO entries VALUES (?, ?, ?) ON CONFLICT (key) DO NOTHING", rows)
+            self.stores += len(rows)
+            self._flush_touched()
+            self._evict()
+
+    def put(self, data: bytes, result: DecodeResult[XiaomiNfcPayload]) -> None:
+        self.put_many(((data, result),))
+
+    def decode(self, data: bytes, interner: Interner | None = None) -> DecodeResult[XiaomiNfcPayload]:
+        result = self.get(data, interner)
+        if result is None:
+            result = diagnostics.decode(data, interner)
+            self.put(data, result)
+            self._remember(bytes(data), result)
+        return result
+
+    def decode_batch(
+            self, items: Iterable[bytes], interner: Interner | None = None
+    ) -> tuple[list[DecodeResult[XiaomiNfcPayload]], DecodeSummary]:
+        results: list[DecodeResult[XiaomiNfcPayload] | None] = []
+        pending: list[tuple[int, bytes]] = []
+        for data in items:
+            data = bytes(data)
+            result = self._recall(data)
+            if result is None:
+                pending.append((len(results), data))
+            results.append(result)
+        missed = []
+        # Repeated payloads within the batch are decoded once.
+        decoded: dict[bytes, DecodeResult[XiaomiNfcPayload]] = {}
+        for start in range(0, len(pending), _GET_BATCH_SIZE):
+            chunk = pending[start:start + _GET_BATCH_SIZE]
+            keys = [cache_key(data) for _, data in chunk]
+            found = self._lookup(list(set(keys).difference(decoded)))
+            for (i, data), key in zip(chunk, keys):
+                result = decoded.get(key)
+                if result is not None:
+                    self.hits += 1
+                    self.memory_hits += 1
+                    results[i] = result
+                    continue
+                value = found.get(key)
+                self._count(value is not None)
+                if value is None:
+                    result = diagnostics.decode(data, interner)
+                    missed.append((data, result))
+                else:
+                    result = deserialize_result(value, interner)
+                self._remember(data, result)
+                decoded[key] = results[i] = result
+        # Misses of a batch are stored in one transaction.
+        if missed:
+            self.put_many(missed)
+        summary = DecodeSummary()
+        for result in results:
+            summary.add(result)
+        return results, summary
+
+    def stats(self) -> CacheStats:
+        with self._lock:
+            entries, = self._connection.execute("SELECT count(*) FROM entries").fetchone()
+            size, = self._connection.execute("SELECT value FROM meta WHERE name = 'size'").fetchone()
+        return CacheStats(
+            hits=self.hits,
+            memory_hits=self.memory_hits,
+            misses=self.misses,
+            stores=self.stores,
+            evictions=self.evictions,
+            entries=entries,
+            size_bytes=size,
+        )
+
+    def clear(self) -> None:
+        with self._transaction():
+            self._touched.clear()
+            self._memory.clear()
+            self._connection.execute("DELETE FROM entries")
+
+    def close(self) -> None:
+        if self._touched:
+            with self._transaction():
+                self._flush_touched()
+        self._connection.close()
+
+    def __enter__(self) -> 'DecodeCache':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
@@ -0,0 +1,296 @@
+import dataclasses
+import enum
+import struct
+from types import MappingProxyType
+from typing import Mapping
+
+from pyndef import NdefTNF
+
+from . import handoff, tag, xiaomi
+from .mi_connect import MiConnectData
+from .ndef import _read_record_header, _XIAOMI_RECORD_TYPES
+from .nfc import XiaomiNfcPayload
+from .proto.MiConnectProtocol_pb2 import Payload
+from .stream import StreamLayer
+from .tag import _TYPE_DEVICE
+from .tnf import XiaomiNdefTNF
+
+_CONTAINER_KEY = 0x0a
+_APPS_DATA_KEY = 0x4a
+
+# major and minor version lead both tag and handoff app data
+_VERSION_SIZE = 2
+_TAG_FLAGS_OFFSET = 6
+_TAG_RECORDS_OFFSET = 7
+_TAG_RECORDS_SIZE = 2
+# record type, record size, device type, flags, device number
+_DEVICE_RECORD_HEADER = struct.Struct(">BHHBB")
+_ACTION_RECORD_SIZE = 8
+_HANDOFF_FIXED_OFFSET = 6
+_UINT8_ENTRY_HEADER = struct.Struct(">BB")
+_UINT16_ENTRY_HEADER = struct.Struct(">HH")
+_UINT32 = struct.Struct(">I")
+
+_XIAOMI_RECORD_TYPE_VALUES: Mapping[bytes, XiaomiNdefTNF] = MappingProxyType({v: k for k, v in _XIAOMI_RECORD_TYPES.items()})
+
+
+@enum.unique
+class Template(enum.Enum):
+    UNKNOWN = "unknown"
+    EMPTY_MI_TAP = "empty_mi_tap"
+    MI_TAP_SOUND_BOX = "mi_tap_sound_box"
+    CIRCULATE = "circulate"
+    HANDOFF_SCREEN_MIRROR = "handoff_screen_mirror"
+    HANDOFF_TV_CAST = "handoff_tv_cast"
+
+
+@dataclasses.dataclass(frozen=True)
+class _ProtocolSignature:
+    # Payload fields before appsData, fields after appsData and the app data version.
+    head: bytes
+    tail: bytes
+    version: bytes
+    is_handoff: bool
+    # Empty attributes map and action string between the handoff device type and the payloads.
+    handoff_fixed: bytes = b""
+
+
+@dataclasses.dataclass(frozen=True)
+class _EntriesSignature:
+    template: Template
+    # None where the builder argument shows through, the builder constant otherwise.
+    device_type: int | None
+    entries: tuple[tuple[int, bytes | None], ...]
+
+
+@dataclasses.dataclass(frozen=True)
+class _Variables:
+    write_time: int
+    tag_device_type: tag.DeviceType
+    handoff_device_type: handoff.DeviceType
+    mac_1: bytes
+    mac_2: bytes
+    text: str
+
+
+_SAMPLE_VARIABLES = (
+    _Variables(0, tag.DeviceType.MI_TV, handoff.DeviceType.PC, bytes(6), bytes(6), ""),
+    _Variables(0x12345678, tag.DeviceType.MI_PHONE, handoff.DeviceType.TV, b"\x01" * 6, b"\x02" * 5, "model"),
+)
+
+# One builder call per combination of optional arguments.
+_TAG_BUILDERS = (
+    (Template.EMPTY_MI_TAP, lambda v: xiaomi.new_empty_mi_tap(v.write_time)),
+    *(
+        (Template.MI_TAP_SOUND_BOX, lambda v, w=wifi, m=model: xiaomi.new_mi_tap_sound_box(
+            v.write_time, v.mac_1 if w else None, v.mac_2, v.text if m else None
+        ))
+        for wifi in (False, True) for model in (False, True)
+    ),
+    (Template.CIRCULATE, lambda v: xiaomi.new_circulate(v.write_time, v.tag_device_type, v.mac_1, v.mac_2)),
+)
+_HANDOFF_BUILDERS = (
+    *(
+        (Template.HANDOFF_SCREEN_MIRROR, lambda v, l=lyra: xiaomi.new_handoff_screen_mirror(v.handoff_device_type, v.text, l))
+        for lyra in (False, True)
+    ),
+    (Template.HANDOFF_TV_CAST, lambda v: xiaomi.new_handoff_tv_cast(v.handoff_device_type, v.text, v.text + "1")),
+)
+
+
+def _protocol_signature(payload: XiaomiNfcPayload) -> _ProtocolSignature:
+    data = MiConnectData.from_nfc_payload(payload).container.data
+    app_data = data.appsData[0]
+    head = Payload()
+    head.CopyFrom(data)
+    head.ClearField("appsData")
+    head.ClearField("appIds")
+    tail = Payload()
+    tail.appIds.extend(data.appIds)
+    if isinstance(payload.appData, handoff.HandoffAppData):
+        suffix = payload.appData.payloads_map[handoff.PayloadKey.ACTION_SUFFIX.key_value]
+        fixed_end = app_data.index(bytes((handoff.PayloadKey.ACTION_SUFFIX.key_value, len(suffix))) + suffix)
+        handoff_fixed = app_data[_HANDOFF_FIXED_OFFSET:fixed_end]
+        return _ProtocolSignature(head.SerializeToString(), tail.SerializeToString(), app_data[:_VERSION_SIZE], True, handoff_fixed)
+    return _ProtocolSignature(head.SerializeToString(), tail.SerializeToString(), app_data[:_VERSION_SIZE], False)
+
+
+def _entries_signature(template: Template, device_types: tuple[int, int], maps: tuple[Mapping[int, bytes], Mapping[int, bytes]]) -> _EntriesSignature:
+    # Whatever differs between the two builder calls is a variable, the rest has to match byte for byte.
+    first, second = maps
+    if tuple(first) != tuple(second):
+        raise ValueError(f"{template} builder changes its entry order with its arguments")
+    return _EntriesSignature(
+        template=template,
+        device_type=device_types[0] if device_types[0] == device_types[1] else None,
+        entries=tuple((key, value if value == second[key] else None) for key, value in first.items()),
+    )
+
+
+def _compile_signatures():
+    # Signatures are taken from the builders themselves, so they follow any change to the encoders.
+    protocols = {}
+    tag_signatures = {}
+    handoff_signatures = {}
+    ndef_types = {}
+    for template, builder in _TAG_BUILDERS:
+        (ndef_type, payload), (_, other) = (builder(i) for i in _SAMPLE_VARIABLES)
+        signature = protocols.setdefault(payload.protocol, _protocol_signature(payload))
+        (device_record, action_record), (other_device_record, _) = payload.appData.records, other.appData.records
+        key = (signature.head, payload.appData.flags, action_record.encode(), device_record.flags, device_record.device_number)
+        tag_signatures.setdefault(key, []).append(_entries_signature(
+            template,
+            (device_record.device_type, other_device_record.device_type),
+            (device_record.attributes_map, other_device_record.attributes_map),
+        ))
+        ndef_types[template] = ndef_type
+    for template, builder in _HANDOFF_BUILDERS:
+        (ndef_type, payload), (_, other) = (builder(i) for i in _SAMPLE_VARIABLES)
+        signature = protocols.setdefault(payload.protocol, _protocol_signature(payload))
+        suffix = payload.appData.payloads_map[handoff.PayloadKey.ACTION_SUFFIX.key_value]
+        handoff_signatures.setdefault((signature.head, suffix), []).append(_entries_signature(
+            template,
+            (payload.appData.device_type, other.appData.device_type),
+            (payload.appData.payloads_map, other.appData.payloads_map),
+        ))
+        ndef_types[template] = ndef_type
+    return (
+        MappingProxyType({i.head: i for i in protocols.values()}),
+        MappingProxyType({k: tuple(v) for k, v in tag_signatures.items()}),
+        MappingProxyType({k: tuple(v) for k, v in handoff_signatures.items()}),
+        MappingProxyType(ndef_types),
+    )
+
+
+_PROTOCOLS, _TAG_SIGNATURES, _HANDOFF_SIGNATURES, _NDEF_TYPES = _compile_signatures()
+_HEAD_SIZES = tuple(sorted({len(i) for i in _PROTOCOLS}))
+
+
+def _read_length(data: bytes, offset: int) -> tuple[int, int]:
+    # Lengths on a tag never need more than two varint bytes.
+    first = data[offset]
+    if first < 0x80:
+        return first, offset + 1
+    second = data[offset + 1]
+    if second >= 0x80:
+        raise IndexError("length out of range")
+    return (first & 0x7f) | (second << 7), offset + 2
+
+
+def _read_entries(data: bytes, offset: int, end: int, header: struct.Struct) -> list[tuple[int, bytes]] | None:
+    entries = []
+    while offset < end:
+        key, size = header.unpack_from(data, offset)
+        offset += header.size
+        # A zero key ends the map when decoding, a tag with one is not the builder output.
+        if key == 0 or offset + size > end:
+            return None
+        entries.append((key, data[offset:offset + size]))
+        offset += size
+    return entries
+
+
+def _match_entries(
+        signatures: tuple[_EntriesSignature, ...], device_type: int, entries: list[tuple[int, bytes]]
+) -> Template:
+    for signature in signatures:
+        if signature.device_type is not None and signature.device_type != device_type:
+            continue
+        if len(signature.entries) != len(entries):
+            continue
+        if all(
+                key == expected_key and (expected is None or value == expected)
+                for (key, value), (expected_key, expected) in zip(entries, signature.entries)
+        ):
+            return signature.template
+    return Template.UNKNOWN
+
+
+def _classify_tag(protocol: _ProtocolSignature, app_data: bytes) -> Template:
+    if app_data[_TAG_RECORDS_OFFSET] != _TAG_RECORDS_SIZE:
+        return Template.UNKNOWN
+    offset = _TAG_RECORDS_OFFSET + 1
+    record_type, device_record_size, device_type, device_flags, device_number = _DEVICE_RECORD_HEADER.unpack_from(app_data, offset)
+    action_offset = offset + device_record_size
+    if record_type != _TYPE_DEVICE or action_offset + _ACTION_RECORD_SIZE != len(app_data):
+        return Template.UNKNOWN
+    key = (protocol.head, app_data[_TAG_FLAGS_OFFSET], app_data[action_offset:], device_flags, device_number)
+    signatures = _TAG_SIGNATURES.get(key)
+    if signatures is None:
+        return Template.UNKNOWN
+    entries = _read_entries(app_data, offset + _DEVICE_RECORD_HEADER.size, action_offset, _UINT16_ENTRY_HEADER)
+    if entries is None:
+        return Template.UNKNOWN
+    return _match_entries(signatures, device_type, entries)
+
+
+def _classify_handoff(protocol: _ProtocolSignature, app_data: bytes) -> Template:
+    offset = _HANDOFF_FIXED_OFFSET + len(protocol.handoff_fixed)
+    if app_data[_HANDOFF_FIXED_OFFSET:offset] != protocol.handoff_fixed:
+        return Template.UNKNOWN
+    # ACTION_SUFFIX is the first payload entry, it picks the candidate signatures.
+    if app_data[offset] != handoff.PayloadKey.ACTION_SUFFIX.key_value:
+        return Template.UNKNOWN
+    suffix_offset = offset + _UINT8_ENTRY_HEADER.size
+    signatures = _HANDOFF_SIGNATURES.get((protocol.head, app_data[suffix_offset:suffix_offset + app_data[offset + 1]]))
+    if signatures is None:
+        return Template.UNKNOWN
+    entries = _read_entries(app_data, offset, len(app_data), _UINT8_ENTRY_HEADER)
+    if entries is None:
+        return Template.UNKNOWN
+    device_type = _UINT32.unpack_from(app_data, _VERSION_SIZE)[0]
+    return _match_entries(signatures, device_type, entries)
+
+
+def _classify_mi_connect(data: bytes) -> Template:
+    if not data or data[0] != _CONTAINER_KEY:
+        return Template.UNKNOWN
+    size, offset = _read_length(data, 1)
+    if offset + size != len(data):
+        return Template.UNKNOWN
+    for head_size in _HEAD_SIZES:
+        protocol = _PROTOCOLS.get(data[offset:offset + head_size])
+        if protocol is None or data[offset + head_size] != _APPS_DATA_KEY:
+            continue
+        app_data_size, app_data_offset = _read_length(data, offset + head_size + 1)
+        app_data_end = app_data_offset + app_data_size
+        if data[app_data_end:] != protocol.tail or data[app_data_offset:app_data_offset + _VERSION_SIZE] != protocol.version:
+            return Template.UNKNOWN
+        app_data = data[app_data_offset:app_data_end]
+        if protocol.is_handoff:
+            return _classify_handoff(protocol, app_data)
+        return _classify_tag(protocol, app_data)
+    return Template.UNKNOWN
+
+
+def _xiaomi_record(data: bytes) -> tuple[XiaomiNdefTNF, bytes]:
+    offset = 0
+    while offset < len(data):
+        try:
+            header = _read_record_header(data, offset)
+        except ValueError:
+            break
+        if header.tnf == NdefTNF.EXTERNAL_TYPE.value:
+            ndef_type = _XIAOMI_RECORD_TYPE_VALUES.get(header.record_type(data))
+            if ndef_type is not None:
+                return ndef_type, data[header.payload_offset:header.end]
+        if header.is_last:
+            break
+        offset = header.end
+    return XiaomiNdefTNF.UNKNOWN, b""
+
+
+def classify(data: bytes | bytearray | memoryview, layer: StreamLayer = StreamLayer.MI_CONNECT) -> Template:
+    data = bytes(data)
+    try:
+        if layer == StreamLayer.MI_CONNECT:
+            return _classify_mi_connect(data)
+        elif layer == StreamLayer.NDEF:
+            ndef_type, payload = _xiaomi_record(data)
+            template = _classify_mi_connect(payload)
+            # Empty Mi Tap tags use the smart home record type, every other template uses mi connect service.
+            return template if _NDEF_TYPES.get(template) == ndef_type else Template.UNKNOWN
+        else:
+            raise ValueError(f"Unsupported layer {layer}")
+    except (IndexError, struct.error):
+        return Template.UNKNOWN
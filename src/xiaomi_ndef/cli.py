@@ -0,0 +1,370 @@
+import argparse
+import collections
+import dataclasses
+import json
+import struct
+import sys
+import time
+from collections import Counter
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, BinaryIO, Iterable, Iterator, Sequence
+
+# noinspection PyPackageRequirements
+from google.protobuf import message
+
+from . import diagnostics
+from ._utils import export_enum
+from .corpus import CorpusReader
+from .diagnostics import DecodeError, DecodeErrorKind
+from .handoff import HandoffAppData, DeviceType as HandoffDeviceType
+from .mi_connect import MiConnectData
+from .ndef import encode_xiaomi_ndef_record
+from .nfc import XiaomiNfcPayload
+from .proto.MiConnectProtocol_pb2 import Container
+from .tag import NfcTagAppData, NfcTagDeviceRecord, NfcTagActionRecord, DeviceType as TagDeviceType, Action
+from .tnf import XiaomiNdefTNF
+
+_FRAME_HEADER = struct.Struct(">I")
+_JSON_ENCODER = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+_MI_CONNECT_FIRST_BYTE = b"\x0a"
+_CHUNK_SIZE = 512
+_INVALID_HEX = "invalid_hex"
+_INVALID_ROW = "invalid_row"
+
+
+@dataclasses.dataclass(frozen=True)
+class _Options:
+    command: str
+    input_format: str = "hex"
+    layer: str = "auto"
+    output_format: str = "jsonl"
+    fields: tuple[str, ...] | None = None
+    ndef_type: XiaomiNdefTNF = XiaomiNdefTNF.MI_CONNECT_SERVICE
+    ndef: bool = False
+
+    @property
+    def needs_app_data(self) -> bool:
+        if self.command != "decode" or self.fields is None:
+            return True
+        return any(field == "app_data" or field.startswith("app_data.") for field in self.fields)
+
+
+@dataclasses.dataclass
+class RunSummary:
+    total: int = 0
+    failed: int = 0
+    errors: Counter[str] = dataclasses.field(default_factory=Counter)
+    stats: Counter[tuple[str, str]] = dataclasses.field(default_factory=Counter)
+
+    @property
+    def succeeded(self) -> int:
+        return self.total - self.failed
+
+    def add_error(self, kind: str) -> None:
+        self.failed += 1
+        self.errors[kind] += 1
+
+    def merge(self, other: 'RunSummary') -> None:
+        self.total += other.total
+        self.failed += other.failed
+        self.errors.update(other.errors)
+        self.stats.update(other.stats)
+
+    def to_dict(self) -> dict[str, Any]:
+        groups: dict[str, dict[str, int]] = {}
+        for (group, name), count in sorted(self.stats.items()):
+            groups.setdefault(group, {})[name] = count
+        return {
+            "total": self.total,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "errors": dict(sorted(self.errors.items())),
+            **groups,
+        }
+
+
+def _read_frames(file: BinaryIO) -> Iterator[bytes]:
+    while header := file.read(_FRAME_HEADER.size):
+        if len(header) != _FRAME_HEADER.size:
+            raise ValueError(f"Truncated frame header, got {len(header)} bytes")
+        size, = _FRAME_HEADER.unpack(header)
+        data = file.read(size)
+        if len(data) != size:
+            raise ValueError(f"Truncated frame, read {len(data)} bytes, expected {size} bytes")
+        yield data
+
+
+def _read_lines(file: BinaryIO) -> Iterator[bytes]:
+    for line in file:
+        line = line.strip()
+        if line and not line.startswith(b"#"):
+            yield line
+
+
+def read_inputs(paths: Sequence[str | Path], input_format: str) -> Iterator[bytes]:
+    for path in paths or ("-",):
+        if input_format == "corpus":
+            with CorpusReader(path) as reader:
+                yield from map(bytes, reader)
+            continue
+        file = sys.stdin.buffer if str(path) == "-" else open(path, "rb")
+        try:
+            if input_format == "binary":
+                yield file.read()
+            elif input_format == "framed":
+                yield from _read_frames(file)
+            else:
+                yield from _read_lines(file)
+        finally:
+            if file is not sys.stdin.buffer:
+                file.close()
+
+
+def _project(row: dict[str, Any], fields: Sequence[str]) -> dict[str, Any]:
+    projected = {}
+    for field in fields:
+        value: Any = row
+        for key in field.split("."):
+            if isinstance(value, dict):
+                value = value.get(key)
+            elif isinstance(value, list) and key.isdigit() and int(key) < len(value):
+                value = value[int(key)]
+            else:
+                value = None
+                break
+        projected[field] = value
+    return projected
+
+
+def _decode_header(data: bytes) -> tuple[dict[str, Any] | None, DecodeError | None]:
+    try:
+        mi_connect_data = MiConnectData(Container.FromString(data))
+    except (message.DecodeError, UnicodeDecodeError) as e:
+        return None, DecodeError(DecodeErrorKind.INVALID_CONTAINER, 0, str(e))
+    if not mi_connect_data.is_valid_nfc_payload:
+        return None, DecodeError(DecodeErrorKind.INVALID_NFC_PAYLOAD, 0, "Invalid MiConnectProtocol.Payload for NFC")
+    try:
+        protocol = mi_connect_data.get_nfc_protocol()
+    except ValueError as e:
+        return None, DecodeError(DecodeErrorKind.UNKNOWN_PROTOCOL, 0, str(e))
+    payload = mi_connect_data.container.data
+    return {
+        "major_version": payload.versionMajor,
+        "minor_version": payload.versionMinor,
+        "id_hash": int.from_bytes(payload.idHash, byteorder="big", signed=False) if payload.idHash else None,
+        "protocol": repr(protocol),
+    }, None
+
+
+def _has_ndef_layer(item: bytes, options: _Options) -> bool:
+    if options.layer == "auto":
+        # A MiConnect container starts with the tag of field 1, no NDEF record header has this value.
+        return item[:1] != _MI_CONNECT_FIRST_BYTE
+    return options.layer == "ndef"
+
+
+def _unwrap(item: bytes, options: _Options) -> tuple[XiaomiNdefTNF, bytes | None, DecodeError | None]:
+    if not _has_ndef_layer(item, options):
+        return options.ndef_type, item, None
+    return diagnostics.unwrap_ndef(item)
+
+
+def _collect_stats(summary: RunSummary, ndef_type: XiaomiNdefTNF, payload: XiaomiNfcPayload) -> None:
+    summary.stats["ndef_types", ndef_type.name] += 1
+    summary.stats["protocols", repr(payload.protocol)] += 1
+    app_data = payload.appData
+    if isinstance(app_data, NfcTagAppData):
+        for record in app_data.records:
+            if isinstance(record, NfcTagDeviceRecord):
+                summary.stats["device_types", str(export_enum(TagDeviceType.parse(record.device_type), record.device_type))] += 1
+            elif isinstance(record, NfcTagActionRecord):
+                summary.stats["actions", str(export_enum(Action.parse(record.action), record.action))] += 1
+    elif isinstance(app_data, HandoffAppData):
+        summary.stats["device_types", str(export_enum(HandoffDeviceType.parse(app_data.device_type), app_data.device_type))] += 1
+        summary.stats["actions", app_data.action] += 1
+
+
+def _error_row(index: int, kind: str, offset: int, error_message: str) -> bytes:
+    row = {"index": index, "error": kind, "error_offset": offset, "error_message": error_message}
+    return _JSON_ENCODER.encode(row).encode("utf-8") + b"\n"
+
+
+def _decode_item(index: int, item: bytes, options: _Options, summary: RunSummary) -> bytes | None:
+    report_errors = options.command != "stats" and options.output_format == "jsonl"
+    if options.input_format == "hex":
+        try:
+            item = bytes.fromhex(item.decode("ascii"))
+        except (ValueError, UnicodeDecodeError) as e:
+            summary.add_error(_INVALID_HEX)
+            return _error_row(index, _INVALID_HEX, 0, str(e)) if report_errors else None
+    ndef_type, data, error = _unwrap(item, options)
+    if error is None and not options.needs_app_data:
+        row, error = _decode_header(data)
+        payload = None
+    elif error is None:
+        result = diagnostics.decode(data)
+        payload, error = result.value, result.error
+        row = None
+    else:
+        payload = row = None
+    if error is not None:
+        summary.add_error(error.kind.value)
+        return _error_row(index, error.kind.value, error.offset, error.message) if report_errors else None
+    if options.command == "stats":
+        _collect_stats(summary, ndef_type, payload)
+        return None
+    elif options.command == "validate":
+        return None
+    elif options.output_format == "binary":
+        return _FRAME_HEADER.pack(len(data)) + data
+    if row is None:
+        row = payload.to_dict(ndef_type)
+    if _has_ndef_layer(item, options):
+        # Keeps the record type so encode can rebuild mixed SMART_HOME and MI_CONNECT_SERVICE streams.
+        row["ndef_type"] = ndef_type.name
+    if options.fields is not None:
+        row = _project(row, options.fields)
+    return _JSON_ENCODER.encode(row).encode("utf-8") + b"\n"
+
+
+def _encode_item(item: bytes, options: _Options, summary: RunSummary) -> bytes | None:
+    try:
+        row = json.loads(item)
+        data = MiConnectData.from_nfc_payload(XiaomiNfcPayload.from_dict(row)).to_bytes()
+        if options.ndef:
+            ndef_type = XiaomiNdefTNF[row["ndef_type"]] if "ndef_type" in row else options.ndef_type
+            data = encode_xiaomi_ndef_record(ndef_type, data)
+    except (ValueError, KeyError, TypeError, AttributeError, OverflowError):
+        summary.add_error(_INVALID_ROW)
+        return None
+    if options.output_format == "binary":
+        return _FRAME_HEADER.pack(len(data)) + data
+    return data.hex().encode("ascii") + b"\n"
+
+
+def _process_chunk(options: _Options, start: int, items: Sequence[bytes]) -> tuple[bytes, RunSummary]:
+    summary = RunSummary(total=len(items))
+    outputs = []
+    for index, item in enumerate(items, start):
+        if options.command == "encode":
+            output = _encode_item(item, options, summary)
+        else:
+            output = _decode_item(index, item, options, summary)
+        if output is not None:
+            outputs.append(output)
+    return b"".join(outputs), summary
+
+
+def _chunks(items: Iterable[bytes], chunk_size: int) -> Iterator[tuple[int, list[bytes]]]:
+    start = 0
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == chunk_size:
+            yield start, chunk
+            start += len(chunk)
+            chunk = []
+    if chunk:
+        yield start, chunk
+
+
+def run(
+        options: _Options,
+        items: Iterable[bytes],
+        output: BinaryIO,
+        executor: Executor | None = None,
+        max_pending: int = 1,
+        chunk_size: int = _CHUNK_SIZE
+) -> RunSummary:
+    summary = RunSummary()
+    if executor is None:
+        for start, chunk in _chunks(items, chunk_size):
+            data, chunk_summary = _process_chunk(options, start, chunk)
+            output.write(data)
+            summary.merge(chunk_summary)
+        return summary
+    # Results are written in input order, the window keeps memory bounded on unbounded streams.
+    pending: collections.deque[Future] = collections.deque()
+    for start, chunk in _chunks(items, chunk_size):
+        pending.append(executor.submit(_process_chunk, options, start, chunk))
+        while len(pending) >= max_pending:
+            data, chunk_summary = pending.popleft().result()
+            output.write(data)
+            summary.merge(chunk_summary)
+    while pending:
+        data, chunk_summary = pending.popleft().result()
+        output.write(data)
+        summary.merge(chunk_summary)
+    return summary
+
+
+def _format_report(command: str, summary: RunSummary, seconds: float) -> str:
+    rate = summary.total / seconds if seconds > 0 else 0.0
+    report = f"xiaomi-ndef {command}: {summary.total} records in {seconds:.3f}s ({rate:.0f} records/s), {summary.failed} failed"
+    if summary.errors:
+        report += " (" + ", ".join(f"{kind}={count}" for kind, count in sorted(summary.errors.items())) + ")"
+    return report
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="xiaomi-ndef", description="Decode, encode, validate and summarize Xiaomi NFC payloads.")
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("input", nargs="*", help="input files, '-' or nothing for stdin")
+    common.add_argument("-o", "--output", type=Path, default=None, help="output file, stdout by default")
+    common.add_argument("-j", "--jobs", type=int, default=1, help="worker processes")
+    common.add_argument("--chunk-size", type=int, default=_CHUNK_SIZE)
+    common.add_argument(
+        "-t", "--ndef-type", choices=[i.name for i in XiaomiNdefTNF if i != XiaomiNdefTNF.UNKNOWN],
+        default=XiaomiNdefTNF.MI_CONNECT_SERVICE.name, help="NDEF type for bare MiConnect payloads and rows without ndef_type"
+    )
+    decoding = argparse.ArgumentParser(add_help=False)
+    decoding.add_argument(
+        "-f", "--input-format", choices=("hex", "binary", "framed", "corpus"), default="hex",
+        help="hex lines, one binary payload per file, u32 length framed payloads or a corpus file"
+    )
+    decoding.add_argument("-l", "--layer", choices=("auto", "ndef", "mi-connect"), default="auto")
+    commands = parser.add_subparsers(dest="command", required=True)
+    decode_parser = commands.add_parser("decode", parents=[common, decoding], help="decode payloads to JSON Lines")
+    decode_parser.add_argument("-O", "--output-format", choices=("jsonl", "binary"), default="jsonl")
+    decode_parser.add_argument("--fields", default=None, help="comma separated dotted fields, e.g. protocol,app_data.write_time")
+    encode_parser = commands.add_parser("encode", parents=[common], help="encode JSON Lines rows from decode")
+    encode_parser.add_argument("-O", "--output-format", choices=("hex", "binary"), default="hex")
+    encode_parser.add_argument("--ndef", action="store_true", help="wrap each payload in a Xiaomi NDEF record")
+    commands.add_parser("validate", parents=[common, decoding], help="report payloads that fail to decode")
+    commands.add_parser("stats", parents=[common, decoding], help="print a summary of decoded payloads")
+    args = parser.parse_args(argv)
+
+    if args.jobs <= 0 or args.chunk_size <= 0:
+        parser.error("--jobs and --chunk-size must be positive")
+    options = _Options(
+        command=args.command,
+        input_format=getattr(args, "input_format", "hex"),
+        layer=getattr(args, "layer", "auto"),
+        output_format=getattr(args, "output_format", "jsonl"),
+        fields=tuple(i.strip() for i in args.fields.split(",") if i.strip()) if getattr(args, "fields", None) else None,
+        ndef_type=XiaomiNdefTNF[args.ndef_type],
+        ndef=getattr(args, "ndef", False),
+    )
+    output = open(args.output, "wb") if args.output is not None else sys.stdout.buffer
+    started = time.perf_counter()
+    try:
+        items = read_inputs(args.input, options.input_format)
+        if args.jobs > 1:
+            with ProcessPoolExecutor(max_workers=args.jobs) as executor:
+                summary = run(options, items, output, executor, 2 * args.jobs, args.chunk_size)
+        else:
+            summary = run(options, items, output, chunk_size=args.chunk_size)
+        if options.command == "stats":
+            output.write(_JSON_ENCODER.encode(summary.to_dict()).encode("utf-8") + b"\n")
+    finally:
+        if output is not sys.stdout.buffer:
+            output.close()
+        else:
+            output.flush()
+    print(_format_report(options.command, summary, time.perf_counter() - started), file=sys.stderr)
+    return 1 if options.command == "validate" and summary.failed > 0 else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,171 @@
+import dataclasses
+import enum
+import warnings
+from collections import Counter
+
+# noinspection PyPackageRequirements
+from google.protobuf import message
+from pyndef import NdefTNF
+
+from . import ntag
+from .mi_connect import MiConnectData
+from .ndef import encode_xiaomi_ndef_record, encode_mi_tap_ndef_message, _read_record_header, _XIAOMI_RECORD_TYPES
+from .nfc import XiaomiNfcPayload
+from .proto.MiConnectProtocol_pb2 import Container
+from .tnf import XiaomiNdefTNF
+
+_XIAOMI_RECORD_TYPE_VALUES = frozenset(_XIAOMI_RECORD_TYPES.values())
+
+
+@enum.unique
+class Component(enum.Enum):
+    TLV = "tlv"
+    NDEF_HEADER = "ndef_header"
+    NDEF_TYPE = "ndef_type"
+    CONTAINER = "container"
+    PAYLOAD_FIELDS = "payload_fields"
+    APP_DATA = "app_data"
+    OTHER_RECORDS = "other_records"
+    PADDING = "padding"
+
+
+@dataclasses.dataclass(frozen=True)
+class ComponentCost:
+    component: Component
+    offset: int
+    size: int
+
+    @property
+    def pages(self) -> int:
+        # Pages touched by this component in the tag image, a page shared with a neighbour counts for both.
+        if self.size == 0:
+            return 0
+        return (self.offset + self.size - 1) // ntag.PAGE_SIZE - self.offset // ntag.PAGE_SIZE + 1
+
+
+@dataclasses.dataclass(frozen=True)
+class EncodeReport:
+    message: bytes
+    components: tuple[ComponentCost, ...]
+    tag_type: ntag.NtagType | None = None
+
+    @property
+    def size(self) -> int:
+        return len(self.message)
+
+    @property
+    def image_size(self) -> int:
+        return ntag.image_size(self.size)
+
+    @property
+    def pages(self) -> int:
+        return ntag.image_pages(self.size)
+
+    @property
+    def fits(self) -> bool:
+        return self.tag_type is None or ntag.fits(self.size, self.tag_type)
+
+    @property
+    def free_bytes(self) -> int | None:
+        if self.tag_type is None:
+            return None
+        return self.tag_type.user_memory_size - ntag.ndef_tlv_size(self.size)
+
+    def sizes(self) -> dict[Component, int]:
+        sizes = Counter()
+        for cost in self.components:
+            sizes[cost.component] += cost.size
+        return dict(sizes)
+
+    def image(self) -> bytes:
+        return ntag.build_image(self.message, self.tag_type)
+
+
+def _container_costs(data: bytes) -> list[tuple[Component, int]] | None:
+    try:
+        container = Container.FromString(data)
+    except (message.DecodeError, UnicodeDecodeError):
+        return None
+    payload = container.data
+    if container.SerializeToString() != data or len(payload.appsData) != 1:
+        return None
+    app_data_size = len(payload.appsData[0])
+    payload_size = payload.ByteSize()
+    container_size = len(data) - payload_size
+    # Fields are serialized in field number order, appIds is the only field after appsData.
+    head = type(payload)()
+    head.CopyFrom(payload)
+    head.ClearField("appIds")
+    tail_size = payload_size - head.ByteSize()
+    return [
+        (Component.CONTAINER, container_size),
+        (Component.PAYLOAD_FIELDS, payload_size - tail_size - app_data_size),
+        (Component.APP_DATA, app_data_size),
+        (Component.PAYLOAD_FIELDS, tail_size),
+    ]
+
+
+def _record_costs(data: bytes, offset: int) -> tuple[list[tuple[Component, int]], int, bool]:
+    header = _read_record_header(data, offset)
+    end = header.end
+    if header.tnf != NdefTNF.EXTERNAL_TYPE.value or header.record_type(data) not in _XIAOMI_RECORD_TYPE_VALUES:
+        return [(Component.OTHER_RECORDS, end - offset)], end, header.is_last
+    header_size = header.type_offset - offset + header.id_size
+    costs = [(Component.NDEF_HEADER, header_size), (Component.NDEF_TYPE, header.type_size)]
+    container_costs = _container_costs(data[header.payload_offset:end])
+    if container_costs is None:
+        costs.append((Component.APP_DATA, header.payload_size))
+    else:
+        costs.extend(container_costs)
+    return costs, end, header.is_last
+
+
+def analyze(ndef_message: bytes, tag_type: ntag.NtagType | None = None) -> EncodeReport:
+    ndef_message = bytes(ndef_message)
+    sizes = [(Component.TLV, ntag.ndef_tlv_header_size(len(ndef_message)))]
+    offset = 0
+    last = not ndef_message
+    while not last:
+        costs, offset, last = _record_costs(ndef_message, offset)
+        sizes.extend(costs)
+    if offset != len(ndef_message):
+        raise ValueError(f"{len(ndef_message) - offset} bytes after the last NDEF record")
+    sizes.append((Component.TLV, ntag.ndef_tlv_size(0) - ntag.ndef_tlv_header_size(0)))
+    sizes.append((Component.PADDING, ntag.image_size(len(ndef_message)) - ntag.ndef_tlv_size(len(ndef_message))))
+
+    components = []
+    position = 0
+    for component, size in sizes:
+        if size == 0:
+            continue
+        if components and components[-1].component == component and component != Component.TLV:
+            previous = components.pop()
+            components.append(ComponentCost(component, previous.offset, previous.size + size))
+        else:
+            components.append(ComponentCost(component, position, size))
+        position += size
+    return EncodeReport(ndef_message, tuple(components), tag_type)
+
+
+def encode_compact(
+        payload_type: XiaomiNdefTNF,
+        payload: XiaomiNfcPayload,
+        tag_type: ntag.NtagType | None = None,
+        mi_tap_records: bool = False,
+        strict: bool = True
+) -> EncodeReport:
+    data = MiConnectData.from_nfc_payload(payload).to_bytes()
+    # Protobuf already leaves out default fields and packs appIds, the remaining fields are required by readers.
+    # The only layer left to trim is NDEF, a single short record without id and optionally without the Mi Tap records.
+    if mi_tap_records:
+        ndef_message = encode_mi_tap_ndef_message(payload_type, data)
+    else:
+        ndef_message = encode_xiaomi_ndef_record(payload_type, data)
+    report = analyze(ndef_message, tag_type)
+    try:
+        ntag.check_fits(report.size, tag_type)
+    except ValueError as e:
+        if strict:
+            raise
+        warnings.warn(str(e), RuntimeWarning, stacklevel=2)
+    return report
@@ -0,0 +1,110 @@
+import dataclasses
+import itertools
+import time
+import zlib
+from collections import Counter
+from typing import Iterable, Sequence
+
+_WBITS = -zlib.MAX_WBITS
+_MEM_LEVEL = 9
+_SEGMENT_SIZE = 8
+_MAX_DICTIONARY_SIZE = 32 * 1024
+_MAX_TRAINING_SAMPLES = 10000
+_MAX_SEGMENTS = 1 << 16
+
+
+def train_dictionary(samples: Iterable[bytes], size: int = 4096, max_samples: int = _MAX_TRAINING_SAMPLES) -> bytes:
+    if size <= 0 or size > _MAX_DICTIONARY_SIZE:
+        raise ValueError(f"dictionary size must be in (0, {_MAX_DICTIONARY_SIZE}]")
+    if max_samples <= 0:
+        raise ValueError("max samples must be > 0")
+    segments: Counter[bytes] = Counter()
+    for sample in itertools.islice(samples, max_samples):
+        sample = bytes(sample)
+        segments.update({sample[i:i + _SEGMENT_SIZE] for i in range(max(len(sample) - _SEGMENT_SIZE + 1, 1))})
+        if len(segments) > 2 * _MAX_SEGMENTS:
+            # Rare segments never make it into the dictionary, drop them before they pile up.
+            segments = Counter(dict(segments.most_common(_MAX_SEGMENTS)))
+
+    chosen: list[bytes] = []
+    chosen_size = 0
+    for segment, count in segments.most_common():
+        if count < 2 and chosen:
+            break
+        if any(segment in i for i in chosen):
+            continue
+        # Extend a previously chosen segment when they overlap, this keeps common framing contiguous.
+        for i, existing in enumerate(chosen):
+            if existing[-_SEGMENT_SIZE + 1:] == segment[:_SEGMENT_SIZE - 1]:
+                chosen[i] = existing + segment[_SEGMENT_SIZE - 1:]
+                chosen_size += len(segment) - _SEGMENT_SIZE + 1
+                break
+        else:
+            chosen.append(segment)
+            chosen_size += len(segment)
+        if chosen_size >= size:
+            break
+    # zlib encodes closer matches with shorter distances, so the most common segments go last.
+    return b"".join(reversed(chosen))[-size:]
+
+
+class DictionaryCodec:
+    def __init__(self, zdict: bytes, level: int = 9) -> None:
+        if len(zdict) > _MAX_DICTIONARY_SIZE:
+            raise ValueError(f"dictionary size must be <= {_MAX_DICTIONARY_SIZE}")
+        self.zdict: bytes = bytes(zdict)
+        self.level: int = level
+
+    def compress(self, data: bytes) -> bytes:
+        compressor = zlib.compressobj(self.level, zlib.DEFLATED, _WBITS, _MEM_LEVEL, zlib.Z_DEFAULT_STRATEGY, self.zdict)
+        return compressor.compress(data) + compressor.flush()
+
+    def decompress(self, data: bytes) -> bytes:
+        decompressor = zlib.decompressobj(_WBITS, zdict=self.zdict)
+        result = decompressor.decompress(data) + decompressor.flush()
+        if not decompressor.eof:
+            raise ValueError("compressed record truncated")
+        return result
+
+    @staticmethod
+    def train(
+            samples: Iterable[bytes],
+            size: int = 4096,
+            level: int = 9,
+            max_samples: int = _MAX_TRAINING_SAMPLES,
+    ) -> 'DictionaryCodec':
+        return DictionaryCodec(train_dictionary(samples, size, max_samples), level)
+
+
+@dataclasses.dataclass(frozen=True)
+class CompressionReport:
+    records: int
+    raw_bytes: int
+    compressed_bytes: int
+    decode_seconds: float
+
+    @property
+    def ratio(self) -> float:
+        return self.raw_bytes / self.compressed_bytes if self.compressed_bytes else 0.0
+
+    @property
+    def records_per_second(self) -> float:
+        return self.records / self.decode_seconds if self.decode_seconds else 0.0
+
+    @property
+    def bytes_per_second(self) -> float:
+        return self.raw_bytes / self.decode_seconds if self.decode_seconds else 0.0
+
+
+def measure(codec: DictionaryCodec, samples: Sequence[bytes]) -> CompressionReport:
+    compressed = [codec.compress(sample) for sample in samples]
+    start = time.perf_counter()
+    for data in compressed:
+        codec.decompress(data)
+    decode_seconds = time.perf_counter() - start
+    return CompressionReport(
+        records=len(samples),
+        raw_bytes=sum(len(sample) for sample in samples),
+        compressed_bytes=sum(len(data) for data in compressed),
+        decode_seconds=decode_seconds,
+    )
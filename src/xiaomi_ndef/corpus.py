@@ -0,0 +1,288 @@
+import argparse
+import bisect
+import dataclasses
+import mmap
+import os
+import struct
+from array import array
+from pathlib import Path
+from typing import Iterable, Iterator, Sequence
+
+from pyndef import NdefMessage
+
+from .compression import DictionaryCodec
+from .mi_connect import MiConnectData
+from .ndef import get_xiami_ndef_payload_type, get_xiami_ndef_payload_bytes
+
+_MAGIC = b"XNDC"
+_TRAILER_MAGIC = b"XNDI"
+_VERSION = 2
+
+FLAG_ZLIB_DICTIONARY = 0x0001
+
+# magic, version, flags, header size
+_HEADER = struct.Struct(">4sHHI")
+# entry payload size
+_ENTRY_HEADER = struct.Struct(">I")
+# index offset, previous trailer end or 0, entries in this index, entries in the corpus, trailer magic
+_TRAILER = struct.Struct(">QQII4s")
+_INDEX_ITEM = struct.Struct(">Q")
+
+
+class CorpusFormatError(ValueError):
+    pass
+
+
+def _read_header(data: bytes | mmap.mmap) -> tuple[int, int]:
+    if len(data) < _HEADER.size:
+        raise CorpusFormatError("corpus header truncated")
+    magic, version, flags, header_size = _HEADER.unpack_from(data, 0)
+    if magic != _MAGIC:
+        raise CorpusFormatError("not a corpus file")
+    if version != _VERSION:
+        raise CorpusFormatError(f"unsupported corpus version {version}")
+    if header_size < _HEADER.size:
+        raise CorpusFormatError(f"invalid corpus header size {header_size}")
+    return flags, header_size
+
+
+@dataclasses.dataclass(frozen=True)
+class _IndexPart:
+    offset: int
+    start: int
+    count: int
+
+
+def _trailer_index(data: bytes | mmap.mmap, header_size: int, end: int) -> tuple[list[_IndexPart], int] | None:
+    # Every flush only indexes its new entries, its trailer links to the trailer of the previous flush.
+    parts = []
+    total = None
+    while end > 0:
+        if end < header_size + _TRAILER.size:
+            return None
+        index_offset, previous_end, count, entries, magic = _TRAILER.unpack_from(data, end - _TRAILER.size)
+        if (
+                magic != _TRAILER_MAGIC or count > entries or previous_end >= index_offset or index_offset < header_size or
+                index_offset + count * _INDEX_ITEM.size + _TRAILER.size != end or
+                total is not None and entries != total
+        ):
+            return None
+        parts.append(_IndexPart(index_offset, entries - count, count))
+        total = entries - count
+        end = previous_end
+    if total != 0:
+        return None
+    parts.reverse()
+    return parts, parts[-1].start + parts[-1].count
+
+
+def _read_index(data: bytes | mmap.mmap, header_size: int) -> tuple[list[_IndexPart], int, int] | None:
+    index = _trailer_index(data, header_size, len(data))
+    if index is not None:
+        return *index, len(data)
+    # A writer stopped before flushing leaves entries after the last trailer, the trailer before them still holds.
+    search_end = len(data)
+    while (position := data.rfind(_TRAILER_MAGIC, header_size, search_end)) >= 0:
+        end = position + len(_TRAILER_MAGIC)
+        index = _trailer_index(data, header_size, end)
+        if index is not None:
+            return *index, end
+        search_end = end - 1
+    return None
+
+
+def _header_codec(flags: int, header_extra: bytes) -> DictionaryCodec | None:
+    return DictionaryCodec(header_extra) if flags & FLAG_ZLIB_DICTIONARY else None
+
+
+class CorpusWriter:
+    def __init__(self, path: str | os.PathLike, append: bool = True, codec: DictionaryCodec | None = None) -> None:
+        self._path = Path(path)
+        if append and self._path.exists() and self._path.stat().st_size > 0:
+            self._file = open(self._path, "r+b")
+            with mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                self.flags, self._header_size = _read_header(data)
+                self.codec = _header_codec(self.flags, data[_HEADER.size:self._header_size])
+                index = _read_index(data, self._header_size)
+                if index is None:
+                    self._file.close()
+                    raise CorpusFormatError("corpus index missing or truncated")
+                parts, self._flushed, self._end = index
+            # Only bytes after the last complete trailer are dropped, the existing index stays as it is.
+            self._file.truncate(self._end)
+            self._previous_end = self._end
+        else:
+            header_extra = codec.zdict if codec is not None else b""
+            self._file = open(self._path, "w+b")
+            self.flags = FLAG_ZLIB_DICTIONARY if codec is not None else 0
+            self.codec = codec
+            self._header_size = _HEADER.size + len(header_extra)
+            self._file.write(_HEADER.pack(_MAGIC, _VERSION, self.flags, self._header_size))
+            self._file.write(header_extra)
+            self._end = self._header_size
+            self._flushed = 0
+            self._previous_end = 0
+        # Offsets of entries appended since the last flush, earlier ones are already indexed in the file.
+        self._offsets = array("Q")
+        self._file.seek(self._end)
+
+    def __len__(self) -> int:
+        return self._flushed + len(self._offsets)
+
+    def append(self, payload: bytes) -> int:
+        if self.codec is not None:
+            payload = self.codec.compress(payload)
+        self._file.write(_ENTRY_HEADER.pack(len(payload)))
+        self._file.write(payload)
+        self._offsets.append(self._end + _ENTRY_HEADER.size)
+        self._end += _ENTRY_HEADER.size + len(payload)
+        return len(self) - 1
+
+    def extend(self, payloads: Iterable[bytes]) -> None:
+        for payload in payloads:
+            self.append(payload)
+
+    def flush(self) -> None:
+        if self._previous_end != 0 and not self._offsets:
+            return
+        index = bytearray(len(self._offsets) * _INDEX_ITEM.size)
+        for i, offset in enumerate(self._offsets):
+            _INDEX_ITEM.pack_into(index, i * _INDEX_ITEM.size, offset)
+        self._file.seek(self._end)
+        self._file.write(index)
+        self._file.write(_TRAILER.pack(self._end, self._previous_end, len(self._offsets), len(self), _TRAILER_MAGIC))
+        self._file.flush()
+        # New entries go after this trailer, the next flush links back to it.
+        self._end = self._previous_end = self._file.tell()
+        self._flushed = len(self)
+        self._offsets = array("Q")
+
+    def close(self) -> None:
+        if not self._file.closed:
+            self.flush()
+            self._file.close()
+
+    def __enter__(self) -> 'CorpusWriter':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+
+class CorpusReader:
+    def __init__(self, path: str | os.PathLike) -> None:
+        with open(path, "rb") as file:
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self.flags, header_size = _read_header(self._mmap)
+            self.codec = _header_codec(self.flags, self._mmap[_HEADER.size:header_size])
+            index = _read_index(self._mmap, header_size)
+            if index is None:
+                raise CorpusFormatError("corpus index missing or truncated")
+        except Exception:
+            self._mmap.close()
+            raise
+        self._parts, self._count, _ = index
+        self._starts = [part.start for part in self._parts]
+        self._view = memoryview(self._mmap)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def offset(self, i: int) -> int:
+        if i < 0:
+            i += self._count
+        if not 0 <= i < self._count:
+            raise IndexError("corpus entry index out of range")
+        part = self._parts[bisect.bisect_right(self._starts, i) - 1]
+        return _INDEX_ITEM.unpack_from(self._mmap, part.offset + (i - part.start) * _INDEX_ITEM.size)[0]
+
+    def raw(self, i: int) -> memoryview:
+        offset = self.offset(i)
+        size, = _ENTRY_HEADER.unpack_from(self._mmap, offset - _ENTRY_HEADER.size)
+        return self._view[offset:offset + size]
+
+    def __getitem__(self, i: int) -> memoryview | bytes:
+        if self.codec is not None:
+            return self.codec.decompress(self.raw(i))
+        return self.raw(i)
+
+    def __iter__(self) -> Iterator[memoryview | bytes]:
+        for i in range(self._count):
+            yield self[i]
+
+    def decode(self, i: int) -> MiConnectData:
+        return MiConnectData.parse(self[i])
+
+    def close(self) -> None:
+        self._view.release()
+        try:
+            self._mmap.close()
+        except BufferError:
+            # Entries returned by raw() are still referenced, the file is unmapped once the last of them is released.
+            pass
+
+    def __enter__(self) -> 'CorpusReader':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+
+def read_hex_log(lines: Iterable[str], ndef: bool = False) -> Iterator[bytes]:
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        data = bytes.fromhex(line)
+        if ndef:
+            msg = NdefMessage.parse(data)
+            data = get_xiami_ndef_payload_bytes(msg, get_xiami_ndef_payload_type(msg))
+            if data is None:
+                continue
+        yield data
+
+
+def convert_hex_log(lines: Iterable[str], writer: CorpusWriter, ndef: bool = False) -> int:
+    count = 0
+    for data in read_hex_log(lines, ndef):
+        writer.append(data)
+        count += 1
+    return count
+
+
+def _read_hex_logs(paths: Iterable[Path], ndef: bool) -> Iterator[bytes]:
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as file:
+            yield from read_hex_log(file, ndef)
+
+
+def main(argv: Sequence[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Convert hex encoded MiConnect payload logs into a corpus file.")
+    parser.add_argument("input", type=Path, nargs="+", help="hex log files, one payload per line")
+    parser.add_argument("-o", "--output", type=Path, required=True, help="corpus file, appended if it exists")
+    parser.add_argument("--ndef", action="store_true", help="lines are full NDEF messages")
+    parser.add_argument("--dictionary-size", type=int, default=0, help="train a zlib dictionary of this size for a new corpus")
+    parser.add_argument("--training-samples", type=int, default=10000, help="train the dictionary on this many leading payloads")
+    args = parser.parse_args(argv)
+
+    codec = None
+    if args.dictionary_size > 0:
+        # An existing corpus keeps the dictionary in its header, appending can't switch to a new one.
+        if args.output.exists() and args.output.stat().st_size > 0:
+            parser.error(f"--dictionary-size only applies to a new corpus, {args.output} already exists")
+        # Training only reads a leading sample, the corpus itself is streamed separately below.
+        codec = DictionaryCodec.train(
+            _read_hex_logs(args.input, args.ndef),
+            args.dictionary_size,
+            max_samples=args.training_samples,
+        )
+
+    with CorpusWriter(args.output, codec=codec) as writer:
+        for path in args.input:
+            with open(path, "r", encoding="utf-8") as file:
+                print(f"{path}: {convert_hex_log(file, writer, args.ndef)} entries")
+
+
+if __name__ == "__main__":
+    main()
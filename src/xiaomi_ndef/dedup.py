@@ -0,0 +1,136 @@
+import dataclasses
+import hashlib
+import math
+import struct
+from collections import OrderedDict
+from typing import Iterable, Iterator
+
+# noinspection PyPackageRequirements
+from google.protobuf import message
+
+from .nfc import V1NfcProtocol, V2NfcProtocol
+from .proto.MiConnectProtocol_pb2 import Container
+from .tag import NfcTagAppData
+
+_DIGEST_SIZE = 16
+_DIGEST_HALVES = struct.Struct(">QQ")
+_TAG_PROTOCOL_FLAGS = (V1NfcProtocol.flags, V2NfcProtocol.flags)
+
+
+class BloomFilter:
+    def __init__(self, capacity: int, error_rate: float = 0.01) -> None:
+        if capacity <= 0:
+            raise ValueError("capacity must be positive")
+        if not 0 < error_rate < 1:
+            raise ValueError("error_rate must be in (0, 1)")
+        self.capacity: int = capacity
+        self.error_rate: float = error_rate
+        self.bits: int = max(8, math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hashes: int = max(1, round(self.bits / capacity * math.log(2)))
+        self._array = bytearray((self.bits + 7) // 8)
+        self.count: int = 0
+
+    def _positions(self, digest: bytes) -> Iterator[int]:
+        # Kirsch-Mitzenmacher double hashing over the two halves of a 128-bit digest.
+        h1, h2 = _DIGEST_HALVES.unpack_from(digest)
+        h2 |= 1
+        for i in range(self.hashes):
+            yield (h1 + i * h2) % self.bits
+
+    def add(self, digest: bytes) -> None:
+        for position in self._positions(digest):
+            self._array[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, digest: bytes) -> bool:
+        return all(self._array[position >> 3] & (1 << (position & 7)) for position in self._positions(digest))
+
+    def clear(self) -> None:
+        self._array = bytearray(len(self._array))
+        self.count = 0
+
+    @property
+    def memory_size(self) -> int:
+        return len(self._array)
+
+
+def canonical_payload(data: bytes) -> bytes:
+    try:
+        container = Container.FromString(data)
+    except (message.DecodeError, UnicodeDecodeError):
+        return bytes(data)
+    payload = container.data
+    if len(payload.flags) == 0 or payload.flags[0] not in _TAG_PROTOCOL_FLAGS or len(payload.appsData) == 0:
+        return bytes(data)
+    try:
+        payload.appsData[0] = NfcTagAppData.replace_write_time(payload.appsData[0], 0)
+    except ValueError:
+        return bytes(data)
+    return container.SerializeToString(deterministic=True)
+
+
+@dataclasses.dataclass
+class DedupStats:
+    seen: int = 0
+    duplicates: int = 0
+    filter_hits: int = 0
+    unconfirmed_hits: int = 0
+
+    @property
+    def unique(self) -> int:
+        return self.seen - self.duplicates
+
+
+class Deduplicator:
+    def __init__(
+            self,
+            capacity: int = 1 << 20,
+            error_rate: float = 0.01,
+            exact_size: int = 1 << 16,
+            ignore_write_time: bool = False
+    ) -> None:
+        if not 0 < exact_size < capacity:
+            raise ValueError("exact_size must be in (0, capacity)")
+        self._filter = BloomFilter(capacity, error_rate)
+        self._exact: OrderedDict[bytes, None] = OrderedDict()
+        self._exact_size = exact_size
+        self.ignore_write_time: bool = ignore_write_time
+        self.stats: DedupStats = DedupStats()
+
+    def key(self, data: bytes) -> bytes:
+        if self.ignore_write_time:
+            data = canonical_payload(data)
+        return hashlib.blake2b(data, digest_size=_DIGEST_SIZE).digest()
+
+    def _remember(self, digest: bytes) -> None:
+        if self._filter.count >= self._filter.capacity:
+            # Keep the false positive rate bounded: restart the filter from the exact set.
+            self._filter.clear()
+            for exact_digest in self._exact:
+                self._filter.add(exact_digest)
+        self._filter.add(digest)
+        self._exact[digest] = None
+        if len(self._exact) > self._exact_size:
+            self._exact.popitem(last=False)
+
+    def is_duplicate(self, data: bytes) -> bool:
+        digest = self.key(data)
+        self.stats.seen += 1
+        if digest in self._filter:
+            self.stats.filter_hits += 1
+            if digest in self._exact:
+                self._exact.move_to_end(digest)
+                self.stats.duplicates += 1
+                return True
+            self.stats.unconfirmed_hits += 1
+        self._remember(digest)
+        return False
+
+    def filter(self, items: Iterable[bytes]) -> Iterator[bytes]:
+        for data in items:
+            if not self.is_duplicate(data):
+                yield data
+
+    @property
+    def memory_size(self) -> int:
+        return self._filter.memory_size + self._exact_size * _DIGEST_SIZE
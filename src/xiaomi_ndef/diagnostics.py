@@ -0,0 +1,336 @@
+import dataclasses
+import enum
+import itertools
+import struct
+from collections import Counter
+from concurrent.futures import Executor, ThreadPoolExecutor
+from types import MappingProxyType
+from typing import Any, Generic, Iterable, Mapping, TypeVar
+
+# noinspection PyPackageRequirements
+from google.protobuf import message
+from pyndef import NdefMessage
+
+from .base import AppData, UInt8BytesMap, UInt16BytesMap
+from .handoff import HandoffAppData, _APP_DATA_CODEC as _HANDOFF_APP_DATA_CODEC
+from .interning import Interner
+from .mi_connect import MiConnectData
+from .ndef import get_xiami_ndef_payload_type, get_xiami_ndef_payload_bytes
+from .nfc import XiaomiNfcPayload, XiaomiNfcProtocol, V1NfcProtocol, V2NfcProtocol, HandoffNfcProtocol
+from .proto.MiConnectProtocol_pb2 import Container
+from .tag import NfcTagAppData, NfcTagRecord, NfcTagDeviceRecord, NfcTagActionRecord, NfcTagRawRecord
+from .tag import _TYPE_DEVICE, _TYPE_ACTION, _RECORD_HEADER, _APP_DATA_CODEC as _TAG_APP_DATA_CODEC
+from .tag import _DEVICE_RECORD_CODEC, _ACTION_RECORD_CODEC
+from .tnf import XiaomiNdefTNF
+
+_T = TypeVar("_T")
+
+_PROTOCOLS: Mapping[int, XiaomiNfcProtocol] = MappingProxyType({
+    protocol.flags: protocol for protocol in (V1NfcProtocol, V2NfcProtocol, HandoffNfcProtocol)
+})
+
+# Layouts come from the compiled schemas, so this decoder reads exactly what the strict codecs write.
+_TAG_HEADER = _TAG_APP_DATA_CODEC.header
+_DEVICE_HEADER = _DEVICE_RECORD_CODEC.header
+_ACTION_HEADER = _ACTION_RECORD_CODEC.header
+_HANDOFF_HEADER = _HANDOFF_APP_DATA_CODEC.header
+_UINT8 = struct.Struct(">B")
+_UINT16 = struct.Struct(">H")
+_THREADED_CHUNK_SIZE = 256
+
+
+@enum.unique
+class DecodeErrorKind(enum.Enum):
+    INVALID_CONTAINER = "invalid_container"
+    INVALID_NFC_PAYLOAD = "invalid_nfc_payload"
+    UNKNOWN_PROTOCOL = "unknown_protocol"
+    TRUNCATED = "truncated"
+    INVALID_RECORD_SIZE = "invalid_record_size"
+    INVALID_TEXT = "invalid_text"
+    INVALID_NDEF = "invalid_ndef"
+
+
+@dataclasses.dataclass(frozen=True)
+class DecodeError:
+    kind: DecodeErrorKind
+    offset: int
+    message: str
+
+
+@dataclasses.dataclass(frozen=True)
+class DecodeResult(Generic[_T]):
+    value: _T | None
+    error: DecodeError | None = None
+    partial: dict[str, Any] = dataclasses.field(default_factory=dict)
+    unknown_records: int = 0
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+@dataclasses.dataclass
+class DecodeSummary:
+    total: int = 0
+    succeeded: int = 0
+    unknown_records: int = 0
+    errors: Counter[DecodeErrorKind] = dataclasses.field(default_factory=Counter)
+
+    @property
+    def failed(self) -> int:
+        return self.total - self.succeeded
+
+    def add(self, result: DecodeResult) -> None:
+        self.total += 1
+        self.unknown_records += result.unknown_records
+        if result.error is None:
+            self.succeeded += 1
+        else:
+            self.errors[result.error.kind] += 1
+
+    def merge(self, other: 'DecodeSummary') -> None:
+        self.total += other.total
+        self.succeeded += other.succeeded
+        self.unknown_records += other.unknown_records
+        self.errors.update(other.errors)
+
+
+def _failure(kind: DecodeErrorKind, offset: int, message: str, partial: dict[str, Any], unknown_records: int = 0) -> DecodeResult:
+    return DecodeResult(value=None, error=DecodeError(kind, offset, message), partial=partial, unknown_records=unknown_records)
+
+
+def _truncated(offset: int, expected: int, available: int) -> tuple[DecodeErrorKind, int, str]:
+    return DecodeErrorKind.TRUNCATED, offset, f"expected {expected} bytes at offset {offset}, got {max(available, 0)} bytes"
+
+
+def _read_bytes_map(
+        data: bytes, offset: int, end: int, map_type: type, header: struct.Struct, limit: int | None = None,
+        interner: Interner | None = None
+) -> tuple[Any, int, tuple[DecodeErrorKind, int, str] | None]:
+    bytes_map = map_type()
+    key_size = header.size
+    i = 0
+    while limit is None or i < limit:
+        if offset >= end:
+            break
+        if offset + key_size > end:
+            # Same as the strict reader: a partial zero key ends the map, anything else is truncated.
+            if not any(data[offset:end]):
+                break
+            return bytes_map, offset, _truncated(offset, key_size, end - offset)
+        key, = header.unpack_from(data, offset)
+        if key == 0:
+            offset += key_size
+            break
+        if offset + 2 * key_size > end:
+            return bytes_map, offset, _truncated(offset + key_size, key_size, end - offset - key_size)
+        length, = header.unpack_from(data, offset + key_size)
+        value_offset = offset + 2 * key_size
+        if value_offset + length > end:
+            return bytes_map, offset, _truncated(value_offset, length, end - value_offset)
+        value = data[value_offset:value_offset + length]
+        bytes_map[key] = interner.intern(value) if interner is not None else value
+        offset = value_offset + length
+        i += 1
+    return bytes_map, offset, None
+
+
+def _decode_tag_record(
+        data: bytes, offset: int, end: int, interner: Interner | None = None
+) -> tuple[NfcTagRecord | None, tuple[DecodeErrorKind, int, str] | None]:
+    record_type, record_size = _RECORD_HEADER.unpack_from(data, offset)
+    content_offset = offset + _RECORD_HEADER.size
+    if record_type == _TYPE_DEVICE:
+        if content_offset + _DEVICE_HEADER.size > end:
+            return None, _truncated(content_offset, _DEVICE_HEADER.size, end - content_offset)
+        device_type, flags, device_number = _DEVICE_HEADER.unpack_from(data, content_offset)
+        attributes_map, _, error = _read_bytes_map(
+            data, content_offset + _DEVICE_HEADER.size, end, UInt16BytesMap, _UINT16, interner=interner
+        )
+        if error is not None:
+            return None, error
+        return NfcTagDeviceRecord(
+            device_type=device_type,
+            flags=flags,
+            device_number=device_number,
+            attributes_map=attributes_map
+        ), None
+    elif record_type == _TYPE_ACTION:
+        if content_offset + _ACTION_HEADER.size > end:
+            return None, _truncated(content_offset, _ACTION_HEADER.size, end - content_offset)
+        action, condition, device_number, flags = _ACTION_HEADER.unpack_from(data, content_offset)
+        return NfcTagActionRecord(
+            action=action,
+            condition=condition,
+            device_number=device_number,
+            flags=flags,
+            condition_parameters=data[content_offset + _ACTION_HEADER.size:end] or None
+        ), None
+    else:
+        return NfcTagRawRecord(tag_type=record_type, content=data[content_offset:end]), None
+
+
+def decode_tag_app_data(data: bytes, interner: Interner | None = None) -> DecodeResult[NfcTagAppData]:
+    data = bytes(data)
+    size = len(data)
+    if size < _TAG_HEADER.size:
+        return _failure(*_truncated(0, _TAG_HEADER.size, size), partial={})
+    major_version, minor_version, write_time, flags, records_size = _TAG_HEADER.unpack_from(data, 0)
+    partial: dict[str, Any] = {
+        "major_version": major_version,
+        "minor_version": minor_version,
+        "write_time": write_time,
+        "flags": flags,
+    }
+    records = []
+    unknown_records = 0
+    offset = _TAG_HEADER.size
+    for _ in range(records_size):
+        if offset + _RECORD_HEADER.size > size:
+            partial["records"] = tuple(records)
+            return _failure(*_truncated(offset, _RECORD_HEADER.size, size - offset), partial=partial, unknown_records=unknown_records)
+        record_size = _RECORD_HEADER.unpack_from(data, offset)[1]
+        end = offset + record_size
+        if record_size < _RECORD_HEADER.size or end > size:
+            partial["records"] = tuple(records)
+            return _failure(
+                DecodeErrorKind.INVALID_RECORD_SIZE, offset, f"record size {record_size} out of range, {size - offset} bytes left",
+                partial=partial, unknown_records=unknown_records
+            )
+        record, error = _decode_tag_record(data, offset, end, interner)
+        if error is not None:
+            partial["records"] = tuple(records)
+            return _failure(*error, partial=partial, unknown_records=unknown_records)
+        if isinstance(record, NfcTagRawRecord):
+            unknown_records += 1
+        records.append(record)
+        offset = end
+    partial["records"] = tuple(records)
+    return DecodeResult(value=NfcTagAppData(**partial), partial=partial, unknown_records=unknown_records)
+
+
+def decode_handoff_app_data(data: bytes, interner: Interner | None = None) -> DecodeResult[HandoffAppData]:
+    data = bytes(data)
+    size = len(data)
+    if size < _HANDOFF_HEADER.size:
+        return _failure(*_truncated(0, _HANDOFF_HEADER.size, size), partial={})
+    major_version, minor_version, device_type, attributes_size = _HANDOFF_HEADER.unpack_from(data, 0)
+    partial: dict[str, Any] = {
+        "major_version": major_version,
+        "minor_version": minor_version,
+        "device_type": device_type,
+    }
+    attributes_map, offset, error = _read_bytes_map(
+        data, _HANDOFF_HEADER.size, size, UInt8BytesMap, _UINT8, attributes_size, interner
+    )
+    partial["attributes_map"] = attributes_map
+    if error is not None:
+        return _failure(*error, partial=partial)
+    if offset + _UINT8.size > size:
+        return _failure(*_truncated(offset, _UINT8.size, size - offset), partial=partial)
+    action_size = data[offset]
+    offset += _UINT8.size
+    if offset + action_size > size:
+        return _failure(*_truncated(offset, action_size, size - offset), partial=partial)
+    try:
+        action = data[offset:offset + action_size].decode("utf-8")
+    except UnicodeDecodeError as e:
+        return _failure(DecodeErrorKind.INVALID_TEXT, offset + e.start, f"invalid action text: {e.reason}", partial=partial)
+    partial["action"] = interner.intern(action) if interner is not None else action
+    payloads_map, _, error = _read_bytes_map(data, offset + action_size, size, UInt8BytesMap, _UINT8, interner=interner)
+    partial["payloads_map"] = payloads_map
+    if error is not None:
+        return _failure(*error, partial=partial)
+    return DecodeResult(value=HandoffAppData(**partial), partial=partial)
+
+
+def decode_app_data(protocol: XiaomiNfcProtocol, data: bytes, interner: Interner | None = None) -> DecodeResult[AppData]:
+    if protocol == HandoffNfcProtocol:
+        return decode_handoff_app_data(data, interner)
+    else:
+        return decode_tag_app_data(data, interner)
+
+
+def decode_mi_connect_data(mi_connect_data: MiConnectData, interner: Interner | None = None) -> DecodeResult[XiaomiNfcPayload]:
+    if not mi_connect_data.is_valid_nfc_payload:
+        return _failure(DecodeErrorKind.INVALID_NFC_PAYLOAD, 0, "Invalid MiConnectProtocol.Payload for NFC", partial={})
+    payload = mi_connect_data.container.data
+    partial: dict[str, Any] = {
+        "major_version": payload.versionMajor,
+        "minor_version": payload.versionMinor,
+        "id_hash": int.from_bytes(payload.idHash, byteorder="big", signed=False) if payload.idHash else None,
+    }
+    protocol = _PROTOCOLS.get(payload.flags[0])
+    if protocol is None:
+        return _failure(DecodeErrorKind.UNKNOWN_PROTOCOL, 0, f"Unknown protocol flag {payload.flags[0]}", partial=partial)
+    partial["protocol"] = protocol
+    result = decode_app_data(protocol, payload.appsData[0], interner)
+    if result.error is not None:
+        partial["appData"] = result.partial
+        return DecodeResult(value=None, error=result.error, partial=partial, unknown_records=result.unknown_records)
+    partial["appData"] = result.value
+    return DecodeResult(value=XiaomiNfcPayload(**partial), partial=partial, unknown_records=result.unknown_records)
+
+
+def decode(data: bytes, interner: Interner | None = None) -> DecodeResult[XiaomiNfcPayload]:
+    try:
+        container = Container.FromString(data)
+    except (message.DecodeError, UnicodeDecodeError) as e:
+        return _failure(DecodeErrorKind.INVALID_CONTAINER, 0, str(e), partial={})
+    return decode_mi_connect_data(MiConnectData(container), interner)
+
+
+def unwrap_ndef(data: bytes) -> tuple[XiaomiNdefTNF, bytes | None, DecodeError | None]:
+    try:
+        msg = NdefMessage.parse(bytes(data))
+    except (ValueError, IndexError) as e:
+        return XiaomiNdefTNF.UNKNOWN, None, DecodeError(DecodeErrorKind.INVALID_NDEF, 0, f"invalid NDEF message: {e}")
+    ndef_type = get_xiami_ndef_payload_type(msg)
+    if ndef_type == XiaomiNdefTNF.UNKNOWN:
+        return ndef_type, None, DecodeError(DecodeErrorKind.INVALID_NDEF, 0, "Xiaomi NDEF record not found")
+    return ndef_type, get_xiami_ndef_payload_bytes(msg, ndef_type), None
+
+
+def decode_ndef(data: bytes, interner: Interner | None = None) -> DecodeResult[XiaomiNfcPayload]:
+    ndef_type, payload, error = unwrap_ndef(data)
+    if error is not None:
+        return DecodeResult(value=None, error=error)
+    result = decode(payload, interner)
+    result.partial["ndef_type"] = ndef_type
+    return result
+
+
+def decode_batch(
+        items: Iterable[bytes], interner: Interner | None = None
+) -> tuple[list[DecodeResult[XiaomiNfcPayload]], DecodeSummary]:
+    summary = DecodeSummary()
+    results = []
+    for data in items:
+        result = decode(data, interner)
+        summary.add(result)
+        results.append(result)
+    return results, summary
+
+
+def decode_batch_threaded(
+        items: Iterable[bytes],
+        max_workers: int | None = None,
+        chunk_size: int = _THREADED_CHUNK_SIZE,
+        executor: Executor | None = None
+) -> tuple[list[DecodeResult[XiaomiNfcPayload]], DecodeSummary]:
+    if chunk_size <= 0:
+        raise ValueError("chunk_size must be positive")
+    # Decoding shares no mutable module state, chunks only amortize the executor overhead.
+    iterator = iter(items)
+    chunks = iter(lambda: list(itertools.islice(iterator, chunk_size)), [])
+    if executor is None:
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            chunk_results = list(pool.map(decode_batch, chunks))
+    else:
+        chunk_results = list(executor.map(decode_batch, chunks))
+    summary = DecodeSummary()
+    results = []
+    for chunk_result, chunk_summary in chunk_results:
+        results.extend(chunk_result)
+        summary.merge(chunk_summary)
+    return results, summary
@@ -0,0 +1,49 @@
+import json
+from typing import Any, Iterable, TextIO
+
+from .diagnostics import DecodeResult
+from .nfc import XiaomiNfcPayload
+from .tnf import XiaomiNdefTNF
+
+_JSON_ENCODER = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+
+
+def to_json_row(payload: XiaomiNfcPayload, ndef_type: XiaomiNdefTNF = XiaomiNdefTNF.MI_CONNECT_SERVICE, **extra: Any) -> str:
+    row = payload.to_dict(ndef_type)
+    row.update(extra)
+    return _JSON_ENCODER.encode(row)
+
+
+class JsonLinesWriter:
+    def __init__(self, file: TextIO, ndef_type: XiaomiNdefTNF = XiaomiNdefTNF.MI_CONNECT_SERVICE) -> None:
+        self._file = file
+        self.ndef_type: XiaomiNdefTNF = ndef_type
+        self.rows: int = 0
+
+    def _write_row(self, row: dict[str, Any]) -> None:
+        self._file.write(_JSON_ENCODER.encode(row))
+        self._file.write("\n")
+        self.rows += 1
+
+    def write(self, payload: XiaomiNfcPayload, **extra: Any) -> None:
+        row = payload.to_dict(self.ndef_type)
+        row.update(extra)
+        self._write_row(row)
+
+    def write_result(self, result: DecodeResult[XiaomiNfcPayload], **extra: Any) -> None:
+        if result.value is not None:
+            row = result.value.to_dict(self.ndef_type)
+        else:
+            row = {
+                "error": result.error.kind.value,
+                "error_offset": result.error.offset,
+                "error_message": result.error.message,
+            }
+        row.update(extra)
+        self._write_row(row)
+
+    def write_all(self, payloads: Iterable[XiaomiNfcPayload]) -> int:
+        start = self.rows
+        for payload in payloads:
+            self.write(payload)
+        return self.rows - start
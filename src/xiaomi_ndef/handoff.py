@@ -2,11 +2,14 @@ import dataclasses
 import enum
 from collections import OrderedDict
 from io import BytesIO
-from typing import Mapping, Iterable
+from types import MappingProxyType
+from typing import Any, Mapping, Iterable
 
 from ._utils import UINT8_BYTES_SIZE, UINT32_BYTES_SIZE
-from ._utils import read_uint8, read_uint32, read_bytes, write_uint8, write_uint32
+from ._utils import export_enum, export_text, import_enum, import_hex, import_text
 from .base import AppData, UInt8BytesMap
+from .interning import Interner
+from .schema import Codec, UIntField, StringField, BytesMapField, compile_schema
 
 
 @enum.unique
@@ -62,12 +65,24 @@ class PayloadKey(enum.Enum):
         else:
             return repr(data)
 
+    def export_data(self, data: bytes) -> str:
+        if self.is_text:
+            return export_text(data)
+        else:
+            return data.hex()
+
+    def import_data(self, value: str) -> bytes:
+        if self.is_text:
+            return import_text(value)
+        else:
+            return import_hex(value)
+
     @staticmethod
     def parse(value: int) -> 'PayloadKey':
-        for e in PayloadKey:
-            if e.value == value:
-                return e
-        return PayloadKey.UNKNOWN
+        return _PAYLOAD_KEYS.get(value, PayloadKey.UNKNOWN)
+
+
+_PAYLOAD_KEYS: Mapping[int, PayloadKey] = MappingProxyType({e.key_value: e for e in PayloadKey})
 
 
 @dataclasses.dataclass(frozen=True)
@@ -107,36 +122,67 @@ class HandoffAppData(AppData):
         bytes_map = UInt8BytesMap.read_from(BytesIO(buffer))
         return OrderedDict((PayloadKey.parse(k), v) for k, v in bytes_map.items())
 
-    def size(self) -> int:
-        return (
-                UINT8_BYTES_SIZE +  # major_version
-                UINT8_BYTES_SIZE +  # minor_version
-                UINT32_BYTES_SIZE +  # device_type
-                UINT8_BYTES_SIZE +  # attributes_map size
-                self.attributes_map.size() +  # attributes_map
-                UINT8_BYTES_SIZE +  # action size
-                len(self.action.encode("utf-8")) +  # action
-                self.payloads_map.size()  # payloads_map
+    def to_dict(self) -> dict[str, Any]:
+        payloads = {}
+        for key, value in self.payloads_map.items():
+            payload_key = PayloadKey.parse(key)
+            if payload_key == PayloadKey.UNKNOWN:
+                payloads[str(key)] = value.hex()
+            else:
+                payloads[payload_key.name] = payload_key.export_data(value)
+        return {
+            "major_version": self.major_version,
+            "minor_version": self.minor_version,
+            "device_type": export_enum(self.enum_device_type, self.device_type),
+            "attributes": {str(key): value.hex() for key, value in self.attributes_map.items()},
+            "action": self.action,
+            "payloads": payloads,
+        }
+
+    @staticmethod
+    def from_dict(data: Mapping[str, Any]) -> 'HandoffAppData':
+        payloads_map = UInt8BytesMap()
+        for key, value in data["payloads"].items():
+            if key.isdigit():
+                payloads_map[int(key)] = import_hex(value)
+            else:
+                payload_key = PayloadKey[key]
+                payloads_map[payload_key.key_value] = payload_key.import_data(value)
+        return HandoffAppData(
+            major_version=data["major_version"],
+            minor_version=data["minor_version"],
+            device_type=import_enum(DeviceType, data["device_type"]),
+            attributes_map=UInt8BytesMap((int(key), import_hex(value)) for key, value in data["attributes"].items()),
+            action=data["action"],
+            payloads_map=payloads_map,
         )
 
+    def __reduce_ex__(self, protocol):
+        # A zero key ends the encoded maps, fall back to the default reduction.
+        if 0 in self.attributes_map or 0 in self.payloads_map:
+            return super().__reduce_ex__(protocol)
+        return _decode_app_data, (self.encode(),)
+
+    def size(self) -> int:
+        return _APP_DATA_CODEC.size(self)
+
     def encode_into(self, buffer: BytesIO) -> None:
-        action_bytes = self.action.encode("utf-8")
-        write_uint8(buffer, self.major_version)
-        write_uint8(buffer, self.minor_version)
-        write_uint32(buffer, self.device_type)
-        write_uint8(buffer, len(self.attributes_map))
-        self.attributes_map.encode_into(buffer)
-        write_uint8(buffer, len(action_bytes))
-        buffer.write(action_bytes)
-        self.payloads_map.encode_into(buffer)
+        _APP_DATA_CODEC.encode_into(self, buffer)
 
     @staticmethod
-    def decode(buffer: BytesIO) -> 'HandoffAppData':
-        return HandoffAppData(
-            major_version=read_uint8(buffer),
-            minor_version=read_uint8(buffer),
-            device_type=read_uint32(buffer),
-            attributes_map=UInt8BytesMap.read_from(buffer, read_uint8(buffer)),
-            action=read_bytes(buffer, read_uint8(buffer)).decode("utf-8"),
-            payloads_map=UInt8BytesMap.read_from(buffer)
-        )
+    def decode(buffer: BytesIO, interner: Interner | None = None) -> 'HandoffAppData':
+        return _APP_DATA_CODEC.decode(buffer, interner)
+
+
+_APP_DATA_CODEC: Codec[HandoffAppData] = compile_schema(HandoffAppData, (
+    UIntField("major_version", UINT8_BYTES_SIZE),
+    UIntField("minor_version", UINT8_BYTES_SIZE),
+    UIntField("device_type", UINT32_BYTES_SIZE),
+    BytesMapField("attributes_map", UInt8BytesMap, UINT8_BYTES_SIZE),
+    StringField("action", UINT8_BYTES_SIZE),
+    BytesMapField("payloads_map", UInt8BytesMap),
+))
+
+
+def _decode_app_data(data: bytes) -> HandoffAppData:
+    return _APP_DATA_CODEC.decode(BytesIO(data))
@@ -0,0 +1,130 @@
+import enum
+import os
+import sqlite3
+from io import BytesIO
+from typing import Iterable, Iterator
+
+from . import diagnostics
+from .corpus import CorpusReader
+from .base import UInt16BytesMap
+from .handoff import HandoffAppData, PayloadKey
+from .tag import NfcTagAppData, NfcTagDeviceRecord, DeviceAttribute, _PREFIX_APP_DATA_MAP
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS postings ("
+    "kind INTEGER NOT NULL, key INTEGER NOT NULL, value BLOB NOT NULL, entry INTEGER NOT NULL, "
+    "PRIMARY KEY (kind, key, value, entry)) WITHOUT ROWID",
+)
+_META_ENTRIES = "entries"
+_META_FORMAT = "format"
+_FORMAT_VERSION = 2
+_BATCH_SIZE = 4096
+
+
+@enum.unique
+class IndexKind(enum.IntEnum):
+    DEVICE_ATTRIBUTE = 1
+    HANDOFF_PAYLOAD = 2
+
+
+def _to_bytes(value: str | bytes) -> bytes:
+    return value.encode("utf-8") if isinstance(value, str) else bytes(value)
+
+
+def _app_data_items(value: bytes) -> Iterable[tuple[int, bytes]]:
+    if not value.startswith(_PREFIX_APP_DATA_MAP):
+        return ()
+    try:
+        return UInt16BytesMap.read_from(BytesIO(value[len(_PREFIX_APP_DATA_MAP):])).items()
+    except ValueError:
+        return ()
+
+
+def _postings(entry: int, data: bytes) -> Iterator[tuple[int, int, bytes, int]]:
+    result = diagnostics.decode(data)
+    if result.value is None:
+        return
+    app_data = result.value.appData
+    if isinstance(app_data, NfcTagAppData):
+        for record in app_data.records:
+            if isinstance(record, NfcTagDeviceRecord):
+                for key, value in record.attributes_map.items():
+                    yield IndexKind.DEVICE_ATTRIBUTE, key, value, entry
+                    # Nested mxD maps use the same attribute keys, e.g. MACs written by the MiConnect service.
+                    if key == DeviceAttribute.APP_DATA.attribute_value:
+                        for nested_key, nested_value in _app_data_items(value):
+                            yield IndexKind.DEVICE_ATTRIBUTE, nested_key, nested_value, entry
+    elif isinstance(app_data, HandoffAppData):
+        for key, value in app_data.payloads_map.items():
+            yield IndexKind.HANDOFF_PAYLOAD, key, value, entry
+
+
+class AttributeIndex:
+    def __init__(self, path: str | os.PathLike) -> None:
+        self._connection = sqlite3.connect(path)
+        with self._connection:
+            for statement in _SCHEMA:
+                self._connection.execute(statement)
+            row = self._connection.execute("SELECT value FROM meta WHERE name = ?", (_META_FORMAT,)).fetchone()
+            if row is None or row[0] != _FORMAT_VERSION:
+                # Postings written by an older format are incomplete, the next update rebuilds them from the start.
+                self._connection.execute("DELETE FROM postings")
+                self._connection.execute("DELETE FROM meta")
+                self._connection.execute("INSERT INTO meta VALUES (?, ?)", (_META_FORMAT, _FORMAT_VERSION))
+
+    @property
+    def indexed_entries(self) -> int:
+        row = self._connection.execute("SELECT value FROM meta WHERE name = ?", (_META_ENTRIES,)).fetchone()
+        return row[0] if row is not None else 0
+
+    def update(self, reader: CorpusReader) -> int:
+        start = self.indexed_entries
+        if start > len(reader):
+            raise ValueError(f"index covers {start} entries, corpus only has {len(reader)}")
+        with self._connection:
+            batch = []
+            for entry in range(start, len(reader)):
+                batch.extend(_postings(entry, reader[entry]))
+                if len(batch) >= _BATCH_SIZE:
+                    self._connection.executemany("INSERT OR IGNORE INTO postings VALUES (?, ?, ?, ?)", batch)
+                    batch.clear()
+            if batch:
+                self._connection.executemany("INSERT OR IGNORE INTO postings VALUES (?, ?, ?, ?)", batch)
+            self._connection.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)", (_META_ENTRIES, len(reader)))
+        return len(reader) - start
+
+    def lookup_raw(self, kind: IndexKind, key: int, value: str | bytes) -> list[int]:
+        rows = self._connection.execute(
+            "SELECT entry FROM postings WHERE kind = ? AND key = ? AND value = ? ORDER BY entry",
+            (int(kind), key, _to_bytes(value))
+        )
+        return [row[0] for row in rows]
+
+    def lookup(self, key: DeviceAttribute | PayloadKey, value: str | bytes) -> list[int]:
+        if isinstance(key, DeviceAttribute):
+            return self.lookup_raw(IndexKind.DEVICE_ATTRIBUTE, key.attribute_value, value)
+        elif isinstance(key, PayloadKey):
+            return self.lookup_raw(IndexKind.HANDOFF_PAYLOAD, key.key_value, value)
+        else:
+            raise TypeError(f"Unsupported key type: {type(key)}")
+
+    def lookup_mac(self, mac: str) -> list[int]:
+        # Tag records store MACs as raw bytes, handoff payloads as text.
+        raw_mac = bytes.fromhex(mac.replace(":", "").replace("-", ""))
+        entries = set()
+        for attribute in (DeviceAttribute.WIFI_MAC_ADDRESS, DeviceAttribute.BLUETOOTH_MAC_ADDRESS, DeviceAttribute.NIC_MAC_ADDRESS):
+            entries.update(self.lookup(attribute, raw_mac))
+        for key in (PayloadKey.BLUETOOTH_MAC, PayloadKey.WIFI_MAC, PayloadKey.WIRED_MAC):
+            entries.update(self.lookup(key, mac.upper()))
+            entries.update(self.lookup(key, mac.lower()))
+        return sorted(entries)
+
+    def close(self) -> None:
+        self._connection.close()
+
+    def __enter__(self) -> 'AttributeIndex':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
@@ -0,0 +1,56 @@
+import dataclasses
+import sys
+from collections import OrderedDict
+from typing import TypeVar
+
+_V = TypeVar("_V", bytes, str)
+
+
+@dataclasses.dataclass
+class InternStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    saved_bytes: int = 0
+
+    @property
+    def lookups(self) -> int:
+        return self.hits + self.misses
+
+    @property
+    def hit_rate(self) -> float:
+        return self.hits / self.lookups if self.lookups else 0.0
+
+
+class Interner:
+    def __init__(self, max_size: int = 4096, max_value_size: int = 64) -> None:
+        if max_size <= 0:
+            raise ValueError("max_size must be positive")
+        self.max_size: int = max_size
+        self.max_value_size: int = max_value_size
+        self.stats: InternStats = InternStats()
+        self._table: OrderedDict[bytes | str, bytes | str] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._table)
+
+    def intern(self, value: _V) -> _V:
+        cached = self._table.get(value)
+        if cached is not None:
+            self._table.move_to_end(value)
+            self.stats.hits += 1
+            # The decoded duplicate is dropped as soon as the caller keeps the cached object instead.
+            self.stats.saved_bytes += sys.getsizeof(value)
+            return cached
+        self.stats.misses += 1
+        if len(value) > self.max_value_size:
+            return value
+        self._table[value] = value
+        if len(self._table) > self.max_size:
+            self._table.popitem(last=False)
+            self.stats.evictions += 1
+        return value
+
+    def clear(self) -> None:
+        self._table.clear()
+        self.stats = InternStats()
@@ -1,9 +1,14 @@
+import enum
+import warnings
 from typing import TypeVar
 
 # noinspection PyPackageRequirements
 from google.protobuf import json_format
+# noinspection PyPackageRequirements
+from google.protobuf.internal import api_implementation
 
 from .base import AppData
+from .interning import Interner
 from .nfc import XiaomiNfcPayload, XiaomiNfcProtocol
 from .proto.MiConnectProtocol_pb2 import Container, Payload
 
@@ -14,11 +19,51 @@ _PAYLOAD_APP_ID = 16378
 _PAYLOAD_DEVICE_TYPE = 15
 
 
+@enum.unique
+class ProtobufBackend(str, enum.Enum):
+    UNKNOWN = ""
+    UPB = "upb"
+    CPP = "cpp"
+    PYTHON = "python"
+
+    @property
+    def is_fast(self) -> bool:
+        return self == ProtobufBackend.UPB or self == ProtobufBackend.CPP
+
+    @staticmethod
+    def parse(value: str) -> 'ProtobufBackend':
+        try:
+            return ProtobufBackend(value)
+        except ValueError:
+            return ProtobufBackend.UNKNOWN
+
+
+def get_protobuf_backend() -> ProtobufBackend:
+    return ProtobufBackend.parse(api_implementation.Type())
+
+
+def require_fast_protobuf_backend(strict: bool = False) -> ProtobufBackend:
+    backend = get_protobuf_backend()
+    if not backend.is_fast:
+        message = (
+            f"Slow protobuf backend '{backend.value or 'unknown'}' is loaded, "
+            f"install a protobuf wheel with upb support or unset PROTOCOL_BUFFERS_PYTHON_IMPLEMENTATION"
+        )
+        if strict:
+            raise RuntimeError(message)
+        warnings.warn(message, RuntimeWarning, stacklevel=2)
+    return backend
+
+
 class MiConnectData:
 
     def __init__(self, container: Container) -> None:
         self._container: Container = container
 
+    @property
+    def container(self) -> Container:
+        return self._container
+
     @property
     def is_valid_nfc_payload(self) -> bool:
         return _PAYLOAD_APP_ID in self._container.data.appIds and \
@@ -32,7 +77,7 @@ class MiConnectData:
             raise ValueError("Invalid MiConnectProtocol.Payload for NFC")
         return XiaomiNfcProtocol.parse(self._container.data.flags[0])
 
-    def to_xiaomi_nfc_payload(self, protocol: XiaomiNfcProtocol[_T]) -> XiaomiNfcPayload[_T]:
+    def to_xiaomi_nfc_payload(self, protocol: XiaomiNfcProtocol[_T], interner: Interner | None = None) -> XiaomiNfcPayload[_T]:
         if not self.is_valid_nfc_payload:
             raise ValueError("Invalid MiConnectProtocol.Payload for NFC")
         nfc_protocol = self.get_nfc_protocol()
@@ -44,12 +89,15 @@ class MiConnectData:
             minor_version=self._container.data.versionMinor,
             id_hash=int.from_bytes(id_hash, byteorder="big", signed=False) if id_hash else None,
             protocol=nfc_protocol,
-            appData=nfc_protocol.decode(self._container.data.appsData[0]),
+            appData=nfc_protocol.decode(self._container.data.appsData[0], interner),
         )
 
     def to_bytes(self) -> bytes:
         return self._container.SerializeToString()
 
+    def __reduce__(self):
+        return MiConnectData.parse, (self.to_bytes(),)
+
     @staticmethod
     def parse(data: bytes) -> 'MiConnectData':
         return MiConnectData(Container.FromString(data))
@@ -1,3 +1,7 @@
+import dataclasses
+from types import MappingProxyType
+from typing import Mapping
+
 from pyndef import NdefMessage, NdefTNF, NdefRecord
 
 from .mi_connect import MiConnectData
@@ -8,6 +12,80 @@ _URI_MI_HOME = "https://g.home.mi.com"
 _PKG_MI_CONNECT_SERVICE = "com.xiaomi.mi_connect_service"
 _PKG_SMART_HOME = "com.xiaomi.smarthome"
 
+_FLAG_MB = 0x80
+_FLAG_ME = 0x40
+_FLAG_CF = 0x20
+_FLAG_SR = 0x10
+_FLAG_IL = 0x08
+_TNF_MASK = 0x07
+_SHORT_RECORD_MAX_PAYLOAD_SIZE = 0xff
+_SHORT_LENGTH_SIZE = 1
+_LONG_LENGTH_SIZE = 4
+
+_MI_TAP_RECORDS = (
+    NdefRecord.create_application_record(_PKG_SMART_HOME),
+    NdefRecord.create_application_record(_PKG_MI_CONNECT_SERVICE),
+    NdefRecord.create_uri(_URI_MI_HOME),
+)
+_MI_TAP_TRAILER_BYTES = b"".join(
+    record.to_bytes(False, i == len(_MI_TAP_RECORDS) - 1)
+    for i, record in enumerate(_MI_TAP_RECORDS)
+)
+_XIAOMI_RECORD_TYPES: Mapping[XiaomiNdefTNF, bytes] = MappingProxyType({
+    payload_type: payload_type.to_bytes()
+    for payload_type in XiaomiNdefTNF
+    if payload_type != XiaomiNdefTNF.UNKNOWN
+})
+
+
+@dataclasses.dataclass(frozen=True)
+class _RecordHeader:
+    flags: int
+    type_offset: int
+    type_size: int
+    id_size: int
+    payload_size: int
+
+    @property
+    def tnf(self) -> int:
+        return self.flags & _TNF_MASK
+
+    @property
+    def is_last(self) -> bool:
+        return bool(self.flags & _FLAG_ME)
+
+    @property
+    def payload_offset(self) -> int:
+        return self.type_offset + self.type_size + self.id_size
+
+    @property
+    def end(self) -> int:
+        return self.payload_offset + self.payload_size
+
+    def record_type(self, data: bytes) -> bytes:
+        return data[self.type_offset:self.type_offset + self.type_size]
+
+
+def _read_record_header(data: bytes, offset: int) -> _RecordHeader:
+    if offset + 2 > len(data):
+        raise ValueError("NDEF record header truncated")
+    flags = data[offset]
+    type_size = data[offset + 1]
+    position = offset + 2
+    length_size = _SHORT_LENGTH_SIZE if flags & _FLAG_SR else _LONG_LENGTH_SIZE
+    if position + length_size + (1 if flags & _FLAG_IL else 0) > len(data):
+        raise ValueError("NDEF record header truncated")
+    payload_size = int.from_bytes(data[position:position + length_size], byteorder="big", signed=False)
+    position += length_size
+    id_size = 0
+    if flags & _FLAG_IL:
+        id_size = data[position]
+        position += 1
+    header = _RecordHeader(flags, position, type_size, id_size, payload_size)
+    if header.end > len(data):
+        raise ValueError(f"NDEF record truncated, expected {header.end - offset} bytes, got {len(data) - offset} bytes")
+    return header
+
 
 def get_xiami_ndef_payload_type(msg: NdefMessage) -> XiaomiNdefTNF:
     for record in msg.records:
@@ -33,16 +111,35 @@ def new_xiaomi_ndef_record(payload_type: XiaomiNdefTNF, payload: XiaomiNfcPayloa
         raise ValueError("Unknown payload type")
     return NdefRecord(
         tnf=NdefTNF.EXTERNAL_TYPE,
-        record_type=payload_type.to_bytes(),
+        record_type=_XIAOMI_RECORD_TYPES[payload_type],
         record_id=None,
         payload=MiConnectData.from_nfc_payload(payload).to_bytes()
     )
 
 
 def new_mi_tap_ndef_message(record: NdefRecord) -> NdefMessage:
-    return NdefMessage(
-        record,
-        NdefRecord.create_application_record(_PKG_SMART_HOME),
-        NdefRecord.create_application_record(_PKG_MI_CONNECT_SERVICE),
-        NdefRecord.create_uri(_URI_MI_HOME),
-    )
+    return NdefMessage(record, *_MI_TAP_RECORDS)
+
+
+def encode_xiaomi_ndef_record(payload_type: XiaomiNdefTNF, data: bytes, flag_mb: bool = True, flag_me: bool = True) -> bytes:
+    record_type = _XIAOMI_RECORD_TYPES.get(payload_type)
+    if record_type is None:
+        raise ValueError("Unknown payload type")
+    flags = (_FLAG_MB if flag_mb else 0) | (_FLAG_ME if flag_me else 0) | NdefTNF.EXTERNAL_TYPE.value
+    if len(data) <= _SHORT_RECORD_MAX_PAYLOAD_SIZE:
+        header = bytes((flags | _FLAG_SR, len(record_type), len(data)))
+    else:
+        header = bytes((flags, len(record_type))) + len(data).to_bytes(length=4, byteorder="big", signed=False)
+    return b"".join((header, record_type, data))
+
+
+def encode_mi_tap_ndef_message(payload_type: XiaomiNdefTNF, data: bytes) -> bytes:
+    return b"".join((encode_xiaomi_ndef_record(payload_type, data, True, False), _MI_TAP_TRAILER_BYTES))
+
+
+def new_xiaomi_ndef_record_bytes(payload_type: XiaomiNdefTNF, payload: XiaomiNfcPayload) -> bytes:
+    return encode_xiaomi_ndef_record(payload_type, MiConnectData.from_nfc_payload(payload).to_bytes())
+
+
+def new_mi_tap_ndef_message_bytes(payload_type: XiaomiNdefTNF, payload: XiaomiNfcPayload) -> bytes:
+    return encode_mi_tap_ndef_message(payload_type, MiConnectData.from_nfc_payload(payload).to_bytes())
@@ -1,11 +1,13 @@
 import abc
 import dataclasses
 from io import BytesIO
-from typing import TypeVar, Generic
+from typing import Any, Mapping, TypeVar, Generic
 
 from .base import AppData
 from .handoff import HandoffAppData
+from .interning import Interner
 from .tag import NfcTagAppData
+from .tnf import XiaomiNdefTNF
 
 _T = TypeVar("_T", bound=AppData)
 
@@ -20,9 +22,12 @@ class XiaomiNfcProtocol(Generic[_T]):
     flags: int
 
     @abc.abstractmethod
-    def decode(self, data: bytes) -> _T:
+    def decode(self, data: bytes, interner: Interner | None = None) -> _T:
         raise NotImplemented
 
+    def __reduce__(self):
+        return XiaomiNfcProtocol.parse, (self.flags,)
+
     @staticmethod
     def parse(value: int) -> 'XiaomiNfcProtocol':
         if value == _FLAG_V1:
@@ -39,8 +44,8 @@ class XiaomiNfcProtocol(Generic[_T]):
 class _V1NfcProtocol(XiaomiNfcProtocol[NfcTagAppData]):
     flags: int = dataclasses.field(default=_FLAG_V1, init=False)
 
-    def decode(self, data: bytes) -> NfcTagAppData:
-        return NfcTagAppData.decode(BytesIO(data))
+    def decode(self, data: bytes, interner: Interner | None = None) -> NfcTagAppData:
+        return NfcTagAppData.decode(BytesIO(data), interner)
 
     def __str__(self) -> str:
         return self.__repr__()
@@ -53,8 +58,8 @@ class _V1NfcProtocol(XiaomiNfcProtocol[NfcTagAppData]):
 class _V2NfcProtocol(XiaomiNfcProtocol[NfcTagAppData]):
     flags: int = dataclasses.field(default=_FLAG_V2, init=False)
 
-    def decode(self, data: bytes) -> NfcTagAppData:
-        return NfcTagAppData.decode(BytesIO(data))
+    def decode(self, data: bytes, interner: Interner | None = None) -> NfcTagAppData:
+        return NfcTagAppData.decode(BytesIO(data), interner)
 
     def __str__(self) -> str:
         return self.__repr__()
@@ -67,8 +72,8 @@ class _V2NfcProtocol(XiaomiNfcProtocol[NfcTagAppData]):
 class _HandoffNfcProtocol(XiaomiNfcProtocol[HandoffAppData]):
     flags: int = dataclasses.field(default=_FLAG_HANDOFF, init=False)
 
-    def decode(self, data: bytes) -> HandoffAppData:
-        return HandoffAppData.decode(BytesIO(data))
+    def decode(self, data: bytes, interner: Interner | None = None) -> HandoffAppData:
+        return HandoffAppData.decode(BytesIO(data), interner)
 
     def __str__(self) -> str:
         return self.__repr__()
@@ -89,3 +94,33 @@ class XiaomiNfcPayload(Generic[_T]):
     id_hash: int | None
     protocol: XiaomiNfcProtocol[_T]
     appData: _T
+
+    @staticmethod
+    def from_dict(data: Mapping[str, Any]) -> 'XiaomiNfcPayload':
+        protocol = next((i for i in (V1NfcProtocol, V2NfcProtocol, HandoffNfcProtocol) if repr(i) == data["protocol"]), None)
+        if protocol is None:
+            raise ValueError(f"Unknown protocol {data['protocol']}")
+        if protocol == HandoffNfcProtocol:
+            app_data = HandoffAppData.from_dict(data["app_data"])
+        else:
+            app_data = NfcTagAppData.from_dict(data["app_data"])
+        return XiaomiNfcPayload(
+            major_version=data["major_version"],
+            minor_version=data["minor_version"],
+            id_hash=data["id_hash"],
+            protocol=protocol,
+            appData=app_data,
+        )
+
+    def to_dict(self, ndef_type: XiaomiNdefTNF = XiaomiNdefTNF.MI_CONNECT_SERVICE) -> dict[str, Any]:
+        if isinstance(self.appData, NfcTagAppData):
+            app_data = self.appData.to_dict(ndef_type)
+        else:
+            app_data = self.appData.to_dict()
+        return {
+            "major_version": self.major_version,
+            "minor_version": self.minor_version,
+            "id_hash": self.id_hash,
+            "protocol": repr(self.protocol),
+            "app_data": app_data,
+        }
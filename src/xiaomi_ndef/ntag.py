@@ -0,0 +1,156 @@
+import enum
+from typing import Iterable
+
+from pyndef import NdefMessage
+
+PAGE_SIZE = 4
+USER_DATA_PAGE = 4
+USER_DATA_OFFSET = USER_DATA_PAGE * PAGE_SIZE
+
+_TLV_NULL = 0x00
+_TLV_NDEF = 0x03
+_TLV_TERMINATOR = 0xfe
+_TLV_LONG_LENGTH = 0xff
+
+_TLV_SHORT_HEADER_SIZE = 2
+_TLV_LONG_HEADER_SIZE = 4
+_TLV_TERMINATOR_SIZE = 1
+_TLV_MAX_LENGTH = 0xfffe
+
+_CC_MAGIC = 0xe1
+_CC_VERSION = 0x10
+_CC_ACCESS = 0x00
+
+NdefBytes = bytes | bytearray | memoryview | NdefMessage
+
+
+@enum.unique
+class NtagType(enum.Enum):
+    NTAG213 = 144
+    NTAG215 = 504
+    NTAG216 = 888
+
+    @property
+    def user_memory_size(self) -> int:
+        return self.value
+
+    @property
+    def user_pages(self) -> int:
+        return self.value // PAGE_SIZE
+
+    @property
+    def capability_container(self) -> bytes:
+        return bytes((_CC_MAGIC, _CC_VERSION, self.value // 8, _CC_ACCESS))
+
+
+def _as_view(message: NdefBytes) -> memoryview:
+    if isinstance(message, NdefMessage):
+        return memoryview(message.to_bytes())
+    return memoryview(message).cast("B")
+
+
+def ndef_tlv_header_size(message_size: int) -> int:
+    if message_size < 0 or message_size > _TLV_MAX_LENGTH:
+        raise ValueError(f"NDEF message size {message_size} out of range")
+    return _TLV_SHORT_HEADER_SIZE if message_size < _TLV_LONG_LENGTH else _TLV_LONG_HEADER_SIZE
+
+
+def ndef_tlv_size(message_size: int) -> int:
+    return ndef_tlv_header_size(message_size) + message_size + _TLV_TERMINATOR_SIZE
+
+
+def image_size(message_size: int) -> int:
+    return -(-ndef_tlv_size(message_size) // PAGE_SIZE) * PAGE_SIZE
+
+
+def image_pages(message_size: int) -> int:
+    return image_size(message_size) // PAGE_SIZE
+
+
+def fits(message_size: int, tag_type: NtagType) -> bool:
+    return ndef_tlv_size(message_size) <= tag_type.user_memory_size
+
+
+def check_fits(message_size: int, tag_type: NtagType | None) -> None:
+    if tag_type is not None and not fits(message_size, tag_type):
+        raise ValueError(
+            f"NDEF message needs {ndef_tlv_size(message_size)} bytes, "
+            f"{tag_type.name} only has {tag_type.user_memory_size} bytes"
+        )
+
+
+def write_image_into(buffer: bytearray | memoryview, offset: int, message: NdefBytes) -> int:
+    view = _as_view(message)
+    size = len(view)
+    header_size = ndef_tlv_header_size(size)
+    end = offset + header_size + size
+    buffer[offset] = _TLV_NDEF
+    if header_size == _TLV_SHORT_HEADER_SIZE:
+        buffer[offset + 1] = size
+    else:
+        buffer[offset + 1] = _TLV_LONG_LENGTH
+        buffer[offset + 2] = size >> 8
+        buffer[offset + 3] = size & 0xff
+    buffer[offset + header_size:end] = view
+    buffer[end] = _TLV_TERMINATOR
+    return image_size(size)
+
+
+def build_image(message: NdefBytes, tag_type: NtagType | None = None) -> bytes:
+    view = _as_view(message)
+    check_fits(len(view), tag_type)
+    buffer = bytearray(image_size(len(view)))
+    write_image_into(buffer, 0, view)
+    return bytes(buffer)
+
+
+def build_images(messages: Iterable[NdefBytes], tag_type: NtagType | None = None) -> list[memoryview]:
+    views = [_as_view(message) for message in messages]
+    sizes = []
+    total_size = 0
+    for view in views:
+        check_fits(len(view), tag_type)
+        size = image_size(len(view))
+        sizes.append(size)
+        total_size += size
+
+    buffer = bytearray(total_size)
+    buffer_view = memoryview(buffer)
+    images = []
+    offset = 0
+    for view, size in zip(views, sizes):
+        write_image_into(buffer_view, offset, view)
+        images.append(buffer_view[offset:offset + size].toreadonly())
+        offset += size
+    return images
+
+
+def find_ndef_tlv(image: bytes | bytearray | memoryview, offset: int = 0) -> memoryview | None:
+    view = memoryview(image).cast("B")
+    end = len(view)
+    while offset < end:
+        tlv_type = view[offset]
+        if tlv_type == _TLV_TERMINATOR:
+            return None
+        offset += 1
+        if tlv_type == _TLV_NULL:
+            continue
+        if offset >= end:
+            raise ValueError("TLV length truncated")
+        length = view[offset]
+        offset += 1
+        if length == _TLV_LONG_LENGTH:
+            if offset + 2 > end:
+                raise ValueError("TLV long length truncated")
+            length = (view[offset] << 8) | view[offset + 1]
+            offset += 2
+        if offset + length > end:
+            raise ValueError(f"TLV value truncated, expected {length} bytes, got {end - offset} bytes")
+        if tlv_type == _TLV_NDEF:
+            return view[offset:offset + length]
+        offset += length
+    return None
+
+
+def parse_dump(dump: bytes | bytearray | memoryview) -> memoryview | None:
+    return find_ndef_tlv(dump, USER_DATA_OFFSET)
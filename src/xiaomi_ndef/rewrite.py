@@ -0,0 +1,140 @@
+import dataclasses
+from typing import Iterator
+
+from . import ntag
+
+_CC_PAGE = 3
+_CC_SIZE_OFFSET = 2
+_TAG_TYPES_BY_CC_SIZE = {tag_type.value // 8: tag_type for tag_type in ntag.NtagType}
+
+
+@dataclasses.dataclass(frozen=True)
+class PageWrite:
+    page: int
+    data: bytes
+
+
+@dataclasses.dataclass(frozen=True)
+class WritePlan:
+    writes: tuple[PageWrite, ...]
+    image_pages: int
+
+    def __len__(self) -> int:
+        return len(self.writes)
+
+    def __iter__(self) -> Iterator[PageWrite]:
+        return iter(self.writes)
+
+    @property
+    def skipped_pages(self) -> int:
+        # The TLV length page is written twice by a multi page update, it is still one page of the image.
+        return self.image_pages - len({write.page for write in self.writes})
+
+    @property
+    def bytes_written(self) -> int:
+        return len(self.writes) * ntag.PAGE_SIZE
+
+
+class TagMemory:
+    def __init__(self, dump: bytes | bytearray | memoryview, tag_type: ntag.NtagType | None = None) -> None:
+        if len(dump) < ntag.USER_DATA_OFFSET or len(dump) % ntag.PAGE_SIZE != 0:
+            raise ValueError(f"Tag dump size {len(dump)} is not a whole number of pages after the header")
+        self.tag_type: ntag.NtagType | None = tag_type if tag_type is not None else detect_tag_type(dump)
+        self.pages_written: int = 0
+        self._memory = bytearray(dump)
+
+    @staticmethod
+    def blank(tag_type: ntag.NtagType) -> 'TagMemory':
+        header = bytes(_CC_PAGE * ntag.PAGE_SIZE) + tag_type.capability_container
+        return TagMemory(header + bytes(tag_type.user_memory_size), tag_type)
+
+    @property
+    def user_pages(self) -> int:
+        return len(self._memory) // ntag.PAGE_SIZE - ntag.USER_DATA_PAGE
+
+    def read_page(self, page: int) -> bytes:
+        if not 0 <= page < len(self._memory) // ntag.PAGE_SIZE:
+            raise ValueError(f"Page {page} out of range")
+        return bytes(self._memory[page * ntag.PAGE_SIZE:(page + 1) * ntag.PAGE_SIZE])
+
+    def write_page(self, page: int, data: bytes) -> None:
+        # UID, lock bytes and the capability container are not rewritten by provisioning.
+        if not ntag.USER_DATA_PAGE <= page < len(self._memory) // ntag.PAGE_SIZE:
+            raise ValueError(f"Page {page} is not writable user memory")
+        if len(data) != ntag.PAGE_SIZE:
+            raise ValueError(f"Page write must be {ntag.PAGE_SIZE} bytes, got {len(data)} bytes")
+        self._memory[page * ntag.PAGE_SIZE:(page + 1) * ntag.PAGE_SIZE] = data
+        self.pages_written += 1
+
+    def apply(self, plan: WritePlan) -> None:
+        for write in plan:
+            self.write_page(write.page, write.data)
+
+    def ndef_message(self) -> bytes | None:
+        message = ntag.parse_dump(self._memory)
+        return None if message is None else bytes(message)
+
+    def dump(self) -> bytes:
+        return bytes(self._memory)
+
+
+def detect_tag_type(dump: bytes | bytearray | memoryview) -> ntag.NtagType | None:
+    if len(dump) < ntag.USER_DATA_OFFSET:
+        return None
+    return _TAG_TYPES_BY_CC_SIZE.get(dump[_CC_PAGE * ntag.PAGE_SIZE + _CC_SIZE_OFFSET])
+
+
+def plan_rewrite(
+        dump: bytes | bytearray | memoryview,
+        message: ntag.NdefBytes,
+        tag_type: ntag.NtagType | None = None,
+        verify: bool = True
+) -> WritePlan:
+    memory = TagMemory(dump, tag_type)
+    image = ntag.build_image(message, memory.tag_type)
+    if len(image) > memory.user_pages * ntag.PAGE_SIZE:
+        raise ValueError(f"Tag image needs {len(image)} bytes, dump only has {memory.user_pages * ntag.PAGE_SIZE} bytes")
+    expected = bytes(ntag.find_ndef_tlv(image))
+    # Bytes after the terminator are never read, whatever is on the tag there may stay.
+    used_size = ntag.ndef_tlv_size(len(expected))
+    header_end_page = ntag.USER_DATA_PAGE + -(-ntag.ndef_tlv_header_size(len(expected)) // ntag.PAGE_SIZE)
+
+    writes = []
+    for i in range(len(image) // ntag.PAGE_SIZE):
+        page = ntag.USER_DATA_PAGE + i
+        current = memory.read_page(page)
+        start = i * ntag.PAGE_SIZE
+        keep = max(0, start + ntag.PAGE_SIZE - used_size)
+        target = image[start:start + ntag.PAGE_SIZE - keep] + current[ntag.PAGE_SIZE - keep:]
+        if target != current:
+            writes.append(PageWrite(page, target))
+    if len(writes) > 1:
+        # A single page write is atomic, anything longer follows the Type 2 update procedure: the NDEF TLV
+        # length is set to 0 first, then the body is written, and the real length goes last. A torn write
+        # leaves either the old message or an empty one on the tag, never a mix of both.
+        current = memory.read_page(ntag.USER_DATA_PAGE)
+        if writes[0].page != ntag.USER_DATA_PAGE:
+            writes.insert(0, PageWrite(ntag.USER_DATA_PAGE, current))
+        writes.sort(key=lambda write: (write.page < header_end_page, write.page))
+        empty_length = ntag.build_image(b"")[:ntag.ndef_tlv_header_size(0)]
+        writes.insert(0, PageWrite(ntag.USER_DATA_PAGE, empty_length + current[len(empty_length):]))
+    plan = WritePlan(tuple(writes), len(image) // ntag.PAGE_SIZE)
+
+    if verify:
+        _verify(memory, plan, expected)
+    return plan
+
+
+def _verify(memory: TagMemory, plan: WritePlan, expected: bytes) -> None:
+    # Every state a reader can see between two page writes must hold a whole message.
+    original = memory.ndef_message()
+    for write in plan:
+        memory.write_page(write.page, write.data)
+        try:
+            message = memory.ndef_message()
+        except ValueError as e:
+            raise ValueError(f"Write plan leaves a corrupted NDEF TLV after writing page {write.page}") from e
+        if message not in (original, b"", expected):
+            raise ValueError(f"Write plan leaves a partial NDEF message after writing page {write.page}")
+    if memory.ndef_message() != expected:
+        raise ValueError("Write plan does not reproduce the NDEF message")
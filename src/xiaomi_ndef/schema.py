@@ -0,0 +1,284 @@
+import abc
+import dataclasses
+import struct
+from io import BytesIO
+from types import MappingProxyType
+from typing import Any, Callable, Generic, Mapping, Sequence, TypeVar
+
+from ._utils import UINT8_BYTES_SIZE, UINT16_BYTES_SIZE, UINT32_BYTES_SIZE
+from .base import BinaryData
+
+_T = TypeVar("_T")
+
+_STRUCT_FORMATS: Mapping[int, str] = MappingProxyType({
+    UINT8_BYTES_SIZE: "B",
+    UINT16_BYTES_SIZE: "H",
+    UINT32_BYTES_SIZE: "I",
+})
+
+
+def _struct_format(size: int) -> str:
+    try:
+        return _STRUCT_FORMATS[size]
+    except KeyError:
+        raise ValueError(f"Unsupported integer size {size}") from None
+
+
+@dataclasses.dataclass(frozen=True)
+class _FixedItem:
+    format: str
+    encode_expr: str
+    decode_var: str
+
+
+@dataclasses.dataclass(frozen=True)
+class _Step:
+    encode: tuple[str, ...] = ()
+    decode: tuple[str, ...] = ()
+    size: str | None = None
+
+
+@dataclasses.dataclass(frozen=True)
+class Field(abc.ABC):
+    name: str
+
+    @property
+    def _value_var(self) -> str:
+        return f"f_{self.name}"
+
+    @property
+    def _prefix_var(self) -> str:
+        return f"n_{self.name}"
+
+    def _prepare(self) -> tuple[str, ...]:
+        return f"{self._value_var} = obj.{self.name}",
+
+    @abc.abstractmethod
+    def _prefix(self) -> _FixedItem | None:
+        raise NotImplemented
+
+    @abc.abstractmethod
+    def _step(self, symbol: str) -> _Step | None:
+        raise NotImplemented
+
+    def _symbols(self, symbol: str) -> dict[str, Any]:
+        return {}
+
+
+@dataclasses.dataclass(frozen=True)
+class UIntField(Field):
+    size: int
+
+    def _prepare(self) -> tuple[str, ...]:
+        return ()
+
+    def _prefix(self) -> _FixedItem:
+        return _FixedItem(_struct_format(self.size), f"obj.{self.name}", self._value_var)
+
+    def _step(self, symbol: str) -> None:
+        return None
+
+
+@dataclasses.dataclass(frozen=True)
+class BytesField(Field):
+    length_size: int | None = None
+    optional: bool = False
+
+    def _prefix(self) -> _FixedItem | None:
+        if self.length_size is None:
+            return None
+        return _FixedItem(_struct_format(self.length_size), f"len({self._value_var})", self._prefix_var)
+
+    def _step(self, symbol: str) -> _Step:
+        value = self._value_var
+        if self.length_size is None:
+            return _Step(
+                encode=(f"if {value}:", f"    buffer.write({value})"),
+                decode=(f"{value} = buffer.read(){' or None' if self.optional else ''}",),
+                size=f"(len({value}) if {value} else 0)",
+            )
+        return _Step(
+            encode=(f"buffer.write({value})",),
+            decode=(
+                f"{value} = buffer.read({self._prefix_var})",
+                f"if len({value}) != {self._prefix_var}:",
+                f"    raise ValueError(f\"read {self.name} failed, read {{len({value})}} bytes, "
+                f"expected {{{self._prefix_var}}} bytes\")",
+            ),
+            size=f"len({value})",
+        )
+
+
+@dataclasses.dataclass(frozen=True)
+class StringField(Field):
+    length_size: int
+    encoding: str = "utf-8"
+
+    def _prepare(self) -> tuple[str, ...]:
+        return f"{self._value_var} = obj.{self.name}.encode({self.encoding!r})",
+
+    def _prefix(self) -> _FixedItem:
+        return _FixedItem(_struct_format(self.length_size), f"len({self._value_var})", self._prefix_var)
+
+    def _step(self, symbol: str) -> _Step:
+        value = self._value_var
+        return _Step(
+            encode=(f"buffer.write({value})",),
+            decode=(
+                f"{value} = buffer.read({self._prefix_var})",
+                f"if len({value}) != {self._prefix_var}:",
+                f"    raise ValueError(f\"read {self.name} failed, read {{len({value})}} bytes, "
+                f"expected {{{self._prefix_var}}} bytes\")",
+                f"{value} = {value}.decode({self.encoding!r})",
+                f"if interner is not None:",
+                f"    {value} = interner.intern({value})",
+            ),
+            size=f"len({value})",
+        )
+
+
+@dataclasses.dataclass(frozen=True)
+class BytesMapField(Field):
+    map_type: type
+    count_size: int | None = None
+
+    def _prefix(self) -> _FixedItem | None:
+        if self.count_size is None:
+            return None
+        return _FixedItem(_struct_format(self.count_size), f"len({self._value_var})", self._prefix_var)
+
+    def _step(self, symbol: str) -> _Step:
+        count = self._prefix_var if self.count_size is not None else "None"
+        return _Step(
+            encode=(f"{self._value_var}.encode_into(buffer)",),
+            decode=(
+                f"if interner is None:",
+                f"    {self._value_var} = {symbol}.read_from(buffer, {count})",
+                f"else:",
+                f"    {self._value_var} = {symbol}.read_from(buffer, {count}, interner)",
+            ),
+            size=f"{self._value_var}.size()",
+        )
+
+    def _symbols(self, symbol: str) -> dict[str, Any]:
+        return {symbol: self.map_type}
+
+
+@dataclasses.dataclass(frozen=True)
+class RecordsField(Field):
+    record_type: type[BinaryData]
+    count_size: int
+
+    def _prefix(self) -> _FixedItem:
+        return _FixedItem(_struct_format(self.count_size), f"len({self._value_var})", self._prefix_var)
+
+    def _step(self, symbol: str) -> _Step:
+        value = self._value_var
+        return _Step(
+            encode=(f"for item in {value}:", "    item.encode_into(buffer)"),
+            decode=(
+                f"if interner is None:",
+                f"    {value} = tuple({symbol}.decode(buffer) for _ in range({self._prefix_var}))",
+                f"else:",
+                f"    {value} = tuple({symbol}.decode(buffer, interner) for _ in range({self._prefix_var}))",
+            ),
+            size=f"sum(item.size() for item in {value})",
+        )
+
+    def _symbols(self, symbol: str) -> dict[str, Any]:
+        return {symbol: self.record_type}
+
+
+@dataclasses.dataclass(frozen=True)
+class Codec(Generic[_T]):
+    name: str
+    size: Callable[[_T], int]
+    encode_into: Callable[[_T, BytesIO], None]
+    decode: Callable[..., _T]
+    source: str = dataclasses.field(repr=False)
+    # Fixed size fields at the start of the layout, lets hand written decoders read the same layout without drifting.
+    header: struct.Struct | None = dataclasses.field(default=None, repr=False)
+
+
+def _indent(lines: Sequence[str], level: int = 1) -> list[str]:
+    return ["    " * level + line for line in lines]
+
+
+def compile_schema(factory: Callable[..., _T], fields: Sequence[Field], name: str | None = None) -> Codec[_T]:
+    name = name or getattr(factory, "__name__", "schema")
+    namespace: dict[str, Any] = {"_factory": factory, "_struct_error": struct.error}
+
+    prepare_lines: list[str] = []
+    encode_lines: list[str] = []
+    decode_lines: list[str] = []
+    size_terms: list[str] = []
+    fixed_size = 0
+    struct_count = 0
+    group: list[_FixedItem] = []
+    header: struct.Struct | None = None
+
+    def _flush() -> None:
+        nonlocal fixed_size, struct_count, header
+        if not group:
+            return
+        symbol = f"_struct_{struct_count}"
+        struct_count += 1
+        packer = struct.Struct(">" + "".join(item.format for item in group))
+        namespace[symbol] = packer
+        if not decode_lines:
+            header = packer
+        fixed_size += packer.size
+        encode_lines.append(f"buffer.write({symbol}.pack({', '.join(item.encode_expr for item in group)}))")
+        targets = ", ".join(item.decode_var for item in group)
+        decode_lines.extend((
+            f"data = buffer.read({packer.size})",
+            f"if len(data) != {packer.size}:",
+            f"    raise ValueError(f\"read {name} failed, read {{len(data)}} bytes, expected {packer.size} bytes\")",
+            f"{targets}, = {symbol}.unpack(data)",
+        ))
+        group.clear()
+
+    for i, field in enumerate(fields):
+        symbol = f"_type_{i}"
+        namespace.update(field._symbols(symbol))
+        prepare_lines.extend(field._prepare())
+        prefix = field._prefix()
+        if prefix is not None:
+            group.append(prefix)
+        step = field._step(symbol)
+        if step is not None:
+            _flush()
+            encode_lines.extend(step.encode)
+            decode_lines.extend(step.decode)
+            if step.size is not None:
+                size_terms.append(step.size)
+    _flush()
+
+    arguments = ", ".join(f"{field.name}={field._value_var}" for field in fields)
+    source_lines = [
+        "def size(obj):",
+        *_indent(prepare_lines),
+        f"    return {' + '.join([str(fixed_size), *size_terms])}",
+        "",
+        "def encode_into(obj, buffer):",
+        *_indent(prepare_lines),
+        "    try:",
+        *_indent(encode_lines, 2),
+        "    except _struct_error as e:",
+        "        raise ValueError(f\"value out of range: {e}\") from e",
+        "",
+        "def decode(buffer, interner=None):",
+        *_indent(decode_lines),
+        f"    return _factory({arguments})",
+        "",
+    ]
+    source = "\n".join(source_lines)
+    exec(compile(source, f"<schema {name}>", "exec"), namespace)
+    return Codec(
+        name=name,
+        size=namespace["size"],
+        encode_into=namespace["encode_into"],
+        decode=namespace["decode"],
+        source=source,
+        header=header,
+    )
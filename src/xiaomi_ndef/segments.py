@@ -0,0 +1,233 @@
+import bisect
+import dataclasses
+import heapq
+import mmap
+import os
+import struct
+import tempfile
+from pathlib import Path
+from typing import Iterable, Iterator
+
+# noinspection PyPackageRequirements
+from google.protobuf import message
+
+from .corpus import CorpusFormatError
+from .mi_connect import MiConnectData
+from .nfc import XiaomiNfcPayload, V1NfcProtocol, V2NfcProtocol
+from .proto.MiConnectProtocol_pb2 import Container
+from .tag import NfcTagAppData
+
+_MAGIC = b"XNDS"
+_FOOTER_MAGIC = b"XNDT"
+_VERSION = 1
+_SEGMENT_SUFFIX = ".xnds"
+_TAG_PROTOCOL_FLAGS = (V1NfcProtocol.flags, V2NfcProtocol.flags)
+
+# magic, version, header size
+_HEADER = struct.Struct(">4sHI")
+# entry payload size
+_ENTRY_HEADER = struct.Struct(">I")
+# write time, entry payload offset
+_INDEX_ITEM = struct.Struct(">IQ")
+# min write time, max write time, index offset, entries count, footer magic
+_FOOTER = struct.Struct(">IIQI4s")
+
+
+def payload_write_time(data: bytes) -> int | None:
+    try:
+        container = Container.FromString(data)
+    except (message.DecodeError, UnicodeDecodeError):
+        return None
+    payload = container.data
+    if len(payload.flags) == 0 or payload.flags[0] not in _TAG_PROTOCOL_FLAGS or len(payload.appsData) == 0:
+        return None
+    return NfcTagAppData.peek_write_time(payload.appsData[0])
+
+
+@dataclasses.dataclass(frozen=True)
+class SegmentInfo:
+    path: Path
+    min_write_time: int
+    max_write_time: int
+    count: int
+
+
+def write_segment(path: str | os.PathLike, entries: Iterable[tuple[int, bytes]]) -> SegmentInfo:
+    entries = sorted(entries, key=lambda i: i[0])
+    if not entries:
+        raise ValueError("segment must contain at least one entry")
+    index = bytearray(len(entries) * _INDEX_ITEM.size)
+    with open(path, "wb") as file:
+        file.write(_HEADER.pack(_MAGIC, _VERSION, _HEADER.size))
+        offset = _HEADER.size
+        for i, (write_time, data) in enumerate(entries):
+            file.write(_ENTRY_HEADER.pack(len(data)))
+            file.write(data)
+            offset += _ENTRY_HEADER.size
+            _INDEX_ITEM.pack_into(index, i * _INDEX_ITEM.size, write_time, offset)
+            offset += len(data)
+        file.write(index)
+        file.write(_FOOTER.pack(entries[0][0], entries[-1][0], offset, len(entries), _FOOTER_MAGIC))
+    return SegmentInfo(Path(path), entries[0][0], entries[-1][0], len(entries))
+
+
+class Segment:
+    def __init__(self, path: str | os.PathLike) -> None:
+        self.path: Path = Path(path)
+        with open(path, "rb") as file:
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self.info: SegmentInfo = self._read_info()
+        except Exception:
+            self._mmap.close()
+            raise
+        self._view = memoryview(self._mmap)
+
+    def _read_info(self) -> SegmentInfo:
+        size = len(self._mmap)
+        if size < _HEADER.size + _FOOTER.size:
+            raise CorpusFormatError("segment truncated")
+        magic, version, header_size = _HEADER.unpack_from(self._mmap, 0)
+        if magic != _MAGIC:
+            raise CorpusFormatError("not a segment file")
+        if version != _VERSION:
+            raise CorpusFormatError(f"unsupported segment version {version}")
+        min_write_time, max_write_time, index_offset, count, footer_magic = _FOOTER.unpack_from(self._mmap, size - _FOOTER.size)
+        if footer_magic != _FOOTER_MAGIC or index_offset + count * _INDEX_ITEM.size + _FOOTER.size != size:
+            raise CorpusFormatError("segment footer missing or truncated")
+        self._index_offset = index_offset
+        return SegmentInfo(self.path, min_write_time, max_write_time, count)
+
+    def __len__(self) -> int:
+        return self.info.count
+
+    def _index_item(self, i: int) -> tuple[int, int]:
+        return _INDEX_ITEM.unpack_from(self._mmap, self._index_offset + i * _INDEX_ITEM.size)
+
+    def write_time(self, i: int) -> int:
+        return self._index_item(i)[0]
+
+    def raw(self, i: int) -> memoryview:
+        _, offset = self._index_item(i)
+        size, = _ENTRY_HEADER.unpack_from(self._mmap, offset - _ENTRY_HEADER.size)
+        return self._view[offset:offset + size]
+
+    def overlaps(self, start: int, end: int) -> bool:
+        return self.info.min_write_time <= end and start <= self.info.max_write_time
+
+    def query(self, start: int, end: int) -> Iterator[tuple[int, memoryview]]:
+        if not self.overlaps(start, end):
+            return
+        positions = range(self.info.count)
+        first = bisect.bisect_left(positions, start, key=self.write_time)
+        last = bisect.bisect_right(positions, end, lo=first, key=self.write_time)
+        for i in range(first, last):
+            yield self.write_time(i), self.raw(i)
+
+    def close(self) -> None:
+        self._view.release()
+        try:
+            self._mmap.close()
+        except BufferError:
+            # Entries returned by query() are still referenced, the file is unmapped once the last of them is released.
+            pass
+
+
+# Segments are cut by entry count on flush, not by write time buckets. A segment covers whatever range its
+# entries span, so out of order or backfilled traffic gives segments with overlapping ranges, and a query
+# opens every segment whose range overlaps it. Only the footer range check skips a segment.
+class SegmentWriter:
+    def __init__(self, directory: str | os.PathLike, segment_size: int = 1 << 16) -> None:
+        if segment_size <= 0:
+            raise ValueError("segment_size must be positive")
+        self.directory: Path = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.segment_size: int = segment_size
+        self.skipped: int = 0
+        self.segments: list[SegmentInfo] = []
+        self._pending: list[tuple[int, bytes]] = []
+        self._next_number = max((int(i.stem) for i in self.directory.glob(f"*{_SEGMENT_SUFFIX}") if i.stem.isdigit()), default=-1) + 1
+
+    def append(self, data: bytes) -> bool:
+        data = bytes(data)
+        write_time = payload_write_time(data)
+        if write_time is None:
+            self.skipped += 1
+            return False
+        self._pending.append((write_time, data))
+        if len(self._pending) >= self.segment_size:
+            self.flush()
+        return True
+
+    def extend(self, items: Iterable[bytes]) -> int:
+        return sum(self.append(data) for data in items)
+
+    def flush(self) -> None:
+        if not self._pending:
+            return
+        fd, temp_name = tempfile.mkstemp(suffix=".tmp", dir=self.directory)
+        os.close(fd)
+        temp_path = Path(temp_name)
+        try:
+            info = write_segment(temp_path, self._pending)
+            # Readers only ever see complete segments, and linking fails instead of replacing a segment another writer took.
+            while True:
+                path = self.directory / f"{self._next_number:08d}{_SEGMENT_SUFFIX}"
+                self._next_number += 1
+                try:
+                    os.link(temp_path, path)
+                    break
+                except FileExistsError:
+                    continue
+        finally:
+            temp_path.unlink()
+        self.segments.append(dataclasses.replace(info, path=path))
+        self._pending.clear()
+
+    def close(self) -> None:
+        self.flush()
+
+    def __enter__(self) -> 'SegmentWriter':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+
+class SegmentStore:
+    def __init__(self, directory: str | os.PathLike) -> None:
+        self.directory: Path = Path(directory)
+        self._segments: list[Segment] = []
+        try:
+            for path in sorted(self.directory.glob(f"*{_SEGMENT_SUFFIX}")):
+                self._segments.append(Segment(path))
+        except Exception:
+            self.close()
+            raise
+
+    @property
+    def segments(self) -> list[SegmentInfo]:
+        return [segment.info for segment in self._segments]
+
+    def __len__(self) -> int:
+        return sum(len(segment) for segment in self._segments)
+
+    def query(self, start: int, end: int) -> Iterator[tuple[int, memoryview]]:
+        # Segments from concurrent writers overlap in time, each is sorted so a k-way merge keeps the result ordered.
+        return heapq.merge(*(segment.query(start, end) for segment in self._segments), key=lambda i: i[0])
+
+    def decode_range(self, start: int, end: int) -> Iterator[XiaomiNfcPayload[NfcTagAppData]]:
+        for _, data in self.query(start, end):
+            mi_connect_data = MiConnectData.parse(data)
+            yield mi_connect_data.to_xiaomi_nfc_payload(mi_connect_data.get_nfc_protocol())
+
+    def close(self) -> None:
+        for segment in self._segments:
+            segment.close()
+        self._segments.clear()
+
+    def __enter__(self) -> 'SegmentStore':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
@@ -0,0 +1,166 @@
+import argparse
+import hashlib
+import heapq
+import io
+import json
+import os
+import struct
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Iterable, Iterator, Sequence
+
+from . import diagnostics
+from .corpus import CorpusReader, CorpusWriter
+from .diagnostics import DecodeErrorKind, DecodeSummary
+from .export import JsonLinesWriter
+
+_GLOBAL_INDEX = struct.Struct(">Q")
+_INPUT_NAME = "shard-{:04d}.xndc"
+_OUTPUT_NAME = "shard-{:04d}.tsv"
+_STATS_NAME = "shard-{:04d}.stats.json"
+
+
+def shard_of(data: bytes, shards: int) -> int:
+    digest = hashlib.blake2b(data, digest_size=8).digest()
+    return int.from_bytes(digest, byteorder="big") % shards
+
+
+def _summary_to_dict(summary: DecodeSummary) -> dict:
+    return {
+        "total": summary.total,
+        "succeeded": summary.succeeded,
+        "unknown_records": summary.unknown_records,
+        "errors": {kind.value: count for kind, count in sorted(summary.errors.items(), key=lambda i: i[0].value)},
+    }
+
+
+def _summary_from_dict(data: dict) -> DecodeSummary:
+    summary = DecodeSummary(total=data["total"], succeeded=data["succeeded"], unknown_records=data["unknown_records"])
+    summary.errors.update({DecodeErrorKind(kind): count for kind, count in data["errors"].items()})
+    return summary
+
+
+def partition(corpus_paths: Iterable[str | os.PathLike], work_dir: str | os.PathLike, shards: int) -> list[Path]:
+    if shards <= 0:
+        raise ValueError("shards must be positive")
+    work_dir = Path(work_dir)
+    work_dir.mkdir(parents=True, exist_ok=True)
+    paths = [work_dir / _INPUT_NAME.format(i) for i in range(shards)]
+    writers = [CorpusWriter(path, append=False) for path in paths]
+    try:
+        global_index = 0
+        for corpus_path in corpus_paths:
+            with CorpusReader(corpus_path) as reader:
+                for data in map(bytes, reader):
+                    # Entries keep their position in the input, which orders the merged output.
+                    writers[shard_of(data, shards)].append(_GLOBAL_INDEX.pack(global_index) + data)
+                    global_index += 1
+    finally:
+        for writer in writers:
+            writer.close()
+    return paths
+
+
+def process_shard(input_path: str | os.PathLike, output_path: str | os.PathLike, stats_path: str | os.PathLike) -> DecodeSummary:
+    summary = DecodeSummary()
+    row = io.StringIO()
+    row_writer = JsonLinesWriter(row)
+    with CorpusReader(input_path) as reader, open(output_path, "w", encoding="utf-8", newline="\n") as output:
+        for entry in map(bytes, reader):
+            global_index, = _GLOBAL_INDEX.unpack_from(entry)
+            result = diagnostics.decode(entry[_GLOBAL_INDEX.size:])
+            summary.add(result)
+            row.seek(0)
+            row.truncate()
+            row_writer.write_result(result)
+            output.write(f"{global_index}\t{row.getvalue()}")
+    with open(stats_path, "w", encoding="utf-8") as file:
+        json.dump(_summary_to_dict(summary), file, sort_keys=True)
+    return summary
+
+
+def _read_rows(path: Path) -> Iterator[tuple[int, str]]:
+    with open(path, "r", encoding="utf-8", newline="\n") as file:
+        for line in file:
+            global_index, row = line.split("\t", 1)
+            yield int(global_index), row
+
+
+def merge(
+        output_paths: Sequence[str | os.PathLike],
+        stats_paths: Sequence[str | os.PathLike],
+        merged_path: str | os.PathLike
+) -> DecodeSummary:
+    # Every shard output is already ordered by global index, so a k-way merge restores the input order.
+    with open(merged_path, "w", encoding="utf-8", newline="\n") as merged:
+        for _, row in heapq.merge(*(_read_rows(Path(path)) for path in output_paths), key=lambda i: i[0]):
+            merged.write(row)
+    summary = DecodeSummary()
+    for path in stats_paths:
+        with open(path, "r", encoding="utf-8") as file:
+            summary.merge(_summary_from_dict(json.load(file)))
+    return summary
+
+
+def run_local(
+        corpus_paths: Iterable[str | os.PathLike],
+        work_dir: str | os.PathLike,
+        merged_path: str | os.PathLike,
+        shards: int,
+        processes: int | None = None
+) -> DecodeSummary:
+    work_dir = Path(work_dir)
+    input_paths = partition(corpus_paths, work_dir, shards)
+    output_paths = [work_dir / _OUTPUT_NAME.format(i) for i in range(shards)]
+    stats_paths = [work_dir / _STATS_NAME.format(i) for i in range(shards)]
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        # Worker processes stand in for nodes, each job only touches its own files.
+        list(executor.map(process_shard, input_paths, output_paths, stats_paths))
+    return merge(output_paths, stats_paths, merged_path)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Decode corpus files as independent shard jobs and merge the results.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    partition_parser = commands.add_parser("partition", help="hash partition corpus files into shard inputs")
+    partition_parser.add_argument("input", type=Path, nargs="+", help="corpus files, in order")
+    partition_parser.add_argument("-w", "--work-dir", type=Path, required=True)
+    partition_parser.add_argument("-n", "--shards", type=int, required=True)
+    process_parser = commands.add_parser("process", help="decode one shard")
+    process_parser.add_argument("shard", type=int)
+    process_parser.add_argument("-w", "--work-dir", type=Path, required=True)
+    merge_parser = commands.add_parser("merge", help="merge shard outputs and stats")
+    merge_parser.add_argument("-w", "--work-dir", type=Path, required=True)
+    merge_parser.add_argument("-n", "--shards", type=int, required=True)
+    merge_parser.add_argument("-o", "--output", type=Path, required=True, help="merged JSON Lines file")
+    run_parser = commands.add_parser("run", help="partition, process with local worker processes and merge")
+    run_parser.add_argument("input", type=Path, nargs="+", help="corpus files, in order")
+    run_parser.add_argument("-w", "--work-dir", type=Path, required=True)
+    run_parser.add_argument("-n", "--shards", type=int, required=True)
+    run_parser.add_argument("-o", "--output", type=Path, required=True, help="merged JSON Lines file")
+    run_parser.add_argument("-j", "--processes", type=int, default=None)
+    args = parser.parse_args()
+
+    if args.command == "partition":
+        for path in partition(args.input, args.work_dir, args.shards):
+            print(path)
+        return
+    elif args.command == "process":
+        summary = process_shard(
+            args.work_dir / _INPUT_NAME.format(args.shard),
+            args.work_dir / _OUTPUT_NAME.format(args.shard),
+            args.work_dir / _STATS_NAME.format(args.shard),
+        )
+    elif args.command == "merge":
+        summary = merge(
+            [args.work_dir / _OUTPUT_NAME.format(i) for i in range(args.shards)],
+            [args.work_dir / _STATS_NAME.format(i) for i in range(args.shards)],
+            args.output,
+        )
+    else:
+        summary = run_local(args.input, args.work_dir, args.output, args.shards, args.processes)
+    print(json.dumps(_summary_to_dict(summary), sort_keys=True))
+
+
+if __name__ == "__main__":
+    main()
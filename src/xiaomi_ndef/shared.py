@@ -0,0 +1,95 @@
+import dataclasses
+import struct
+from multiprocessing import resource_tracker, shared_memory
+from typing import Iterable, Iterator
+
+from .mi_connect import MiConnectData
+from .nfc import XiaomiNfcPayload
+
+# entries count
+_HEADER = struct.Struct(">I")
+_OFFSET = struct.Struct(">I")
+
+
+@dataclasses.dataclass(frozen=True)
+class SharedBatchHandle:
+    name: str
+    size: int
+
+
+def _to_bytes(item: XiaomiNfcPayload | bytes) -> bytes:
+    if isinstance(item, XiaomiNfcPayload):
+        return MiConnectData.from_nfc_payload(item).to_bytes()
+    return bytes(item)
+
+
+def pack_batch(items: Iterable[XiaomiNfcPayload | bytes]) -> SharedBatchHandle:
+    entries = [_to_bytes(item) for item in items]
+    count = len(entries)
+    data_offset = _HEADER.size + (count + 1) * _OFFSET.size
+    size = data_offset + sum(len(entry) for entry in entries)
+    memory = shared_memory.SharedMemory(create=True, size=max(size, 1))
+    try:
+        buffer = memory.buf
+        _HEADER.pack_into(buffer, 0, count)
+        offset = data_offset
+        for i, entry in enumerate(entries):
+            _OFFSET.pack_into(buffer, _HEADER.size + i * _OFFSET.size, offset)
+            buffer[offset:offset + len(entry)] = entry
+            offset += len(entry)
+        _OFFSET.pack_into(buffer, _HEADER.size + count * _OFFSET.size, offset)
+    except BaseException:
+        memory.close()
+        memory.unlink()
+        raise
+    # The block outlives this process, the receiving side unlinks it. Without this the resource tracker
+    # of a worker process would unlink it as leaked as soon as the worker exits.
+    resource_tracker.unregister(memory._name, "shared_memory")
+    memory.close()
+    return SharedBatchHandle(memory.name, size)
+
+
+class SharedBatch:
+    def __init__(self, handle: SharedBatchHandle) -> None:
+        self._memory = shared_memory.SharedMemory(name=handle.name)
+        self._view = self._memory.buf[:handle.size]
+        self._count, = _HEADER.unpack_from(self._view, 0)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _bounds(self, i: int) -> tuple[int, int]:
+        if i < 0:
+            i += self._count
+        if not 0 <= i < self._count:
+            raise IndexError("shared batch index out of range")
+        return _OFFSET.unpack_from(self._view, _HEADER.size + i * _OFFSET.size)[0], \
+            _OFFSET.unpack_from(self._view, _HEADER.size + (i + 1) * _OFFSET.size)[0]
+
+    def raw(self, i: int) -> memoryview:
+        start, end = self._bounds(i)
+        return self._view[start:end]
+
+    def __getitem__(self, i: int) -> XiaomiNfcPayload:
+        # Copy out of the shared block, decoded objects must not keep it alive.
+        mi_connect_data = MiConnectData.parse(bytes(self.raw(i)))
+        return mi_connect_data.to_xiaomi_nfc_payload(mi_connect_data.get_nfc_protocol())
+
+    def __iter__(self) -> Iterator[XiaomiNfcPayload]:
+        for i in range(self._count):
+            yield self[i]
+
+    def close(self, unlink: bool = True) -> None:
+        self._view.release()
+        self._memory.close()
+        if unlink:
+            self._memory.unlink()
+        else:
+            # Someone else owns the block, keep this process's resource tracker from unlinking it.
+            resource_tracker.unregister(self._memory._name, "shared_memory")
+
+    def __enter__(self) -> 'SharedBatch':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
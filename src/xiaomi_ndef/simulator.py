@@ -0,0 +1,253 @@
+import argparse
+import dataclasses
+import random
+import socket
+import struct
+import sys
+import time
+from array import array
+from typing import BinaryIO, Callable
+
+from . import diagnostics, handoff, tag, xiaomi
+from .mi_connect import MiConnectData
+from .nfc import XiaomiNfcPayload
+
+# send time in monotonic nanoseconds, frame size
+_FRAME_HEADER = struct.Struct(">QI")
+_MAX_SLEEP_AHEAD = 0.001
+_SOUND_BOX_MODELS = ("xiaomi.wifispeaker.x08c", "xiaomi.wifispeaker.l05c", "xiaomi.wifispeaker.lx06")
+_CIRCULATE_DEVICE_TYPES = (tag.DeviceType.MI_TV, tag.DeviceType.MI_PHONE, tag.DeviceType.MI_LAPTOP)
+_HANDOFF_DEVICE_TYPES = (handoff.DeviceType.PC, handoff.DeviceType.TV, handoff.DeviceType.PAD)
+_PERCENTILES = (50, 90, 99)
+
+
+@dataclasses.dataclass(frozen=True)
+class TrafficMix:
+    mi_tap: float = 0.4
+    circulate: float = 0.3
+    screen_mirror: float = 0.2
+    tv_cast: float = 0.1
+    malformed_rate: float = 0.0
+
+    def __post_init__(self) -> None:
+        if min(self.mi_tap, self.circulate, self.screen_mirror, self.tv_cast) < 0 or self.total_weight <= 0:
+            raise ValueError("traffic weights must be non-negative with a positive sum")
+        if not 0 <= self.malformed_rate <= 1:
+            raise ValueError("malformed_rate must be in [0, 1]")
+
+    @property
+    def total_weight(self) -> float:
+        return self.mi_tap + self.circulate + self.screen_mirror + self.tv_cast
+
+
+class TrafficGenerator:
+    def __init__(self, mix: TrafficMix = TrafficMix(), seed: int | None = None) -> None:
+        self.mix: TrafficMix = mix
+        self._random = random.Random(seed)
+        self._builders: tuple[Callable[[], XiaomiNfcPayload], ...] = (
+            self._new_mi_tap,
+            self._new_circulate,
+            self._new_screen_mirror,
+            self._new_tv_cast,
+        )
+        self._weights = (mix.mi_tap, mix.circulate, mix.screen_mirror, mix.tv_cast)
+
+    def _mac(self) -> bytes:
+        return self._random.randbytes(6)
+
+    def _write_time(self) -> int:
+        return self._random.getrandbits(32)
+
+    def _new_mi_tap(self) -> XiaomiNfcPayload:
+        return xiaomi.new_mi_tap_sound_box(
+            self._write_time(), self._mac(), self._mac(), self._random.choice(_SOUND_BOX_MODELS)
+        )[1]
+
+    def _new_circulate(self) -> XiaomiNfcPayload:
+        return xiaomi.new_circulate(self._write_time(), self._random.choice(_CIRCULATE_DEVICE_TYPES), self._mac(), self._mac())[1]
+
+    def _new_screen_mirror(self) -> XiaomiNfcPayload:
+        return xiaomi.new_handoff_screen_mirror(
+            self._random.choice(_HANDOFF_DEVICE_TYPES), self._mac().hex(":").upper(), self._random.random() < 0.5
+        )[1]
+
+    def _new_tv_cast(self) -> XiaomiNfcPayload:
+        return xiaomi.new_handoff_tv_cast(handoff.DeviceType.TV, self._mac().hex(":").upper(), self._mac().hex(":").upper())[1]
+
+    def _malform(self, data: bytes) -> bytes:
+        kind = self._random.randrange(3)
+        if kind == 0:
+            return data[:self._random.randrange(len(data))]
+        elif kind == 1:
+            corrupted = bytearray(data)
+            for _ in range(self._random.randint(1, 4)):
+                corrupted[self._random.randrange(len(corrupted))] = self._random.getrandbits(8)
+            return bytes(corrupted)
+        else:
+            return self._random.randbytes(self._random.randint(1, len(data)))
+
+    def payload(self) -> XiaomiNfcPayload:
+        return self._random.choices(self._builders, self._weights)[0]()
+
+    def frame(self) -> tuple[bytes, bool]:
+        data = MiConnectData.from_nfc_payload(self.payload()).to_bytes()
+        if self._random.random() < self.mix.malformed_rate:
+            return self._malform(data), True
+        return data, False
+
+
+@dataclasses.dataclass(frozen=True)
+class SendReport:
+    frames: int
+    malformed: int
+    seconds: float
+
+    @property
+    def frames_per_second(self) -> float:
+        return self.frames / self.seconds if self.seconds else 0.0
+
+
+@dataclasses.dataclass(frozen=True)
+class LoadReport:
+    frames: int
+    seconds: float
+    summary: diagnostics.DecodeSummary
+    latency_percentiles: dict[int, float]
+    max_latency: float
+
+    @property
+    def frames_per_second(self) -> float:
+        return self.frames / self.seconds if self.seconds else 0.0
+
+
+def send(generator: TrafficGenerator, sink: BinaryIO, count: int, rate: float | None = None) -> SendReport:
+    malformed = 0
+    start = time.monotonic()
+    for i in range(count):
+        data, is_malformed = generator.frame()
+        malformed += is_malformed
+        if rate is not None:
+            # Pace against the schedule rather than the previous frame, so sleep jitter does not accumulate.
+            ahead = start + i / rate - time.monotonic()
+            if ahead > _MAX_SLEEP_AHEAD:
+                sink.flush()
+                time.sleep(ahead)
+        sink.write(_FRAME_HEADER.pack(time.monotonic_ns(), len(data)))
+        sink.write(data)
+    sink.flush()
+    return SendReport(frames=count, malformed=malformed, seconds=time.monotonic() - start)
+
+
+def _percentile(values: list[float], percent: int) -> float:
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, max(0, round(percent / 100 * len(values)) - 1))]
+
+
+def consume(source: BinaryIO, limit: int | None = None) -> LoadReport:
+    summary = diagnostics.DecodeSummary()
+    latencies = array("d")
+    start = end = None
+    while limit is None or summary.total < limit:
+        header = source.read(_FRAME_HEADER.size)
+        if len(header) < _FRAME_HEADER.size:
+            break
+        sent_ns, size = _FRAME_HEADER.unpack(header)
+        data = source.read(size)
+        if len(data) < size:
+            raise ValueError(f"frame truncated, read {len(data)} bytes, expected {size} bytes")
+        if start is None:
+            start = time.monotonic()
+        summary.add(diagnostics.decode(data))
+        end = time.monotonic()
+        latencies.append((time.monotonic_ns() - sent_ns) / 1e9)
+    ordered = sorted(latencies)
+    return LoadReport(
+        frames=summary.total,
+        seconds=end - start if start is not None else 0.0,
+        summary=summary,
+        latency_percentiles={i: _percentile(ordered, i) for i in _PERCENTILES},
+        max_latency=ordered[-1] if ordered else 0.0,
+    )
+
+
+def _parse_address(value: str) -> tuple[str, int]:
+    host, _, port = value.rpartition(":")
+    return host or "127.0.0.1", int(port)
+
+
+def _open_sink(target: str) -> BinaryIO:
+    if target == "-":
+        return sys.stdout.buffer
+    elif target.startswith("tcp://"):
+        return socket.create_connection(_parse_address(target[6:])).makefile("wb")
+    elif target.startswith("unix://"):
+        connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        connection.connect(target[7:])
+        return connection.makefile("wb")
+    else:
+        return open(target, "wb")
+
+
+def _open_source(target: str) -> BinaryIO:
+    if target == "-":
+        return sys.stdin.buffer
+    elif target.startswith("tcp://") or target.startswith("unix://"):
+        if target.startswith("tcp://"):
+            server = socket.create_server(_parse_address(target[6:]))
+        else:
+            server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            server.bind(target[7:])
+            server.listen(1)
+        with server:
+            connection, _ = server.accept()
+        return connection.makefile("rb")
+    else:
+        return open(target, "rb")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Simulate tag reader traffic and measure the decode pipeline.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    send_parser = commands.add_parser("send", help="write generated frames")
+    send_parser.add_argument("-o", "--output", default="-", help="file, '-', tcp://HOST:PORT or unix://PATH")
+    send_parser.add_argument("-n", "--count", type=int, default=100000, help="frames to send")
+    send_parser.add_argument("-r", "--rate", type=float, default=None, help="target frames per second, unlimited by default")
+    send_parser.add_argument("--mix", type=float, nargs=4, default=None, metavar=("MI_TAP", "CIRCULATE", "MIRROR", "TV_CAST"),
+                             help="relative weights of the generated payloads")
+    send_parser.add_argument("--malformed", type=float, default=0.0, help="fraction of malformed frames")
+    send_parser.add_argument("--seed", type=int, default=None)
+    consume_parser = commands.add_parser("consume", help="decode frames and report throughput and latency")
+    consume_parser.add_argument("-i", "--input", default="-", help="file, '-', tcp://HOST:PORT or unix://PATH to listen on")
+    consume_parser.add_argument("-n", "--count", type=int, default=None, help="stop after this many frames")
+    args = parser.parse_args()
+
+    if args.command == "send":
+        weights = dict(zip(("mi_tap", "circulate", "screen_mirror", "tv_cast"), args.mix)) if args.mix else {}
+        generator = TrafficGenerator(TrafficMix(**weights, malformed_rate=args.malformed), args.seed)
+        sink = _open_sink(args.output)
+        try:
+            report = send(generator, sink, args.count, args.rate)
+        finally:
+            sink.close()
+        print(
+            f"sent {report.frames} frames ({report.malformed} malformed) in {report.seconds:.2f}s, "
+            f"{report.frames_per_second:.0f} frames/s",
+            file=sys.stderr
+        )
+    else:
+        source = _open_source(args.input)
+        try:
+            report = consume(source, args.count)
+        finally:
+            source.close()
+        percentiles = ", ".join(f"p{i} {value * 1000:.2f}ms" for i, value in report.latency_percentiles.items())
+        print(
+            f"decoded {report.frames} frames ({report.summary.failed} failed) in {report.seconds:.2f}s, "
+            f"{report.frames_per_second:.0f} frames/s, latency {percentiles}, max {report.max_latency * 1000:.2f}ms",
+            file=sys.stderr
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,351 @@
+import dataclasses
+import enum
+import struct
+from collections.abc import Generator
+from io import BytesIO
+from types import MappingProxyType
+from typing import Mapping, TypeVar
+
+from pyndef import NdefTNF
+
+from .base import UInt8BytesMap
+from .handoff import HandoffAppData, _APP_DATA_CODEC as _HANDOFF_APP_DATA_CODEC
+from .mi_connect import _PAYLOAD_NAME, _PAYLOAD_APP_ID, _PAYLOAD_DEVICE_TYPE
+from .ndef import _FLAG_ME, _FLAG_CF, _FLAG_SR, _FLAG_IL, _TNF_MASK, _XIAOMI_RECORD_TYPES
+from .nfc import XiaomiNfcPayload, XiaomiNfcProtocol, HandoffNfcProtocol
+from .ntag import _TLV_NULL, _TLV_NDEF, _TLV_TERMINATOR, _TLV_LONG_LENGTH
+from .proto.MiConnectProtocol_pb2 import Container, Payload
+from .tag import NfcTagAppData, NfcTagRecord, _RECORD_HEADER, _APP_DATA_CODEC as _TAG_APP_DATA_CODEC
+from .tnf import XiaomiNdefTNF
+
+
+_WIRE_VARINT = 0
+_WIRE_FIXED64 = 1
+_WIRE_LENGTH_DELIMITED = 2
+_WIRE_FIXED32 = 5
+_VARINT_MAX_SHIFT = 64
+
+_UINT8 = struct.Struct(">B")
+_UINT16 = struct.Struct(">H")
+_UINT32 = struct.Struct(">I")
+_TAG_HEADER = _TAG_APP_DATA_CODEC.header
+_HANDOFF_HEADER = _HANDOFF_APP_DATA_CODEC.header
+
+_T = TypeVar("_T")
+
+_XIAOMI_RECORD_TYPE_VALUES: Mapping[bytes, XiaomiNdefTNF] = MappingProxyType({
+    value: key for key, value in _XIAOMI_RECORD_TYPES.items()
+})
+
+# A generator step yields the number of bytes it needs and is sent exactly that many bytes back.
+_Step = Generator[int, bytes, _T]
+
+
+@enum.unique
+class StreamLayer(enum.Enum):
+    TLV = "tlv"
+    NDEF = "ndef"
+    MI_CONNECT = "mi_connect"
+
+
+class ParserEvent:
+    pass
+
+
+@dataclasses.dataclass(frozen=True)
+class NdefHeaderParsed(ParserEvent):
+    payload_type: XiaomiNdefTNF
+    payload_size: int
+
+
+@dataclasses.dataclass(frozen=True)
+class ProtocolKnown(ParserEvent):
+    major_version: int
+    minor_version: int
+    protocol: XiaomiNfcProtocol
+
+
+@dataclasses.dataclass(frozen=True)
+class TagHeaderParsed(ParserEvent):
+    major_version: int
+    minor_version: int
+    write_time: int
+    flags: int
+    records_size: int
+
+
+@dataclasses.dataclass(frozen=True)
+class HandoffHeaderParsed(ParserEvent):
+    major_version: int
+    minor_version: int
+    device_type: int
+    attributes_map: UInt8BytesMap
+    action: str
+
+
+@dataclasses.dataclass(frozen=True)
+class RecordParsed(ParserEvent):
+    index: int
+    record: NfcTagRecord
+
+
+@dataclasses.dataclass(frozen=True)
+class Done(ParserEvent):
+    payload: XiaomiNfcPayload
+
+
+class PushParser:
+    def __init__(self, layer: StreamLayer = StreamLayer.NDEF) -> None:
+        self.layer: StreamLayer = layer
+        self.offset: int = 0
+        self.done: bool = False
+        self._buffer = bytearray()
+        self._events: list[ParserEvent] = []
+        if layer == StreamLayer.TLV:
+            self._steps = self._parse_tlv()
+        elif layer == StreamLayer.NDEF:
+            self._steps = self._parse_ndef()
+        else:
+            self._steps = self._parse_container(None)
+        self._need = next(self._steps)
+
+    def feed(self, chunk: bytes) -> list[ParserEvent]:
+        if self.done:
+            return []
+        self._buffer += chunk
+        while len(self._buffer) >= self._need:
+            data = bytes(self._buffer[:self._need])
+            del self._buffer[:self._need]
+            self.offset += self._need
+            try:
+                self._need = self._steps.send(data)
+            except StopIteration as e:
+                self._events.append(Done(e.value))
+                self.done = True
+                break
+            except ValueError:
+                self.done = True
+                raise
+        events, self._events = self._events, []
+        return events
+
+    def close(self) -> None:
+        if not self.done:
+            raise ValueError(f"stream truncated at offset {self.offset}, expected {self._need - len(self._buffer)} more bytes")
+
+    @staticmethod
+    def _read_varint() -> _Step[int]:
+        result = shift = 0
+        while shift < _VARINT_MAX_SHIFT:
+            byte, = yield 1
+            result |= (byte & 0x7f) << shift
+            if byte < 0x80:
+                return result
+            shift += 7
+        raise ValueError("varint too long")
+
+    def _skip_field(self, wire_type: int) -> _Step[None]:
+        if wire_type == _WIRE_VARINT:
+            yield from self._read_varint()
+        elif wire_type == _WIRE_FIXED64:
+            yield 8
+        elif wire_type == _WIRE_LENGTH_DELIMITED:
+            size = yield from self._read_varint()
+            if size > 0:
+                yield size
+        elif wire_type == _WIRE_FIXED32:
+            yield 4
+        else:
+            raise ValueError(f"Unsupported protobuf wire type {wire_type}")
+
+    def _read_length_delimited(self, wire_type: int) -> _Step[bytes]:
+        if wire_type != _WIRE_LENGTH_DELIMITED:
+            raise ValueError(f"Wrong protobuf wire type {wire_type}")
+        size = yield from self._read_varint()
+        return (yield size) if size > 0 else b""
+
+    def _parse_tlv(self) -> _Step[XiaomiNfcPayload]:
+        while True:
+            tlv_type, = yield 1
+            if tlv_type == _TLV_NULL:
+                continue
+            if tlv_type == _TLV_TERMINATOR:
+                raise ValueError("NDEF TLV not found")
+            size, = yield 1
+            if size == _TLV_LONG_LENGTH:
+                size, = _UINT16.unpack((yield _UINT16.size))
+            if tlv_type == _TLV_NDEF:
+                return (yield from self._parse_ndef())
+            if size > 0:
+                yield size
+
+    def _parse_ndef(self) -> _Step[XiaomiNfcPayload]:
+        while True:
+            flags, type_size = yield 2
+            if flags & _FLAG_CF:
+                raise ValueError("Chunked NDEF records are not supported")
+            if flags & _FLAG_SR:
+                payload_size, = yield 1
+            else:
+                payload_size, = _UINT32.unpack((yield _UINT32.size))
+            id_size = (yield 1)[0] if flags & _FLAG_IL else 0
+            record_type = (yield type_size) if type_size > 0 else b""
+            if id_size > 0:
+                yield id_size
+            payload_type = XiaomiNdefTNF.UNKNOWN
+            if flags & _TNF_MASK == NdefTNF.EXTERNAL_TYPE.value:
+                payload_type = _XIAOMI_RECORD_TYPE_VALUES.get(record_type, XiaomiNdefTNF.UNKNOWN)
+            if payload_type != XiaomiNdefTNF.UNKNOWN:
+                self._events.append(NdefHeaderParsed(payload_type, payload_size))
+                return (yield from self._parse_container(payload_size))
+            if flags & _FLAG_ME:
+                raise ValueError("Xiaomi NDEF record not found")
+            if payload_size > 0:
+                yield payload_size
+
+    def _parse_container(self, size: int | None) -> _Step[XiaomiNfcPayload]:
+        end = self.offset + size if size is not None else None
+        while end is None or self.offset < end:
+            field_number, wire_type = self._split_key((yield from self._read_varint()))
+            if field_number == Container.DATA_FIELD_NUMBER:
+                if wire_type != _WIRE_LENGTH_DELIMITED:
+                    raise ValueError(f"Wrong protobuf wire type {wire_type}")
+                payload = yield from self._parse_payload((yield from self._read_varint()))
+                if end is not None and self.offset < end:
+                    # Nothing after the payload is used, but the record still has to be complete.
+                    yield end - self.offset
+                return payload
+            yield from self._skip_field(wire_type)
+        raise ValueError("MiConnectProtocol.Container has no data")
+
+    @staticmethod
+    def _split_key(key: int) -> tuple[int, int]:
+        return key >> 3, key & 0x07
+
+    def _parse_payload(self, size: int) -> _Step[XiaomiNfcPayload]:
+        end = self.offset + size
+        major_version = minor_version = device_type = 0
+        name = ""
+        id_hash = b""
+        app_ids = []
+        protocol = None
+        app_data = None
+        raw_app_data = None
+        while self.offset < end:
+            field_number, wire_type = self._split_key((yield from self._read_varint()))
+            if field_number == Payload.VERSIONMAJOR_FIELD_NUMBER and wire_type == _WIRE_VARINT:
+                major_version = yield from self._read_varint()
+            elif field_number == Payload.VERSIONMINOR_FIELD_NUMBER and wire_type == _WIRE_VARINT:
+                minor_version = yield from self._read_varint()
+            elif field_number == Payload.FLAGS_FIELD_NUMBER:
+                flags = yield from self._read_length_delimited(wire_type)
+                if len(flags) == 0:
+                    raise ValueError("Invalid MiConnectProtocol.Payload for NFC")
+                protocol = XiaomiNfcProtocol.parse(flags[0])
+                self._events.append(ProtocolKnown(major_version, minor_version, protocol))
+            elif field_number == Payload.NAME_FIELD_NUMBER:
+                name = (yield from self._read_length_delimited(wire_type)).decode("utf-8")
+            elif field_number == Payload.IDHASH_FIELD_NUMBER:
+                id_hash = yield from self._read_length_delimited(wire_type)
+            elif field_number == Payload.DEVICETYPE_FIELD_NUMBER and wire_type == _WIRE_VARINT:
+                device_type = yield from self._read_varint()
+            elif field_number == Payload.APPSDATA_FIELD_NUMBER and app_data is None and raw_app_data is None:
+                if wire_type != _WIRE_LENGTH_DELIMITED:
+                    raise ValueError(f"Wrong protobuf wire type {wire_type}")
+                app_data_size = yield from self._read_varint()
+                if protocol is None:
+                    # Flags normally precede the app data, otherwise it can only be decoded once complete.
+                    raw_app_data = (yield app_data_size) if app_data_size > 0 else b""
+                elif protocol == HandoffNfcProtocol:
+                    app_data = yield from self._parse_handoff_app_data(app_data_size)
+                else:
+                    app_data = yield from self._parse_tag_app_data(app_data_size)
+            elif field_number == Payload.APPIDS_FIELD_NUMBER and wire_type == _WIRE_VARINT:
+                app_ids.append((yield from self._read_varint()))
+            elif field_number == Payload.APPIDS_FIELD_NUMBER and wire_type == _WIRE_LENGTH_DELIMITED:
+                packed_end = self.offset + (yield from self._read_varint())
+                while self.offset < packed_end:
+                    app_ids.append((yield from self._read_varint()))
+            else:
+                yield from self._skip_field(wire_type)
+        if self.offset != end:
+            raise ValueError("MiConnectProtocol.Payload field exceeds its size")
+        if protocol is None or (app_data is None and raw_app_data is None) or _PAYLOAD_APP_ID not in app_ids or \
+                device_type != _PAYLOAD_DEVICE_TYPE or name != _PAYLOAD_NAME:
+            raise ValueError("Invalid MiConnectProtocol.Payload for NFC")
+        if app_data is None:
+            app_data = protocol.decode(raw_app_data)
+        return XiaomiNfcPayload(
+            major_version=major_version,
+            minor_version=minor_version,
+            id_hash=int.from_bytes(id_hash, byteorder="big", signed=False) if id_hash else None,
+            protocol=protocol,
+            appData=app_data,
+        )
+
+    def _skip_to(self, end: int) -> _Step[None]:
+        if self.offset > end:
+            raise ValueError("app data exceeds its size")
+        if self.offset < end:
+            yield end - self.offset
+
+    def _read_in(self, end: int, size: int) -> _Step[bytes]:
+        if self.offset + size > end:
+            raise ValueError(f"read bytes failed, read {end - self.offset} bytes, expected {size} bytes")
+        return (yield size) if size > 0 else b""
+
+    def _parse_tag_app_data(self, size: int) -> _Step[NfcTagAppData]:
+        end = self.offset + size
+        major_version, minor_version, write_time, flags, records_size = \
+            _TAG_HEADER.unpack((yield from self._read_in(end, _TAG_HEADER.size)))
+        self._events.append(TagHeaderParsed(major_version, minor_version, write_time, flags, records_size))
+        records = []
+        for i in range(records_size):
+            header = yield from self._read_in(end, _RECORD_HEADER.size)
+            _, record_size = _RECORD_HEADER.unpack(header)
+            if record_size < _RECORD_HEADER.size:
+                raise ValueError(f"Invalid NfcTagRecord size {record_size}")
+            content = yield from self._read_in(end, record_size - _RECORD_HEADER.size)
+            record = NfcTagRecord.decode(BytesIO(header + content))
+            self._events.append(RecordParsed(i, record))
+            records.append(record)
+        yield from self._skip_to(end)
+        return NfcTagAppData(
+            major_version=major_version,
+            minor_version=minor_version,
+            write_time=write_time,
+            flags=flags,
+            records=tuple(records),
+        )
+
+    def _read_uint8_bytes_map(self, end: int, length: int | None) -> _Step[UInt8BytesMap]:
+        bytes_map = UInt8BytesMap()
+        i = 0
+        # Same as UInt8BytesMap.read_from: the map ends at its length, a zero key or the end of data.
+        while (length is None or i < length) and self.offset < end:
+            key, = yield 1
+            if key == 0:
+                break
+            value_size, = yield from self._read_in(end, _UINT8.size)
+            bytes_map[key] = yield from self._read_in(end, value_size)
+            i += 1
+        return bytes_map
+
+    def _parse_handoff_app_data(self, size: int) -> _Step[HandoffAppData]:
+        end = self.offset + size
+        major_version, minor_version, device_type, attributes_size = \
+            _HANDOFF_HEADER.unpack((yield from self._read_in(end, _HANDOFF_HEADER.size)))
+        attributes_map = yield from self._read_uint8_bytes_map(end, attributes_size)
+        action_size, = yield from self._read_in(end, _UINT8.size)
+        action = (yield from self._read_in(end, action_size)).decode("utf-8")
+        self._events.append(HandoffHeaderParsed(major_version, minor_version, device_type, attributes_map, action))
+        payloads_map = yield from self._read_uint8_bytes_map(end, None)
+        yield from self._skip_to(end)
+        return HandoffAppData(
+            major_version=major_version,
+            minor_version=minor_version,
+            device_type=device_type,
+            attributes_map=attributes_map,
+            action=action,
+            payloads_map=payloads_map,
+        )
@@ -1,18 +1,27 @@
 import abc
 import dataclasses
 import enum
+import struct
 from collections import OrderedDict
 from io import BytesIO
-from typing import Mapping, Iterable
+from types import MappingProxyType
+from typing import Any, Mapping, Iterable
 
 from ._utils import UINT8_BYTES_SIZE, UINT16_BYTES_SIZE, UINT32_BYTES_SIZE
-from ._utils import read_uint8, read_uint16, read_uint32, read_bytes, write_uint8, write_uint16, write_uint32
+from ._utils import export_enum, export_mac, export_text, import_enum, import_hex, import_text
+from ._utils import read_uint8, read_uint16, read_bytes, write_uint8, write_uint16
 from .base import BinaryData, AppData, UInt16BytesMap
+from .interning import Interner
+from .schema import Codec, UIntField, BytesField, BytesMapField, RecordsField, compile_schema
 from .tnf import XiaomiNdefTNF
 
 _TYPE_DEVICE = 0x01
 _TYPE_ACTION = 0x02
+# record type, record size including this header
+_RECORD_HEADER = struct.Struct(">BH")
 _PREFIX_APP_DATA_MAP = b"mxD"
+_WRITE_TIME_OFFSET = 2 * UINT8_BYTES_SIZE
+_WRITE_TIME = struct.Struct(">I")
 
 
 @enum.unique
@@ -143,9 +152,23 @@ class DeviceAttribute(enum.Enum):
         else:
             return repr(data)
 
+    def export_data(self, data: bytes) -> str:
+        if self.is_text:
+            return export_text(data)
+        elif self in _MAC_ATTRIBUTES:
+            return export_mac(data)
+        else:
+            return data.hex()
+
+    def import_data(self, value: str) -> bytes:
+        if self.is_text:
+            return import_text(value)
+        else:
+            return import_hex(value)
+
     @property
     def is_iot(self) -> bool:
-        return self.name.startswith("IOT_") and not self.name.endswith("IOT_ENV_")
+        return self.name.startswith("IOT_") and not self.name.startswith("IOT_ENV_")
 
     @property
     def is_iot_env(self) -> bool:
@@ -162,24 +185,52 @@ class DeviceAttribute(enum.Enum):
 
     @staticmethod
     def parse(value: int) -> 'DeviceAttribute':
-        for e in DeviceAttribute:
-            if not e.is_iot and not e.is_iot_env and e.value == value:
-                return e
-        return DeviceAttribute.UNKNOWN
+        return _ATTRIBUTES.get(value, DeviceAttribute.UNKNOWN)
 
     @staticmethod
     def parse_iot(value: int) -> 'DeviceAttribute':
-        for e in DeviceAttribute:
-            if e.is_iot and e.value == value:
-                return e
-        return DeviceAttribute.UNKNOWN
+        return _IOT_ATTRIBUTES.get(value, DeviceAttribute.UNKNOWN)
 
     @staticmethod
     def parse_iot_env(value: int) -> 'DeviceAttribute':
-        for e in DeviceAttribute:
-            if e.is_iot_env and e.value == value:
-                return e
-        return DeviceAttribute.UNKNOWN
+        return _IOT_ENV_ATTRIBUTES.get(value, DeviceAttribute.UNKNOWN)
+
+
+_MAC_ATTRIBUTES = frozenset((
+    DeviceAttribute.WIFI_MAC_ADDRESS,
+    DeviceAttribute.BLUETOOTH_MAC_ADDRESS,
+    DeviceAttribute.NIC_MAC_ADDRESS,
+))
+
+# IOT_ENV_OWNER_UID shares its value with IOT_DEVICE_MAC, so the tables are built from member names.
+_ATTRIBUTES: Mapping[int, DeviceAttribute] = MappingProxyType({
+    e.attribute_value: e for name, e in DeviceAttribute.__members__.items() if not name.startswith("IOT_")
+})
+_IOT_ATTRIBUTES: Mapping[int, DeviceAttribute] = MappingProxyType({
+    e.attribute_value: e for name, e in DeviceAttribute.__members__.items()
+    if name.startswith("IOT_") and not name.startswith("IOT_ENV_")
+})
+_IOT_ENV_ATTRIBUTES: Mapping[int, DeviceAttribute] = MappingProxyType({
+    e.attribute_value: e for name, e in DeviceAttribute.__members__.items() if name.startswith("IOT_ENV_")
+})
+
+
+def _resolve_attributes_table(ndef_type: XiaomiNdefTNF, action: Action) -> Mapping[int, DeviceAttribute]:
+    if ndef_type == XiaomiNdefTNF.SMART_HOME:
+        if action == Action.IOT:
+            return _IOT_ATTRIBUTES
+        elif action == Action.IOT_ENV:
+            return _IOT_ENV_ATTRIBUTES
+    return _ATTRIBUTES
+
+
+_ATTRIBUTES_TABLES: Mapping[tuple[XiaomiNdefTNF, Action], Mapping[int, DeviceAttribute]] = MappingProxyType({
+    (ndef_type, action): _resolve_attributes_table(ndef_type, action) for ndef_type in XiaomiNdefTNF for action in Action
+})
+
+
+def get_attributes_table(action: Action, ndef_type: XiaomiNdefTNF) -> Mapping[int, DeviceAttribute]:
+    return _ATTRIBUTES_TABLES.get((ndef_type, action), _ATTRIBUTES)
 
 
 @dataclasses.dataclass(frozen=True)
@@ -194,40 +245,56 @@ class NfcTagRecord(BinaryData, abc.ABC):
     def _encode_content_into(self, buffer: BytesIO) -> None:
         raise NotImplemented
 
+    def _wire_lossless(self) -> bool:
+        return False
+
+    def __reduce_ex__(self, protocol):
+        if not self._wire_lossless():
+            return super().__reduce_ex__(protocol)
+        return _decode_record, (self.encode(),)
+
     def size(self) -> int:
-        return (
-                UINT8_BYTES_SIZE +  # type
-                UINT16_BYTES_SIZE +  # content size
-                self._content_size()  # content
-        )
+        return _RECORD_HEADER.size + self._content_size()
 
     def encode_into(self, buffer: BytesIO) -> None:
         write_uint8(buffer, self.tag_type)
         write_uint16(buffer, self.size())
         self._encode_content_into(buffer)
 
+    @abc.abstractmethod
+    def to_dict(self, action: Action = Action.UNKNOWN, ndef_type: XiaomiNdefTNF = XiaomiNdefTNF.MI_CONNECT_SERVICE) -> dict[str, Any]:
+        raise NotImplemented
+
     @staticmethod
-    def decode(buffer: BytesIO) -> 'NfcTagRecord':
-        record_type = read_uint8(buffer)
-        record_size = read_uint16(buffer) - UINT8_BYTES_SIZE - UINT16_BYTES_SIZE
-        content = BytesIO(read_bytes(buffer, record_size))
-        if record_type == _TYPE_DEVICE:
+    def from_dict(data: Mapping[str, Any]) -> 'NfcTagRecord':
+        if data["type"] == "DEVICE":
             return NfcTagDeviceRecord(
-                device_type=read_uint16(content),
-                flags=read_uint8(content),
-                device_number=read_uint8(content),
-                attributes_map=UInt16BytesMap.read_from(BytesIO(content.read()))
+                device_type=import_enum(DeviceType, data["device_type"]),
+                flags=data["flags"],
+                device_number=data["device_number"],
+                attributes_map=NfcTagDeviceRecord._import_attributes_map(data["attributes"]),
             )
-        elif record_type == _TYPE_ACTION:
+        elif data["type"] == "ACTION":
+            condition_parameters = data.get("condition_parameters")
             return NfcTagActionRecord(
-                action=read_uint16(content),
-                condition=read_uint8(content),
-                device_number=read_uint8(content),
-                flags=read_uint8(content),
-                condition_parameters=content.read()
+                action=import_enum(Action, data["action"]),
+                condition=import_enum(Condition, data["condition"]),
+                device_number=data["device_number"],
+                flags=data["flags"],
+                condition_parameters=import_hex(condition_parameters) if condition_parameters is not None else None,
             )
         else:
+            return NfcTagRawRecord(tag_type=data["type"], content=import_hex(data["content"]))
+
+    @staticmethod
+    def decode(buffer: BytesIO, interner: Interner | None = None) -> 'NfcTagRecord':
+        record_type = read_uint8(buffer)
+        record_size = read_uint16(buffer) - _RECORD_HEADER.size
+        content = BytesIO(read_bytes(buffer, record_size))
+        codec = _RECORD_CODECS.get(record_type)
+        if codec is None:
             raise ValueError(f"Unknown NfcTagRecord type {record_type}")
+        return codec.decode(content, interner)
 
 
 @dataclasses.dataclass(frozen=True)
@@ -247,22 +314,25 @@ class NfcTagActionRecord(NfcTagRecord):
     def enum_condition(self) -> Condition:
         return Condition.parse(self.condition)
 
+    def to_dict(self, action: Action = Action.UNKNOWN, ndef_type: XiaomiNdefTNF = XiaomiNdefTNF.MI_CONNECT_SERVICE) -> dict[str, Any]:
+        return {
+            "type": "ACTION",
+            "action": export_enum(self.enum_action, self.action),
+            "condition": export_enum(self.enum_condition, self.condition),
+            "device_number": self.device_number,
+            "flags": self.flags,
+            "condition_parameters": self.condition_parameters.hex() if self.condition_parameters is not None else None,
+        }
+
+    def _wire_lossless(self) -> bool:
+        # Empty condition parameters are not written and decode as None.
+        return self.condition_parameters != b""
+
     def _content_size(self) -> int:
-        return (
-                UINT16_BYTES_SIZE +  # action
-                UINT8_BYTES_SIZE +  # condition
-                UINT8_BYTES_SIZE +  # device_number
-                UINT8_BYTES_SIZE +  # flags
-                (len(self.condition_parameters) if self.condition_parameters else 0)  # condition_parameters
-        )
+        return _ACTION_RECORD_CODEC.size(self)
 
     def _encode_content_into(self, buffer: BytesIO) -> None:
-        write_uint16(buffer, self.action)
-        write_uint8(buffer, self.condition)
-        write_uint8(buffer, self.device_number)
-        write_uint8(buffer, self.flags)
-        if self.condition_parameters:
-            buffer.write(self.condition_parameters)
+        _ACTION_RECORD_CODEC.encode_into(self, buffer)
 
 
 @dataclasses.dataclass(frozen=True)
@@ -281,22 +351,24 @@ class NfcTagDeviceRecord(NfcTagRecord):
     def enum_attributes_map(self) -> OrderedDict[DeviceAttribute, bytes]:
         return OrderedDict((DeviceAttribute.parse(k), v) for k, v in self.attributes_map.items())
 
-    def get_all_attributes_map(self, action: Action, ndef_type: XiaomiNdefTNF) -> OrderedDict[DeviceAttribute, bytes]:
-        def _map_key(key: int) -> DeviceAttribute:
-            match ndef_type:
-                case XiaomiNdefTNF.SMART_HOME:
-                    match action:
-                        case Action.IOT:
-                            return DeviceAttribute.parse_iot(key)
-                        case Action.IOT_ENV:
-                            return DeviceAttribute.parse_iot_env(key)
-                        case _:
-                            return DeviceAttribute.parse(key)
-                case XiaomiNdefTNF.MI_CONNECT_SERVICE | _:
-                    return DeviceAttribute.parse(key)
-
-        result_map = OrderedDict((_map_key(k), v) for k, v in self.attributes_map.items())
-        if DeviceAttribute.APP_DATA in result_map:
+    def get_all_attributes_map(
+            self, action: Action, ndef_type: XiaomiNdefTNF, decode_app_data: bool = True
+    ) -> OrderedDict[DeviceAttribute, bytes]:
+        return self._resolve_attributes_map(get_attributes_table(action, ndef_type), action, ndef_type, decode_app_data)
+
+    @staticmethod
+    def get_all_attributes_maps(
+            records: Iterable['NfcTagDeviceRecord'], action: Action, ndef_type: XiaomiNdefTNF, decode_app_data: bool = False
+    ) -> list[OrderedDict[DeviceAttribute, bytes]]:
+        table = get_attributes_table(action, ndef_type)
+        return [record._resolve_attributes_map(table, action, ndef_type, decode_app_data) for record in records]
+
+    def _resolve_attributes_map(
+            self, table: Mapping[int, DeviceAttribute], action: Action, ndef_type: XiaomiNdefTNF, decode_app_data: bool
+    ) -> OrderedDict[DeviceAttribute, bytes]:
+        unknown = DeviceAttribute.UNKNOWN
+        result_map = OrderedDict((table.get(k, unknown), v) for k, v in self.attributes_map.items())
+        if decode_app_data and DeviceAttribute.APP_DATA in result_map:
             app_data_bytes = result_map[DeviceAttribute.APP_DATA]
             value_type = self.get_app_data_value_type(app_data_bytes, action, ndef_type)
             if value_type == AppDataValueType.ATTRIBUTES_MAP:
@@ -332,25 +404,86 @@ class NfcTagDeviceRecord(NfcTagRecord):
     def decode_app_data_value_map(buffer: bytes) -> OrderedDict[DeviceAttribute, bytes]:
         if not buffer.startswith(_PREFIX_APP_DATA_MAP):
             raise ValueError("Not an valid DeviceAttribute.APP_DATA map byte array")
-        return NfcTagDeviceRecord.decode_attributes_map(buffer)
+        return NfcTagDeviceRecord.decode_attributes_map(buffer[len(_PREFIX_APP_DATA_MAP):])
 
     @staticmethod
     def encode_app_data_value_map(data: OrderedDict[DeviceAttribute, bytes]) -> bytes:
         return _PREFIX_APP_DATA_MAP + NfcTagDeviceRecord.new_attributes_map(data).encode()
 
+    @staticmethod
+    def _export_attributes_map(items: Iterable[tuple[int, bytes]], table: Mapping[int, DeviceAttribute]) -> dict[str, Any]:
+        result = {}
+        for key, value in items:
+            attribute = table.get(key, DeviceAttribute.UNKNOWN)
+            if attribute == DeviceAttribute.UNKNOWN:
+                result[str(key)] = value.hex()
+            elif attribute == DeviceAttribute.APP_DATA and (app_data_map := NfcTagDeviceRecord._read_app_data_map(value)) is not None:
+                result[attribute.name] = NfcTagDeviceRecord._export_attributes_map(app_data_map.items(), _ATTRIBUTES)
+            else:
+                result[attribute.name] = attribute.export_data(value)
+        return result
+
+    @staticmethod
+    def _read_app_data_map(value: bytes) -> UInt16BytesMap | None:
+        # Only export the nested map when it encodes back to the same bytes, anything else stays raw hex.
+        if not value.startswith(_PREFIX_APP_DATA_MAP):
+            return None
+        try:
+            app_data_map = UInt16BytesMap.read_from(BytesIO(value[len(_PREFIX_APP_DATA_MAP):]))
+        except ValueError:
+            return None
+        return app_data_map if _PREFIX_APP_DATA_MAP + app_data_map.encode() == value else None
+
+    @staticmethod
+    def _import_attributes_map(data: Mapping[str, Any]) -> UInt16BytesMap:
+        bytes_map = UInt16BytesMap()
+        for key, value in data.items():
+            if key.isdigit():
+                bytes_map[int(key)] = import_hex(value)
+                continue
+            attribute = DeviceAttribute[key]
+            if isinstance(value, Mapping):
+                value = _PREFIX_APP_DATA_MAP + NfcTagDeviceRecord._import_attributes_map(value).encode()
+            else:
+                value = attribute.import_data(value)
+            bytes_map[attribute.attribute_value] = value
+        return bytes_map
+
+    def to_dict(self, action: Action = Action.UNKNOWN, ndef_type: XiaomiNdefTNF = XiaomiNdefTNF.MI_CONNECT_SERVICE) -> dict[str, Any]:
+        return {
+            "type": "DEVICE",
+            "device_type": export_enum(self.enum_device_type, self.device_type),
+            "flags": self.flags,
+            "device_number": self.device_number,
+            "attributes": self._export_attributes_map(self.attributes_map.items(), get_attributes_table(action, ndef_type)),
+        }
+
+    def _wire_lossless(self) -> bool:
+        # A zero key ends the encoded map.
+        return 0 not in self.attributes_map
+
     def _content_size(self) -> int:
-        return (
-                UINT16_BYTES_SIZE +  # device_type
-                UINT8_BYTES_SIZE +  # flags
-                UINT8_BYTES_SIZE +  # device_number
-                self.attributes_map.size()  # attributes_map
-        )
+        return _DEVICE_RECORD_CODEC.size(self)
+
+    def _encode_content_into(self, buffer: BytesIO) -> None:
+        _DEVICE_RECORD_CODEC.encode_into(self, buffer)
+
+
+@dataclasses.dataclass(frozen=True)
+class NfcTagRawRecord(NfcTagRecord):
+    content: bytes
+
+    def to_dict(self, action: Action = Action.UNKNOWN, ndef_type: XiaomiNdefTNF = XiaomiNdefTNF.MI_CONNECT_SERVICE) -> dict[str, Any]:
+        return {
+            "type": self.tag_type,
+            "content": self.content.hex(),
+        }
+
+    def _content_size(self) -> int:
+        return len(self.content)
 
     def _encode_content_into(self, buffer: BytesIO) -> None:
-        write_uint16(buffer, self.device_type)
-        write_uint8(buffer, self.flags)
-        write_uint8(buffer, self.device_number)
-        self.attributes_map.encode_into(buffer)
+        buffer.write(self.content)
 
 
 @dataclasses.dataclass(frozen=True)
@@ -385,31 +518,86 @@ class NfcTagAppData(AppData):
         record = self.first_device_record()
         return record.enum_attributes_map if record is not None else OrderedDict()
 
-    def size(self) -> int:
-        return (
-                UINT8_BYTES_SIZE +  # majorVersion
-                UINT8_BYTES_SIZE +  # minor_version
-                UINT32_BYTES_SIZE +  # write_time
-                UINT8_BYTES_SIZE +  # flags
-                UINT8_BYTES_SIZE +  # records size
-                sum(record.size() for record in self.records)  # records
+    def to_dict(self, ndef_type: XiaomiNdefTNF = XiaomiNdefTNF.MI_CONNECT_SERVICE) -> dict[str, Any]:
+        action = self.first_enum_action()
+        return {
+            "major_version": self.major_version,
+            "minor_version": self.minor_version,
+            "write_time": self.write_time,
+            "flags": self.flags,
+            "records": [record.to_dict(action, ndef_type) for record in self.records],
+        }
+
+    @staticmethod
+    def from_dict(data: Mapping[str, Any]) -> 'NfcTagAppData':
+        return NfcTagAppData(
+            major_version=data["major_version"],
+            minor_version=data["minor_version"],
+            write_time=data["write_time"],
+            flags=data["flags"],
+            records=tuple(NfcTagRecord.from_dict(record) for record in data["records"]),
         )
 
+    @staticmethod
+    def peek_write_time(data: bytes) -> int | None:
+        if len(data) < _WRITE_TIME_OFFSET + _WRITE_TIME.size:
+            return None
+        return _WRITE_TIME.unpack_from(data, _WRITE_TIME_OFFSET)[0]
+
+    @staticmethod
+    def replace_write_time(data: bytes, write_time: int) -> bytes:
+        if len(data) < _WRITE_TIME_OFFSET + _WRITE_TIME.size:
+            raise ValueError("data too short for NfcTagAppData")
+        try:
+            return b"".join((data[:_WRITE_TIME_OFFSET], _WRITE_TIME.pack(write_time), data[_WRITE_TIME_OFFSET + _WRITE_TIME.size:]))
+        except struct.error as e:
+            raise ValueError("value out of range") from e
+
+    def __reduce_ex__(self, protocol):
+        if not all(record._wire_lossless() for record in self.records):
+            return super().__reduce_ex__(protocol)
+        return _decode_app_data, (self.encode(),)
+
+    def size(self) -> int:
+        return _APP_DATA_CODEC.size(self)
+
     def encode_into(self, buffer: BytesIO) -> None:
-        write_uint8(buffer, self.major_version)
-        write_uint8(buffer, self.minor_version)
-        write_uint32(buffer, self.write_time)
-        write_uint8(buffer, self.flags)
-        write_uint8(buffer, len(self.records))
-        for record in self.records:
-            record.encode_into(buffer)
+        _APP_DATA_CODEC.encode_into(self, buffer)
 
     @staticmethod
-    def decode(buffer: BytesIO) -> 'NfcTagAppData':
-        return NfcTagAppData(
-            major_version=read_uint8(buffer),
-            minor_version=read_uint8(buffer),
-            write_time=read_uint32(buffer),
-            flags=read_uint8(buffer),
-            records=tuple(NfcTagRecord.decode(buffer) for _ in range(read_uint8(buffer)))
-        )
+    def decode(buffer: BytesIO, interner: Interner | None = None) -> 'NfcTagAppData':
+        return _APP_DATA_CODEC.decode(buffer, interner)
+
+
+_ACTION_RECORD_CODEC: Codec[NfcTagActionRecord] = compile_schema(NfcTagActionRecord, (
+    UIntField("action", UINT16_BYTES_SIZE),
+    UIntField("condition", UINT8_BYTES_SIZE),
+    UIntField("device_number", UINT8_BYTES_SIZE),
+    UIntField("flags", UINT8_BYTES_SIZE),
+    BytesField("condition_parameters", optional=True),
+))
+_DEVICE_RECORD_CODEC: Codec[NfcTagDeviceRecord] = compile_schema(NfcTagDeviceRecord, (
+    UIntField("device_type", UINT16_BYTES_SIZE),
+    UIntField("flags", UINT8_BYTES_SIZE),
+    UIntField("device_number", UINT8_BYTES_SIZE),
+    BytesMapField("attributes_map", UInt16BytesMap),
+))
+_RECORD_CODECS: Mapping[int, Codec[NfcTagRecord]] = MappingProxyType({
+    _TYPE_DEVICE: _DEVICE_RECORD_CODEC,
+    _TYPE_ACTION: _ACTION_RECORD_CODEC,
+})
+_APP_DATA_CODEC: Codec[NfcTagAppData] = compile_schema(NfcTagAppData, (
+    UIntField("major_version", UINT8_BYTES_SIZE),
+    UIntField("minor_version", UINT8_BYTES_SIZE),
+    UIntField("write_time", UINT32_BYTES_SIZE),
+    UIntField("flags", UINT8_BYTES_SIZE),
+    RecordsField("records", NfcTagRecord, UINT8_BYTES_SIZE),
+))
+
+
+def _decode_record(data: bytes) -> NfcTagRecord:
+    return NfcTagRecord.decode(BytesIO(data))
+
+
+def _decode_app_data(data: bytes) -> NfcTagAppData:
+    return _APP_DATA_CODEC.decode(BytesIO(data))
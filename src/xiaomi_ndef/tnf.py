@@ -8,7 +8,7 @@ class XiaomiNdefTNF(str, enum.Enum):
     MI_CONNECT_SERVICE = "com.xiaomi.mi_connect_service:externaltype"
 
     def to_bytes(self) -> bytes:
-        return self.value().encode("ascii")
+        return self.value.encode("ascii")
 
     @staticmethod
     def parse(value: str | bytes) -> 'XiaomiNdefTNF':
@@ -17,6 +17,6 @@ class XiaomiNdefTNF(str, enum.Enum):
                 return XiaomiNdefTNF(value.decode("ascii"))
             elif isinstance(value, str):
                 return XiaomiNdefTNF(value)
-        except ValueError | UnicodeDecodeError:
+        except (ValueError, UnicodeDecodeError):
             pass
         return XiaomiNdefTNF.UNKNOWN
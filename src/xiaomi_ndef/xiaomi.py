@@ -160,7 +160,7 @@ def new_handoff_tv_cast(
         device_type=device_type,
         payloads_map=handoff.HandoffAppData.new_payloads_map([
             handoff.PayloadKey.ACTION_SUFFIX.new_pair("TVCAST"),
-            handoff.PayloadKey.BLUETOOTH_MAC.new_pair(wifi_mac),
+            handoff.PayloadKey.WIFI_MAC.new_pair(wifi_mac),
             handoff.PayloadKey.BLUETOOTH_MAC.new_pair(bluetooth_mac)
         ])
     )
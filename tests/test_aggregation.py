@@ -0,0 +1,122 @@
+import unittest
+from collections import Counter
+
+from xiaomi_ndef import aggregation, diagnostics, simulator
+from xiaomi_ndef.aggregation import Dimension
+from xiaomi_ndef.ndef import new_xiaomi_ndef_record_bytes
+from xiaomi_ndef.stream import StreamLayer
+
+
+class AggregationTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        generator = simulator.TrafficGenerator(simulator.TrafficMix(), seed=9)
+        self.frames = [generator.frame()[0] for _ in range(600)]
+
+    def test_groups_match_full_decode(self) -> None:
+        expected = Counter()
+        for data in self.frames:
+            payload = diagnostics.decode(data).value
+            row = payload.to_dict()
+            expected[Dimension.PROTOCOL, row["protocol"]] += 1
+            if "records" in row["app_data"]:
+                for record in row["app_data"]["records"]:
+                    if record["type"] == "DEVICE":
+                        expected[Dimension.TAG_DEVICE_TYPE, record["device_type"]] += 1
+                    else:
+                        expected[Dimension.ACTION, record["action"]] += 1
+            else:
+                expected[Dimension.HANDOFF_DEVICE_TYPE, row["app_data"]["device_type"]] += 1
+        dimensions = aggregation.ALL_DIMENSIONS - {Dimension.NDEF_TYPE}
+        actual = Counter()
+        for data in self.frames:
+            actual.update(aggregation.extract_groups(data, dimensions=dimensions))
+        self.assertEqual(expected, actual)
+        self.assertEqual(
+            [(Dimension.PROTOCOL, row["protocol"])],
+            aggregation.extract_groups(self.frames[-1], dimensions=(Dimension.PROTOCOL,))
+        )
+        self.assertIsNone(aggregation.extract_groups(b"\xff\xff"))
+
+    def test_ndef_layer(self) -> None:
+        payload = diagnostics.decode(self.frames[0]).value
+        data = new_xiaomi_ndef_record_bytes(aggregation.XiaomiNdefTNF.SMART_HOME, payload)
+        groups = aggregation.extract_groups(data, StreamLayer.NDEF, (Dimension.NDEF_TYPE,))
+        self.assertEqual([(Dimension.NDEF_TYPE, "SMART_HOME")], groups)
+
+    def test_tumbling(self) -> None:
+        aggregator = aggregation.WindowedAggregator(10)
+        for i, data in enumerate(self.frames):
+            aggregator.add(data, i * 0.1)
+        windows = aggregator.poll()
+        self.assertEqual(5, len(windows))
+        self.assertEqual([(0, 10), (10, 20), (20, 30), (30, 40), (40, 50)], [(w.start, w.end) for w in windows])
+        self.assertTrue(all(w.total == 100 for w in windows))
+        aggregator.add(self.frames[0], 1)
+        self.assertEqual(1, aggregator.late)
+        aggregator.advance(1000)
+        self.assertEqual(1, len(aggregator.poll()))
+        self.assertEqual([], aggregator.poll())
+
+    def test_sliding_bounded(self) -> None:
+        aggregator = aggregation.WindowedAggregator(10, 2)
+        for i, data in enumerate(self.frames):
+            aggregator.add(data, i * 0.1)
+            self.assertLessEqual(len(aggregator._panes), 5)
+        current = aggregator.current()
+        self.assertEqual((50, 60), (current.start, current.end))
+        self.assertEqual(100, current.total)
+        windows = aggregator.poll()
+        self.assertEqual((-8, 2), (windows[0].start, windows[0].end))
+        self.assertEqual(20, windows[0].total)
+        with self.assertRaises(ValueError):
+            aggregation.WindowedAggregator(10, 3)
+
+    def test_sliding_out_of_order(self) -> None:
+        aggregator = aggregation.WindowedAggregator(10, 2)
+        aggregator.add(self.frames[0], 0.5)
+        aggregator.add(self.frames[1], 2.5)
+        aggregator.add(self.frames[2], 1.5)
+        self.assertEqual(1, aggregator.late)
+        aggregator.advance(100)
+        windows = aggregator.poll()
+        self.assertEqual((-8, 2, 1), (windows[0].start, windows[0].end, windows[0].total))
+        self.assertEqual({(-6, 4): 2, (-4, 6): 2}, {(w.start, w.end): w.total for w in windows[1:3]})
+
+    def test_merge_workers(self) -> None:
+        single = aggregation.WindowedAggregator(10, 5)
+        workers = [aggregation.WindowedAggregator(10, 5) for _ in range(3)]
+        for i, data in enumerate(self.frames):
+            single.add(data, i * 0.1)
+            workers[i % 3].add(data, i * 0.1)
+        single.advance(100)
+        for worker in workers:
+            worker.advance(100)
+        expected = [w.to_dict() for w in single.poll()]
+        self.assertEqual(expected, [w.to_dict() for w in aggregation.merge_windows(w for i in workers for w in i.poll())])
+
+        # Open panes of workers fed from the same time range merge into the single aggregator state.
+        merged = aggregation.WindowedAggregator(10, 5)
+        other = aggregation.WindowedAggregator(10, 5)
+        for i, data in enumerate(self.frames[:80]):
+            (merged if i % 2 else other).add(data, i * 0.1)
+        merged.merge(other)
+        single = aggregation.WindowedAggregator(10, 5)
+        single.add_all((data, i * 0.1) for i, data in enumerate(self.frames[:80]))
+        self.assertEqual(single.current(), merged.current())
+        merged.advance(100)
+        single.advance(100)
+        self.assertEqual(single.poll(), merged.poll())
+        # Workers fed from different time ranges.
+        older = aggregation.WindowedAggregator(10, 5)
+        older.add_all((data, i * 0.1) for i, data in enumerate(self.frames[:300]))
+        newer = aggregation.WindowedAggregator(10, 5)
+        newer.add_all((data, i * 0.1) for i, data in enumerate(self.frames[300:], 300))
+        newer.merge(older)
+        newer.advance(100)
+        self.assertEqual(expected, [w.to_dict() for w in newer.poll()])
+        with self.assertRaises(ValueError):
+            merged.merge(aggregation.WindowedAggregator(10))
+
+
+if __name__ == '__main__':
+    unittest.main()
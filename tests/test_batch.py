@@ -0,0 +1,67 @@
+import random
+import unittest
+from types import SimpleNamespace
+
+from xiaomi_ndef import batch, ndef, tag, xiaomi
+from xiaomi_ndef.mi_connect import MiConnectData
+
+
+class _ArrayLike:
+    def __init__(self, values: list, kind: str = "O") -> None:
+        self._values = values
+        self.dtype = SimpleNamespace(kind=kind)
+
+    def tolist(self) -> list:
+        return list(self._values)
+
+
+class BatchTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        rng = random.Random(5)
+        self.size = 200
+        self.write_time = [rng.getrandbits(32) for _ in range(self.size)]
+        self.device_type = [rng.choice(list(tag.DeviceType)) for _ in range(self.size)]
+        self.wifi_mac = [rng.randbytes(6) for _ in range(self.size)]
+        self.bluetooth_mac = [rng.randbytes(6) if i % 2 else rng.randbytes(6).hex(":") for i in range(self.size)]
+        # Long models push the length prefixes past one varint byte.
+        self.model = [None if i % 4 == 0 else "m" * rng.randrange(0, 200) for i in range(self.size)]
+
+    def test_circulate_identical(self) -> None:
+        encoded = batch.encode_circulate_batch(self.write_time, self.device_type, self.wifi_mac, self.bluetooth_mac)
+        self.assertEqual(self.size, len(encoded))
+        self.assertEqual(len(encoded.data), encoded.offsets[-1])
+        for i, row in enumerate(zip(self.write_time, self.device_type, self.wifi_mac, self.bluetooth_mac)):
+            self.assertEqual(MiConnectData.from_nfc_payload(xiaomi.new_circulate(*row)[1]).to_bytes(), encoded[i])
+
+    def test_sound_box_identical(self) -> None:
+        wifi_mac = [None if i % 3 == 0 else mac for i, mac in enumerate(self.wifi_mac)]
+        encoded = batch.encode_mi_tap_sound_box_batch(self.write_time, wifi_mac, self.bluetooth_mac, self.model, ndef=True)
+        expected = [
+            ndef.new_xiaomi_ndef_record_bytes(*xiaomi.new_mi_tap_sound_box(*row))
+            for row in zip(self.write_time, wifi_mac, self.bluetooth_mac, self.model)
+        ]
+        self.assertEqual(expected, list(encoded))
+        self.assertEqual(expected[-1], encoded[-1])
+
+    def test_array_like_columns(self) -> None:
+        encoded = batch.encode_circulate_batch(
+            _ArrayLike(self.write_time),
+            _ArrayLike([int(i) for i in self.device_type]),
+            _ArrayLike([list(i) for i in self.wifi_mac]),
+            self.bluetooth_mac,
+        )
+        self.assertEqual(batch.encode_circulate_batch(self.write_time, self.device_type, self.wifi_mac, self.bluetooth_mac), encoded)
+
+    def test_invalid(self) -> None:
+        with self.assertRaises(ValueError):
+            batch.encode_circulate_batch([1, 2], [1], [b"", b""], [b"", b""])
+        with self.assertRaises(ValueError):
+            batch.encode_circulate_batch([1 << 32], [1], [b""], [b""])
+        with self.assertRaises(ValueError):
+            batch.encode_mi_tap_sound_box_batch([1], None, [None], None)
+        with self.assertRaises(ValueError):
+            batch.encode_circulate_batch([1], [1], _ArrayLike([b"\x00\x11\x22\x33\x44"], "S"), [b""])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,127 @@
+import dataclasses
+import sqlite3
+import tempfile
+import unittest
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from xiaomi_ndef import cache, diagnostics, simulator, tag, xiaomi
+from xiaomi_ndef.interning import Interner
+from xiaomi_ndef.mi_connect import MiConnectData
+
+
+def _frames(seed: int, count: int) -> list[bytes]:
+    generator = simulator.TrafficGenerator(simulator.TrafficMix(malformed_rate=0.1), seed=seed)
+    return [generator.frame()[0] for _ in range(count)]
+
+
+def _worker(path: str, seed: int) -> int:
+    with cache.DecodeCache(path, memory_size=0) as decode_cache:
+        results, _ = decode_cache.decode_batch(_frames(seed, 200))
+        return len(results)
+
+
+class DecodeCacheTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = Path(self.directory.name) / "cache.db"
+        self.frames = list(dict.fromkeys(_frames(3, 300)))
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+
+    def assertSameResults(self, expected: list, actual: list) -> None:
+        self.assertEqual(len(expected), len(actual))
+        for a, b in zip(expected, actual):
+            self.assertEqual((a.value, a.error, a.unknown_records), (b.value, b.error, b.unknown_records))
+
+    def test_serialize(self) -> None:
+        for data in self.frames:
+            result = diagnostics.decode(data)
+            restored = cache.deserialize_result(cache.serialize_result(result))
+            self.assertEqual((result.value, result.error, result.unknown_records), (restored.value, restored.error, restored.unknown_records))
+        interner = Interner()
+        payload = xiaomi.new_circulate(1, tag.DeviceType.MI_TV, b"\x01" * 6, b"\x02" * 6)[1]
+        app_data = dataclasses.replace(payload.appData, records=(*payload.appData.records, tag.NfcTagRawRecord(tag_type=9, content=b"\x00")))
+        results = [diagnostics.decode(data, interner) for data in self.frames]
+        results.append(diagnostics.DecodeResult(value=dataclasses.replace(payload, appData=app_data), unknown_records=1))
+        for result in results:
+            restored = cache.deserialize_result(cache.serialize_result(result), interner)
+            self.assertEqual((result.value, result.unknown_records), (restored.value, restored.unknown_records))
+        with self.assertRaises(ValueError):
+            cache.deserialize_result(b"\xff")
+
+    def test_long_id_hash(self) -> None:
+        container = MiConnectData.from_nfc_payload(xiaomi.new_empty_mi_tap(0)[1]).container
+        frames = []
+        for size in (255, 300, 0x10000):
+            container.data.idHash = b"\x01" * size
+            frames.append(container.SerializeToString())
+        expected, _ = diagnostics.decode_batch(frames)
+        self.assertTrue(all(result.value is not None for result in expected))
+        with cache.DecodeCache(self.path) as decode_cache:
+            self.assertSameResults(expected, decode_cache.decode_batch(frames)[0])
+            self.assertEqual(3, decode_cache.stats().entries)
+        with cache.DecodeCache(self.path, memory_size=0) as decode_cache:
+            self.assertSameResults(expected, [decode_cache.decode(data) for data in frames])
+            self.assertEqual(3, decode_cache.stats().hits)
+
+    def test_warm_after_restart(self) -> None:
+        expected, expected_summary = diagnostics.decode_batch(self.frames)
+        with cache.DecodeCache(self.path) as decode_cache:
+            results, summary = decode_cache.decode_batch(self.frames)
+            self.assertSameResults(expected, results)
+            self.assertEqual(expected_summary, summary)
+            self.assertEqual(0, decode_cache.stats().hits)
+        with cache.DecodeCache(self.path, memory_size=0) as decode_cache:
+            results, summary = decode_cache.decode_batch(self.frames)
+            self.assertSameResults(expected, results)
+            self.assertEqual(expected_summary, summary)
+            stats = decode_cache.stats()
+            self.assertEqual(len(self.frames), stats.hits)
+            self.assertEqual(1.0, stats.hit_rate)
+            self.assertSameResults([expected[0]], [decode_cache.decode(self.frames[0])])
+            self.assertIsNone(decode_cache.get(b"not cached"))
+            self.assertEqual(0, stats.memory_hits)
+
+    def test_memory(self) -> None:
+        with cache.DecodeCache(self.path, memory_size=10) as decode_cache:
+            decode_cache.decode(self.frames[0])
+            decode_cache.decode(self.frames[0])
+            decode_cache.decode_batch(self.frames[:5] * 3)
+            stats = decode_cache.stats()
+            self.assertEqual(5, stats.misses)
+            self.assertEqual(12, stats.memory_hits)
+            self.assertEqual(stats.memory_hits, stats.hits)
+
+    def test_eviction(self) -> None:
+        with cache.DecodeCache(self.path, max_bytes=4096) as decode_cache:
+            decode_cache.decode_batch(self.frames)
+            stats = decode_cache.stats()
+            self.assertLessEqual(stats.size_bytes, 4096)
+            self.assertGreater(stats.evictions, 0)
+            self.assertGreater(stats.entries, 0)
+            decode_cache.clear()
+            self.assertEqual((0, 0), (decode_cache.stats().entries, decode_cache.stats().size_bytes))
+
+    def test_format_change(self) -> None:
+        with cache.DecodeCache(self.path) as decode_cache:
+            decode_cache.decode_batch(self.frames)
+        with sqlite3.connect(self.path) as connection:
+            connection.execute("UPDATE meta SET value = 0 WHERE name = 'format'")
+        with cache.DecodeCache(self.path) as decode_cache:
+            self.assertEqual(0, decode_cache.stats().entries)
+
+    def test_processes(self) -> None:
+        with ProcessPoolExecutor(max_workers=3) as executor:
+            counts = list(executor.map(_worker, [str(self.path)] * 6, [1, 2, 3, 1, 2, 3]))
+        self.assertEqual([200] * 6, counts)
+        with cache.DecodeCache(self.path, memory_size=0) as decode_cache:
+            expected, _ = diagnostics.decode_batch(_frames(2, 200))
+            results, _ = decode_cache.decode_batch(_frames(2, 200))
+            self.assertSameResults(expected, results)
+            self.assertEqual(200, decode_cache.stats().hits)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+import collections
+import unittest
+
+from pyndef import NdefTNF
+
+from xiaomi_ndef import classify, diagnostics, handoff, ndef, simulator, tag, xiaomi
+from xiaomi_ndef.mi_connect import MiConnectData
+from xiaomi_ndef.stream import StreamLayer
+
+
+def _candidates(payload) -> list:
+    # Builder calls that could have produced the decoded payload, with the arguments read back from it.
+    app_data = payload.appData
+    if isinstance(app_data, handoff.HandoffAppData):
+        payloads = app_data.payloads_map
+        bluetooth_mac = payloads.get(handoff.PayloadKey.BLUETOOTH_MAC.key_value)
+        wifi_mac = payloads.get(handoff.PayloadKey.WIFI_MAC.key_value)
+        lyra = handoff.PayloadKey.EXT_ABILITY.key_value in payloads
+        return [
+            (classify.Template.HANDOFF_SCREEN_MIRROR, lambda: xiaomi.new_handoff_screen_mirror(app_data.device_type, bluetooth_mac, lyra)),
+            (classify.Template.HANDOFF_TV_CAST, lambda: xiaomi.new_handoff_tv_cast(app_data.device_type, wifi_mac, bluetooth_mac)),
+        ]
+    device_record = app_data.first_device_record()
+    if device_record is None:
+        return []
+    attributes = device_record.attributes_map
+    wifi_mac = attributes.get(tag.DeviceAttribute.WIFI_MAC_ADDRESS.attribute_value)
+    bluetooth_mac = attributes.get(tag.DeviceAttribute.BLUETOOTH_MAC_ADDRESS.attribute_value)
+    model = attributes.get(tag.DeviceAttribute.MODEL.attribute_value)
+    return [
+        (classify.Template.EMPTY_MI_TAP, lambda: xiaomi.new_empty_mi_tap(app_data.write_time)),
+        (classify.Template.MI_TAP_SOUND_BOX, lambda: xiaomi.new_mi_tap_sound_box(app_data.write_time, wifi_mac, bluetooth_mac, model)),
+        (classify.Template.CIRCULATE, lambda: xiaomi.new_circulate(app_data.write_time, device_record.device_type, wifi_mac, bluetooth_mac)),
+    ]
+
+
+def _ground_truth(data: bytes) -> classify.Template:
+    payload = diagnostics.decode(data).value
+    if payload is None:
+        return classify.Template.UNKNOWN
+    for template, builder in _candidates(payload):
+        try:
+            built = MiConnectData.from_nfc_payload(builder()[1]).to_bytes()
+        except (TypeError, ValueError):
+            continue
+        if built == data:
+            return template
+    return classify.Template.UNKNOWN
+
+
+class TemplateClassifyTestCase(unittest.TestCase):
+    _SAMPLES = (
+        (classify.Template.EMPTY_MI_TAP, xiaomi.new_empty_mi_tap(1)),
+        (classify.Template.MI_TAP_SOUND_BOX, xiaomi.new_mi_tap_sound_box(2, b"\x01" * 6, b"\x02" * 6, "xiaomi.wifispeaker.x08c")),
+        (classify.Template.MI_TAP_SOUND_BOX, xiaomi.new_mi_tap_sound_box(3, None, b"\x02" * 6, None)),
+        (classify.Template.CIRCULATE, xiaomi.new_circulate(4, tag.DeviceType.MI_PHONE, b"\x01" * 6, b"\x02" * 6)),
+        (classify.Template.HANDOFF_SCREEN_MIRROR, xiaomi.new_handoff_screen_mirror(handoff.DeviceType.PAD, "00:11:22:33:44:55", True)),
+        (classify.Template.HANDOFF_TV_CAST, xiaomi.new_handoff_tv_cast(handoff.DeviceType.TV, "00:11:22:33:44:55", "66:77:88:99:AA:BB")),
+    )
+
+    def test_classify(self) -> None:
+        for template, (payload_type, payload) in self._SAMPLES:
+            with self.subTest(template=template):
+                data = MiConnectData.from_nfc_payload(payload).to_bytes()
+                self.assertEqual(template, classify.classify(data))
+                self.assertEqual(template, classify.classify(ndef.new_mi_tap_ndef_message_bytes(payload_type, payload), StreamLayer.NDEF))
+                self.assertEqual(classify.Template.UNKNOWN, classify.classify(data[:-1]))
+
+    def test_unknown(self) -> None:
+        payload_type, payload = xiaomi.new_handoff(handoff.DeviceType.PC, handoff.HandoffAppData.new_payloads_map([
+            handoff.PayloadKey.ACTION_SUFFIX.new_pair("OTHER")
+        ]))
+        self.assertEqual(classify.Template.UNKNOWN, classify.classify(MiConnectData.from_nfc_payload(payload).to_bytes()))
+        # Empty Mi Tap tags are written with the smart home record type only.
+        data = MiConnectData.from_nfc_payload(xiaomi.new_empty_mi_tap(0)[1]).to_bytes()
+        self.assertEqual(
+            classify.Template.UNKNOWN,
+            classify.classify(ndef.encode_xiaomi_ndef_record(tag.XiaomiNdefTNF.MI_CONNECT_SERVICE, data), StreamLayer.NDEF)
+        )
+        # Only external type records carry Xiaomi payloads, the same type bytes under another TNF don't count.
+        payload_type, payload = self._SAMPLES[1][1]
+        message = bytearray(ndef.new_xiaomi_ndef_record_bytes(payload_type, payload))
+        self.assertEqual(self._SAMPLES[1][0], classify.classify(bytes(message), StreamLayer.NDEF))
+        message[0] = message[0] & ~ndef._TNF_MASK | NdefTNF.MIME_MEDIA.value
+        self.assertEqual(classify.Template.UNKNOWN, classify.classify(bytes(message), StreamLayer.NDEF))
+        self.assertEqual(classify.Template.UNKNOWN, classify.classify(bytes(message[:3]), StreamLayer.NDEF))
+        for data in (b"", b"\x0a", b"\x0a\xff", bytes(10)):
+            self.assertEqual(classify.Template.UNKNOWN, classify.classify(data))
+        with self.assertRaises(ValueError):
+            classify.classify(data, StreamLayer.TLV)
+
+    def test_malformed_traffic(self) -> None:
+        generator = simulator.TrafficGenerator(simulator.TrafficMix(malformed_rate=0.5), seed=0)
+        labels = collections.Counter()
+        for _ in range(2000):
+            data, _ = generator.frame()
+            expected = _ground_truth(data)
+            self.assertEqual(expected, classify.classify(data), data.hex())
+            labels[expected] += 1
+        # The simulator never writes empty Mi Tap tags, test_classify covers them.
+        self.assertEqual(set(classify.Template) - {classify.Template.EMPTY_MI_TAP}, set(labels))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,92 @@
+import io
+import json
+import tempfile
+import unittest
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from xiaomi_ndef import cli, simulator, xiaomi, tag
+from xiaomi_ndef.mi_connect import MiConnectData
+from xiaomi_ndef.ndef import new_mi_tap_ndef_message_bytes, new_xiaomi_ndef_record_bytes
+from xiaomi_ndef.nfc import XiaomiNfcPayload
+from xiaomi_ndef.tnf import XiaomiNdefTNF
+
+
+class CliTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        generator = simulator.TrafficGenerator(simulator.TrafficMix(malformed_rate=0.1), seed=11)
+        self.items = [generator.frame()[0].hex().encode("ascii") for _ in range(300)] + [b"zz"]
+
+    def test_decode_parallel_matches_serial(self) -> None:
+        serial = io.BytesIO()
+        serial_summary = cli.run(cli._Options("decode"), self.items, serial, chunk_size=32)
+        parallel = io.BytesIO()
+        with ProcessPoolExecutor(max_workers=2) as executor:
+            parallel_summary = cli.run(cli._Options("decode"), self.items, parallel, executor, 4, chunk_size=32)
+        self.assertEqual(serial.getvalue(), parallel.getvalue())
+        self.assertEqual(serial_summary, parallel_summary)
+        self.assertEqual(301, serial_summary.total)
+        self.assertEqual(1, serial_summary.errors["invalid_hex"])
+        rows = [json.loads(i) for i in serial.getvalue().splitlines()]
+        self.assertEqual(301, len(rows))
+        self.assertEqual(serial_summary.failed, sum("error" in row for row in rows))
+
+    def test_fields_projection(self) -> None:
+        options = cli._Options("decode", fields=("protocol", "id_hash"))
+        self.assertFalse(options.needs_app_data)
+        self.assertTrue(cli._Options("decode", fields=("app_data.write_time",)).needs_app_data)
+        output = io.BytesIO()
+        cli.run(options, self.items, output)
+        for line in output.getvalue().splitlines():
+            row = json.loads(line)
+            self.assertTrue("error" in row or set(row) == {"protocol", "id_hash"})
+
+    def test_encode_round_trip(self) -> None:
+        ndef_type, payload = xiaomi.new_mi_tap_sound_box(1700000000, None, b"\x01\x02\x03\x04\x05\x06", "speaker")
+        rows = [json.dumps(payload.to_dict(ndef_type)).encode("utf-8"), b"{}"]
+        encoded = io.BytesIO()
+        summary = cli.run(cli._Options("encode", ndef=True, ndef_type=ndef_type), rows, encoded)
+        self.assertEqual(1, summary.errors["invalid_row"])
+        decoded = io.BytesIO()
+        cli.run(cli._Options("decode", layer="ndef"), encoded.getvalue().splitlines(), decoded)
+        self.assertEqual(payload, XiaomiNfcPayload.from_dict(json.loads(decoded.getvalue())))
+        self.assertEqual(tag.Action.AUTO.name, json.loads(decoded.getvalue())["app_data"]["records"][1]["action"])
+
+    def test_mixed_ndef_types(self) -> None:
+        payloads = [
+            xiaomi.new_circulate(1700000000, tag.DeviceType.MI_TV, b"\x01" * 6, b"\x02" * 6)[1],
+            xiaomi.new_mi_tap_sound_box(1700000000, None, b"\x01\x02\x03\x04\x05\x06", "speaker")[1],
+        ]
+        ndef_types = [XiaomiNdefTNF.SMART_HOME, XiaomiNdefTNF.MI_CONNECT_SERVICE]
+        items = [new_xiaomi_ndef_record_bytes(t, p).hex().encode("ascii") for t, p in zip(ndef_types, payloads)]
+        projected = io.BytesIO()
+        cli.run(cli._Options("decode", fields=("ndef_type",)), items, projected)
+        self.assertEqual([{"ndef_type": t.name} for t in ndef_types], [json.loads(i) for i in projected.getvalue().splitlines()])
+        decoded = io.BytesIO()
+        cli.run(cli._Options("decode"), items, decoded)
+        encoded = io.BytesIO()
+        summary = cli.run(cli._Options("encode", ndef=True), decoded.getvalue().splitlines(), encoded)
+        self.assertEqual(0, summary.failed)
+        self.assertEqual(items, encoded.getvalue().splitlines())
+        bare = io.BytesIO()
+        cli.run(cli._Options("decode"), [MiConnectData.from_nfc_payload(p).to_bytes().hex().encode("ascii") for p in payloads], bare)
+        self.assertTrue(all("ndef_type" not in json.loads(i) for i in bare.getvalue().splitlines()))
+
+    def test_main(self) -> None:
+        ndef_type, payload = xiaomi.new_circulate(1700000000, tag.DeviceType.MI_TV, b"\x01" * 6, b"\x02" * 6)
+        with tempfile.TemporaryDirectory() as directory:
+            directory = Path(directory)
+            input_path = directory / "tag.bin"
+            input_path.write_bytes(new_mi_tap_ndef_message_bytes(XiaomiNdefTNF.SMART_HOME, payload))
+            stats_path = directory / "stats.json"
+            self.assertEqual(0, cli.main(["stats", str(input_path), "-f", "binary", "-o", str(stats_path)]))
+            stats = json.loads(stats_path.read_text())
+            self.assertEqual({"SMART_HOME": 1}, stats["ndef_types"])
+            self.assertEqual({"MI_TV": 1}, stats["device_types"])
+            hex_path = directory / "bad.hex"
+            hex_path.write_text("0a00\n")
+            self.assertEqual(1, cli.main(["validate", str(hex_path), "-o", str(directory / "errors.jsonl")]))
+
+
+if __name__ == '__main__':
+    unittest.main()
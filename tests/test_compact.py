@@ -0,0 +1,58 @@
+import unittest
+import warnings
+
+from xiaomi_ndef import compact, ndef, ntag, xiaomi
+
+
+class CompactEncodeTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.payload_type, self.payload = xiaomi.new_mi_tap_sound_box(0, b"\x00" * 6, b"\x00" * 6, "xiaomi.wifispeaker.x08c")
+
+    def test_encode_compact(self) -> None:
+        report = compact.encode_compact(self.payload_type, self.payload, ntag.NtagType.NTAG215)
+        full = ndef.new_mi_tap_ndef_message_bytes(self.payload_type, self.payload)
+        self.assertEqual(ndef.new_xiaomi_ndef_record_bytes(self.payload_type, self.payload), report.message)
+        self.assertLess(report.size, len(full))
+        self.assertEqual(full, compact.encode_compact(self.payload_type, self.payload, mi_tap_records=True).message)
+        self.assertTrue(report.fits)
+        self.assertEqual(ntag.NtagType.NTAG215.user_memory_size - ntag.ndef_tlv_size(report.size), report.free_bytes)
+        self.assertEqual(len(report.image()), report.pages * ntag.PAGE_SIZE)
+
+    def test_analyze(self) -> None:
+        message = ndef.new_mi_tap_ndef_message_bytes(self.payload_type, self.payload)
+        report = compact.analyze(message)
+        self.assertEqual(report.image_size, sum(i.size for i in report.components))
+        self.assertEqual(
+            [
+                compact.Component.TLV, compact.Component.NDEF_HEADER, compact.Component.NDEF_TYPE, compact.Component.CONTAINER,
+                compact.Component.PAYLOAD_FIELDS, compact.Component.APP_DATA, compact.Component.PAYLOAD_FIELDS,
+                compact.Component.OTHER_RECORDS, compact.Component.TLV,
+            ],
+            [i.component for i in report.components]
+        )
+        sizes = report.sizes()
+        self.assertEqual(3, sizes[compact.Component.NDEF_HEADER])
+        self.assertEqual(len(ndef._MI_TAP_TRAILER_BYTES), sizes[compact.Component.OTHER_RECORDS])
+        self.assertEqual(len(self.payload.appData.encode()), sizes[compact.Component.APP_DATA])
+        self.assertEqual(1, report.components[0].pages)
+        with self.assertRaises(ValueError):
+            compact.analyze(message[:-1])
+        for truncated in (b"\xd9", b"\xd9\x01", b"\xc1\x01\x00\x00", b"\xd9\x01\x05"):
+            with self.subTest(truncated=truncated), self.assertRaises(ValueError):
+                compact.analyze(truncated)
+
+    def test_capacity(self) -> None:
+        payload_type, payload = xiaomi.new_mi_tap_sound_box(0, b"\x00" * 6, b"\x00" * 6, "x" * 200)
+        with self.assertRaises(ValueError):
+            compact.encode_compact(payload_type, payload, ntag.NtagType.NTAG213)
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter("always")
+            report = compact.encode_compact(payload_type, payload, ntag.NtagType.NTAG213, strict=False)
+        self.assertEqual(RuntimeWarning, caught[0].category)
+        self.assertFalse(report.fits)
+        self.assertLess(report.free_bytes, 0)
+        self.assertTrue(compact.encode_compact(payload_type, payload, ntag.NtagType.NTAG215).fits)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,149 @@
+import contextlib
+import io
+import tempfile
+import unittest
+from pathlib import Path
+from random import Random
+from unittest import mock
+
+from xiaomi_ndef import compression, corpus, handoff, xiaomi
+from xiaomi_ndef.mi_connect import MiConnectData
+
+
+class CorpusTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self._dir = tempfile.TemporaryDirectory()
+        self._path = Path(self._dir.name, "test.xndc")
+        self._payloads = [
+            MiConnectData.from_nfc_payload(
+                xiaomi.new_handoff_screen_mirror(handoff.DeviceType.PC, f"00:00:00:00:00:{i:02x}", i % 2 == 0)[1]
+            ).to_bytes()
+            for i in range(5)
+        ]
+
+    def tearDown(self) -> None:
+        self._dir.cleanup()
+
+    def test_write_read(self) -> None:
+        with corpus.CorpusWriter(self._path) as writer:
+            writer.extend(self._payloads[:3])
+        with corpus.CorpusWriter(self._path) as writer:
+            self.assertEqual(3, len(writer))
+            self.assertEqual(3, writer.append(self._payloads[3]))
+        with corpus.CorpusReader(self._path) as reader:
+            self.assertEqual(4, len(reader))
+            self.assertEqual(self._payloads[:4], [bytes(i) for i in reader])
+            self.assertEqual(self._payloads[1], reader.decode(1).to_bytes())
+            self.assertEqual(self._payloads[3], bytes(reader[-1]))
+            with self.assertRaises(IndexError):
+                reader.offset(4)
+
+    def test_truncated_index(self) -> None:
+        with corpus.CorpusWriter(self._path) as writer:
+            writer.extend(self._payloads)
+        with open(self._path, "r+b") as file:
+            file.truncate(self._path.stat().st_size - 4)
+        with self.assertRaises(corpus.CorpusFormatError):
+            corpus.CorpusReader(self._path)
+        with self.assertRaises(corpus.CorpusFormatError):
+            corpus.CorpusWriter(self._path)
+
+    def test_abandoned_append(self) -> None:
+        with corpus.CorpusWriter(self._path) as writer:
+            writer.extend(self._payloads[:2])
+        writer = corpus.CorpusWriter(self._path)
+        writer.extend(self._payloads[2:4])
+        writer._file.flush()
+        # The process dies here, close and flush are never called.
+        with corpus.CorpusReader(self._path) as reader:
+            self.assertEqual(self._payloads[:2], [bytes(i) for i in reader])
+        with corpus.CorpusWriter(self._path) as recovered:
+            self.assertEqual(2, len(recovered))
+            recovered.append(self._payloads[4])
+        writer._file.close()
+        with corpus.CorpusReader(self._path) as reader:
+            self.assertEqual(self._payloads[:2] + self._payloads[4:], [bytes(i) for i in reader])
+
+    def test_append_sessions(self) -> None:
+        for _ in range(5):
+            with corpus.CorpusWriter(self._path) as writer:
+                writer.extend(self._payloads * 20)
+        live = 5 * 20 * sum(corpus._ENTRY_HEADER.size + len(i) + corpus._INDEX_ITEM.size for i in self._payloads)
+        # Each session only adds its own index and one trailer.
+        self.assertLessEqual(self._path.stat().st_size, live + 64 + 5 * corpus._TRAILER.size)
+        with corpus.CorpusReader(self._path) as reader:
+            self.assertEqual(500, len(reader))
+            self.assertEqual(self._payloads * 100, [bytes(i) for i in reader])
+            self.assertEqual(self._payloads[4], bytes(reader[-1]))
+
+    def test_close_with_views(self) -> None:
+        with corpus.CorpusWriter(self._path) as writer:
+            writer.extend(self._payloads)
+        with corpus.CorpusReader(self._path) as reader:
+            views = list(reader)
+        self.assertEqual(self._payloads, [bytes(i) for i in views])
+
+    def test_flush(self) -> None:
+        with corpus.CorpusWriter(self._path) as writer:
+            writer.extend(self._payloads[:2])
+            writer.flush()
+            writer.append(self._payloads[2])
+            with corpus.CorpusReader(self._path) as reader:
+                self.assertEqual(2, len(reader))
+        with corpus.CorpusReader(self._path) as reader:
+            self.assertEqual(self._payloads[:3], [bytes(i) for i in reader])
+
+    def test_convert_hex_log(self) -> None:
+        lines = ["# capture", "", *(i.hex() for i in self._payloads)]
+        with corpus.CorpusWriter(self._path) as writer:
+            self.assertEqual(5, corpus.convert_hex_log(lines, writer))
+        with corpus.CorpusReader(self._path) as reader:
+            self.assertEqual(self._payloads, [bytes(i) for i in reader])
+
+    def test_main(self) -> None:
+        log_path = Path(self._dir.name, "log.hex")
+        log_path.write_text("\n".join(i.hex() for i in self._payloads), encoding="utf-8")
+        with contextlib.redirect_stdout(io.StringIO()):
+            corpus.main([str(log_path), "-o", str(self._path), "--dictionary-size", "256"])
+            with self.assertRaises(SystemExit), contextlib.redirect_stderr(io.StringIO()):
+                corpus.main([str(log_path), "-o", str(self._path), "--dictionary-size", "256"])
+            corpus.main([str(log_path), "-o", str(self._path)])
+        self.assertEqual([Path(self._path)], list(Path(self._dir.name).glob("*.xndc*")))
+        with corpus.CorpusReader(self._path) as reader:
+            self.assertIsNotNone(reader.codec)
+            self.assertEqual(self._payloads * 2, [bytes(i) for i in reader])
+
+    def test_compressed(self) -> None:
+        codec = compression.DictionaryCodec.train(self._payloads, 512)
+        self.assertLessEqual(len(codec.zdict), 512)
+        report = compression.measure(codec, self._payloads)
+        self.assertGreater(report.ratio, 2)
+        with corpus.CorpusWriter(self._path, codec=codec) as writer:
+            writer.extend(self._payloads[:2])
+        with corpus.CorpusWriter(self._path) as writer:
+            writer.extend(self._payloads[2:])
+        with corpus.CorpusReader(self._path) as reader:
+            self.assertEqual(codec.zdict, reader.codec.zdict)
+            self.assertEqual(self._payloads, list(reader))
+            self.assertEqual(self._payloads[4], reader.decode(4).to_bytes())
+            self.assertLess(len(reader.raw(0)), len(self._payloads[0]))
+
+    def test_training_bounds(self) -> None:
+        def samples():
+            yield from self._payloads[:2]
+            raise AssertionError("read past the training sample")
+
+        self.assertEqual(
+            compression.train_dictionary(self._payloads[:2], 512),
+            compression.train_dictionary(samples(), 512, max_samples=2),
+        )
+        random = Random(0)
+        noise = [random.randbytes(64) for _ in range(100)]
+        with mock.patch.object(compression, "_MAX_SEGMENTS", 64):
+            zdict = compression.train_dictionary(noise + self._payloads * 4, 512)
+        self.assertTrue(zdict)
+        self.assertLessEqual(len(zdict), 512)
+
+
+if __name__ == "__main__":
+    unittest.main()
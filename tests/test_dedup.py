@@ -0,0 +1,44 @@
+import hashlib
+import unittest
+
+from xiaomi_ndef import dedup, tag, xiaomi
+from xiaomi_ndef.mi_connect import MiConnectData
+
+
+def _circulate(write_time: int, mac: bytes) -> bytes:
+    return MiConnectData.from_nfc_payload(xiaomi.new_circulate(write_time, tag.DeviceType.MI_TV, mac, mac)[1]).to_bytes()
+
+
+class DedupTestCase(unittest.TestCase):
+    def test_bloom_filter(self) -> None:
+        bloom_filter = dedup.BloomFilter(1000, 0.01)
+        digests = [hashlib.blake2b(i.to_bytes(4, "big"), digest_size=16).digest() for i in range(11000)]
+        for digest in digests[:1000]:
+            bloom_filter.add(digest)
+        self.assertTrue(all(i in bloom_filter for i in digests[:1000]))
+        false_positives = sum(i in bloom_filter for i in digests[1000:])
+        self.assertLess(false_positives, 300)
+
+    def test_deduplicate(self) -> None:
+        items = [_circulate(1, b"\x01" * 6), _circulate(1, b"\x01" * 6), _circulate(2, b"\x01" * 6), _circulate(1, b"\x02" * 6)]
+        deduplicator = dedup.Deduplicator(capacity=100, exact_size=50)
+        self.assertEqual([items[0], items[2], items[3]], list(deduplicator.filter(items)))
+        self.assertEqual(1, deduplicator.stats.duplicates)
+
+        deduplicator = dedup.Deduplicator(capacity=100, exact_size=50, ignore_write_time=True)
+        self.assertEqual([items[0], items[3]], list(deduplicator.filter(items)))
+        self.assertEqual(2, deduplicator.stats.unique)
+
+    def test_bounded(self) -> None:
+        deduplicator = dedup.Deduplicator(capacity=16, exact_size=8)
+        items = [i.to_bytes(4, "big") for i in range(100)]
+        for item in items:
+            self.assertFalse(deduplicator.is_duplicate(item))
+        self.assertEqual([deduplicator.key(i) for i in items[-8:]], list(deduplicator._exact))
+        self.assertLessEqual(deduplicator._filter.count, 16)
+        self.assertTrue(deduplicator.is_duplicate(items[-1]))
+        self.assertFalse(deduplicator.is_duplicate(items[0]))
+
+
+if __name__ == "__main__":
+    unittest.main()
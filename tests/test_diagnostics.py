@@ -0,0 +1,75 @@
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from xiaomi_ndef import diagnostics, nfc, tag, xiaomi, handoff, mi_connect, ndef
+from xiaomi_ndef.diagnostics import DecodeErrorKind
+from xiaomi_ndef.mi_connect import MiConnectData
+
+
+def _encode(payload: nfc.XiaomiNfcPayload) -> bytes:
+    return MiConnectData.from_nfc_payload(payload).to_bytes()
+
+
+class DiagnosticsTestCase(unittest.TestCase):
+    _V1_PAYLOAD = xiaomi.new_mi_tap_sound_box(1684933764, b"\x00" * 6, b"\x00" * 6, "xiaomi.wifispeaker.x08c")[1]
+    _HANDOFF_PAYLOAD = xiaomi.new_handoff_screen_mirror(handoff.DeviceType.PC, "00:00:00:00:00:00", True)[1]
+
+    def test_valid(self) -> None:
+        for payload in (self._V1_PAYLOAD, self._HANDOFF_PAYLOAD):
+            data = _encode(payload)
+            result = diagnostics.decode(data)
+            self.assertTrue(result.ok)
+            strict = MiConnectData.parse(data)
+            self.assertEqual(
+                strict.to_xiaomi_nfc_payload(strict.get_nfc_protocol()).appData.encode(),
+                result.value.appData.encode()
+            )
+
+    def test_unknown_record(self) -> None:
+        app_data = self._V1_PAYLOAD.appData
+        records = (*app_data.records, tag.NfcTagRawRecord(tag_type=0x7f, content=b"\x01\x02"))
+        data = bytes(tag.NfcTagAppData(app_data.major_version, app_data.minor_version, app_data.write_time, app_data.flags, records).encode())
+        result = diagnostics.decode_tag_app_data(data)
+        self.assertTrue(result.ok)
+        self.assertEqual(1, result.unknown_records)
+        self.assertEqual(records[-1], result.value.records[-1])
+        self.assertEqual(data, result.value.encode())
+
+    def test_truncated(self) -> None:
+        data = self._V1_PAYLOAD.appData.encode()
+        result = diagnostics.decode_tag_app_data(data[:20])
+        self.assertEqual(DecodeErrorKind.INVALID_RECORD_SIZE, result.error.kind)
+        self.assertEqual(8, result.error.offset)
+        self.assertEqual(1684933764, result.partial["write_time"])
+        self.assertEqual((), result.partial["records"])
+
+    def test_batch(self) -> None:
+        truncated = MiConnectData.from_nfc_payload(self._HANDOFF_PAYLOAD)
+        truncated.container.data.appsData[0] = truncated.container.data.appsData[0][:-10]
+        items = [_encode(self._V1_PAYLOAD), b"\xff\xff", truncated.to_bytes()]
+        results, summary = diagnostics.decode_batch(items)
+        self.assertEqual(3, summary.total)
+        self.assertEqual(1, summary.succeeded)
+        self.assertEqual(1, summary.errors[DecodeErrorKind.INVALID_CONTAINER])
+        self.assertEqual(1, summary.errors[DecodeErrorKind.TRUNCATED])
+        self.assertEqual(2, summary.failed)
+        self.assertIsNone(results[1].value)
+
+    def test_batch_threaded(self) -> None:
+        items = [_encode(self._V1_PAYLOAD), b"\xff\xff", _encode(self._HANDOFF_PAYLOAD)] * 100
+        expected, expected_summary = diagnostics.decode_batch(items)
+        results, summary = diagnostics.decode_batch_threaded(iter(items), max_workers=4, chunk_size=7)
+        self.assertEqual(expected, results)
+        self.assertEqual(expected_summary, summary)
+        with ThreadPoolExecutor(2) as executor:
+            self.assertEqual(expected, diagnostics.decode_batch_threaded(items, executor=executor)[0])
+
+    def test_no_mutable_module_state(self) -> None:
+        for module in (tag, handoff, nfc, mi_connect, ndef, diagnostics):
+            for name, value in vars(module).items():
+                if not name.startswith("__"):
+                    self.assertNotIsInstance(value, (dict, list, set, bytearray), f"{module.__name__}.{name}")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,101 @@
+import io
+import json
+import unittest
+from collections import OrderedDict
+
+from xiaomi_ndef import diagnostics, export, handoff, tag, xiaomi
+from xiaomi_ndef.base import UInt8BytesMap
+from xiaomi_ndef.mi_connect import MiConnectData
+
+
+class ExportTestCase(unittest.TestCase):
+    def test_tag(self) -> None:
+        payload_type, payload = xiaomi.new_mi_tap_sound_box(5, b"\x01" * 6, b"\x02" * 6, "model")
+        row = json.loads(export.to_json_row(payload, payload_type, source="reader"))
+        self.assertEqual("V1", row["protocol"])
+        self.assertEqual("reader", row["source"])
+        device, action = row["app_data"]["records"]
+        self.assertEqual("MI_SOUND_BOX", device["device_type"])
+        self.assertEqual(
+            {"BLUETOOTH_MAC_ADDRESS": "02:02:02:02:02:02", "WIFI_MAC_ADDRESS": "01:01:01:01:01:01", "MODEL": "model"},
+            device["attributes"]
+        )
+        self.assertEqual("AUTO", action["action"])
+
+    def test_attributes(self) -> None:
+        record = tag.NfcTagDeviceRecord(
+            device_type=0x7f,
+            flags=0,
+            device_number=0,
+            attributes_map=tag.NfcTagDeviceRecord.new_attributes_map([
+                tag.DeviceAttribute.APP_DATA.new_pair(
+                    tag.NfcTagDeviceRecord.encode_app_data_value_map(OrderedDict([tag.DeviceAttribute.MODEL.new_pair("model")]))
+                ),
+                tag.DeviceAttribute.IOT_DEVICE_MAC.new_pair("00:00:00:00:00:01"),
+            ])
+        )
+        exported = record.to_dict(tag.Action.IOT, tag.XiaomiNdefTNF.SMART_HOME)
+        self.assertEqual(0x7f, exported["device_type"])
+        self.assertEqual({"IOT_APP_DATA", "IOT_DEVICE_MAC"}, set(exported["attributes"]))
+        exported = record.to_dict()
+        self.assertEqual({"MODEL": "model"}, exported["attributes"]["APP_DATA"])
+        self.assertEqual(b"00:00:00:00:00:01".hex(":").upper(), exported["attributes"]["BLUETOOTH_MAC_ADDRESS"])
+
+    def test_lossless(self) -> None:
+        app_data = tag.NfcTagAppData(
+            major_version=1,
+            minor_version=0,
+            write_time=0,
+            flags=0,
+            records=(
+                tag.NfcTagDeviceRecord(
+                    device_type=0x7f,
+                    flags=0,
+                    device_number=0,
+                    attributes_map=tag.NfcTagDeviceRecord.new_attributes_map([
+                        tag.DeviceAttribute.MODEL.new_pair(b"\xff\xfe"),
+                        tag.DeviceAttribute.SSID.new_pair("hex:00"),
+                        tag.DeviceAttribute.APP_DATA.new_pair(b"mxD\x00\x01\x00\x05"),
+                    ])
+                ),
+            )
+        )
+        exported = app_data.to_dict()
+        attributes = exported["records"][0]["attributes"]
+        self.assertEqual("hex:fffe", attributes["MODEL"])
+        self.assertEqual(b"hex:00", bytes.fromhex(attributes["SSID"][len("hex:"):]))
+        self.assertEqual(b"mxD\x00\x01\x00\x05".hex(), attributes["APP_DATA"])
+        self.assertEqual(app_data, tag.NfcTagAppData.from_dict(json.loads(json.dumps(exported))))
+
+        handoff_data = handoff.HandoffAppData(
+            major_version=0x27,
+            minor_version=0x17,
+            device_type=handoff.DeviceType.PC.value,
+            attributes_map=UInt8BytesMap(),
+            action="TAG_DISCOVERED",
+            payloads_map=handoff.HandoffAppData.new_payloads_map([
+                handoff.PayloadKey.BLUETOOTH_MAC.new_pair(b"\x80"),
+                handoff.PayloadKey.ACTION_SUFFIX.new_pair("MIRROR"),
+            ])
+        )
+        exported = handoff_data.to_dict()
+        self.assertEqual({"BLUETOOTH_MAC": "hex:80", "ACTION_SUFFIX": "MIRROR"}, exported["payloads"])
+        self.assertEqual(handoff_data, handoff.HandoffAppData.from_dict(exported))
+
+    def test_writer(self) -> None:
+        payload = xiaomi.new_handoff_screen_mirror(handoff.DeviceType.PC, "00:11:22:33:44:55", True)[1]
+        data = MiConnectData.from_nfc_payload(payload).to_bytes()
+        file = io.StringIO()
+        writer = export.JsonLinesWriter(file)
+        self.assertEqual(1, writer.write_all([payload]))
+        writer.write_result(diagnostics.decode(data[:-4]), index=1)
+        first, second = (json.loads(i) for i in file.getvalue().splitlines())
+        self.assertEqual({"ACTION_SUFFIX": "MIRROR", "BLUETOOTH_MAC": "00:11:22:33:44:55", "EXT_ABILITY": "01"}, first["app_data"]["payloads"])
+        self.assertEqual("PC", first["app_data"]["device_type"])
+        self.assertEqual(1, second["index"])
+        self.assertIn("error", second)
+        self.assertEqual(2, writer.rows)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+import dataclasses
+import sqlite3
+import tempfile
+import unittest
+from collections import OrderedDict
+from pathlib import Path
+
+from xiaomi_ndef import corpus, handoff, index, tag, xiaomi
+from xiaomi_ndef.mi_connect import MiConnectData
+
+
+def _encode(item: tuple) -> bytes:
+    return MiConnectData.from_nfc_payload(item[1]).to_bytes()
+
+
+class AttributeIndexTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self._dir = tempfile.TemporaryDirectory()
+        self._corpus_path = Path(self._dir.name, "test.xndc")
+        self._index_path = Path(self._dir.name, "test.db")
+
+    def tearDown(self) -> None:
+        self._dir.cleanup()
+
+    def test_index(self) -> None:
+        with corpus.CorpusWriter(self._corpus_path) as writer:
+            writer.append(_encode(xiaomi.new_mi_tap_sound_box(0, None, b"\x11" * 6, "xiaomi.wifispeaker.x08c")))
+            writer.append(_encode(xiaomi.new_handoff_screen_mirror(handoff.DeviceType.PC, "11:11:11:11:11:11", False)))
+            writer.append(b"\xff\xff")
+        with corpus.CorpusReader(self._corpus_path) as reader, index.AttributeIndex(self._index_path) as attribute_index:
+            self.assertEqual(3, attribute_index.update(reader))
+            self.assertEqual(0, attribute_index.update(reader))
+            self.assertEqual([0], attribute_index.lookup(tag.DeviceAttribute.MODEL, "xiaomi.wifispeaker.x08c"))
+            self.assertEqual([1], attribute_index.lookup(handoff.PayloadKey.ACTION_SUFFIX, "MIRROR"))
+            self.assertEqual([0, 1], attribute_index.lookup_mac("11:11:11:11:11:11"))
+
+        with corpus.CorpusWriter(self._corpus_path) as writer:
+            writer.append(_encode(xiaomi.new_circulate(0, tag.DeviceType.MI_TV, b"\x22" * 6, b"\x11" * 6)))
+        with corpus.CorpusReader(self._corpus_path) as reader, index.AttributeIndex(self._index_path) as attribute_index:
+            self.assertEqual(1, attribute_index.update(reader))
+            self.assertEqual(4, attribute_index.indexed_entries)
+            self.assertEqual([0, 3], attribute_index.lookup(tag.DeviceAttribute.BLUETOOTH_MAC_ADDRESS, b"\x11" * 6))
+
+    def test_nested_app_data(self) -> None:
+        ndef_type, payload = xiaomi.new_circulate(0, tag.DeviceType.MI_TV, b"\x22" * 6, b"\x22" * 6)
+        device_record = dataclasses.replace(
+            payload.appData.records[0],
+            attributes_map=tag.NfcTagDeviceRecord.new_attributes_map([
+                tag.DeviceAttribute.APP_DATA.new_pair(
+                    tag.NfcTagDeviceRecord.encode_app_data_value_map(OrderedDict([tag.DeviceAttribute.WIFI_MAC_ADDRESS.new_pair(b"\x33" * 6)]))
+                ),
+            ])
+        )
+        app_data = dataclasses.replace(payload.appData, records=(device_record, *payload.appData.records[1:]))
+        with corpus.CorpusWriter(self._corpus_path) as writer:
+            writer.append(_encode((ndef_type, dataclasses.replace(payload, appData=app_data))))
+        with corpus.CorpusReader(self._corpus_path) as reader, index.AttributeIndex(self._index_path) as attribute_index:
+            attribute_index.update(reader)
+            self.assertEqual([0], attribute_index.lookup_mac("33:33:33:33:33:33"))
+
+        with sqlite3.connect(self._index_path) as connection:
+            connection.execute("UPDATE meta SET value = 1 WHERE name = 'format'")
+        with corpus.CorpusReader(self._corpus_path) as reader, index.AttributeIndex(self._index_path) as attribute_index:
+            self.assertEqual(0, attribute_index.indexed_entries)
+            self.assertEqual(1, attribute_index.update(reader))
+
+
+if __name__ == "__main__":
+    unittest.main()
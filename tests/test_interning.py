@@ -0,0 +1,56 @@
+import unittest
+from io import BytesIO
+
+from xiaomi_ndef import diagnostics, handoff, interning, xiaomi
+from xiaomi_ndef.mi_connect import MiConnectData
+
+
+class InternerTestCase(unittest.TestCase):
+    def test_bounded(self) -> None:
+        interner = interning.Interner(max_size=2)
+        first = interner.intern(bytes.fromhex("0102"))
+        self.assertIs(first, interner.intern(bytes.fromhex("0102")))
+        interner.intern(b"\x03")
+        interner.intern(b"\x04")
+        self.assertEqual(2, len(interner))
+        self.assertEqual(1, interner.stats.evictions)
+        self.assertIsNot(first, interner.intern(bytes.fromhex("0102")))
+        self.assertEqual(1, interner.stats.hits)
+        self.assertEqual(0.2, interner.stats.hit_rate)
+
+    def test_decoders(self) -> None:
+        payloads = [
+            xiaomi.new_mi_tap_sound_box(i, b"\x01" * 6, bytes([i] * 6), "xiaomi.wifispeaker.x08c")[1] for i in range(3)
+        ] + [
+            xiaomi.new_handoff_screen_mirror(handoff.DeviceType.PC, "00:11:22:33:44:55", True)[1] for _ in range(3)
+        ]
+        items = [MiConnectData.from_nfc_payload(i).to_bytes() for i in payloads]
+
+        interner = interning.Interner()
+        decoded = []
+        for data in items:
+            mi_connect_data = MiConnectData.parse(data)
+            decoded.append(mi_connect_data.to_xiaomi_nfc_payload(mi_connect_data.get_nfc_protocol(), interner).appData)
+        self.assertEqual([i.appData for i in payloads], decoded)
+        self.assertIs(decoded[0].records[0].attributes_map[18], decoded[2].records[0].attributes_map[18])
+        self.assertIs(decoded[3].action, decoded[5].action)
+        self.assertIs(decoded[3].payloads_map[1], decoded[4].payloads_map[1])
+        self.assertGreater(interner.stats.saved_bytes, 0)
+
+        interner = interning.Interner()
+        results, _ = diagnostics.decode_batch(items, interner)
+        self.assertEqual(payloads, [i.value for i in results])
+        self.assertIs(results[3].value.appData.action, results[4].value.appData.action)
+        self.assertIs(results[0].value.appData.records[0].attributes_map[1], results[1].value.appData.records[0].attributes_map[1])
+
+    def test_large_values(self) -> None:
+        interner = interning.Interner(max_value_size=4)
+        value = handoff.HandoffAppData.new_payloads_map([handoff.PayloadKey.EXT_ABILITY.new_pair(b"\x01" * 8)]).encode()
+        first = handoff.UInt8BytesMap.read_from(BytesIO(value), interner=interner)
+        second = handoff.UInt8BytesMap.read_from(BytesIO(value), interner=interner)
+        self.assertIsNot(first[121], second[121])
+        self.assertEqual(0, len(interner))
+
+
+if __name__ == '__main__':
+    unittest.main()
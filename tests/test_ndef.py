@@ -0,0 +1,30 @@
+import unittest
+
+from pyndef import NdefMessage
+
+from xiaomi_ndef import ndef, xiaomi, handoff, tag
+
+
+class XiaomiNdefTestCase(unittest.TestCase):
+    def test_encode_record(self) -> None:
+        payload_type, payload = xiaomi.new_handoff_screen_mirror(handoff.DeviceType.PC, "00:00:00:00:00:00", True)
+        record = ndef.new_xiaomi_ndef_record(payload_type, payload)
+        self.assertEqual(NdefMessage(record).to_bytes(), ndef.new_xiaomi_ndef_record_bytes(payload_type, payload))
+
+    def test_encode_long_record(self) -> None:
+        data = bytes(300)
+        message = ndef.encode_xiaomi_ndef_record(tag.XiaomiNdefTNF.SMART_HOME, data)
+        record = NdefMessage.parse(message).records[0]
+        self.assertEqual(tag.XiaomiNdefTNF.SMART_HOME, tag.XiaomiNdefTNF.parse(record.record_type))
+        self.assertEqual(data, record.payload)
+
+    def test_encode_mi_tap_message(self) -> None:
+        payload_type, payload = xiaomi.new_mi_tap_sound_box(0, b"\x00" * 6, b"\x00" * 6, "xiaomi.wifispeaker.x08c")
+        message = ndef.new_mi_tap_ndef_message(ndef.new_xiaomi_ndef_record(payload_type, payload))
+        self.assertEqual(message.to_bytes(), ndef.new_mi_tap_ndef_message_bytes(payload_type, payload))
+        with self.assertRaises(ValueError):
+            ndef.encode_mi_tap_ndef_message(tag.XiaomiNdefTNF.UNKNOWN, b"")
+
+
+if __name__ == "__main__":
+    unittest.main()
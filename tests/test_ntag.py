@@ -0,0 +1,39 @@
+import unittest
+
+from xiaomi_ndef import ntag
+
+
+class NtagImageTestCase(unittest.TestCase):
+    _SHORT_MESSAGE = bytes.fromhex("d10101550001")
+    _LONG_MESSAGE = bytes(300)
+
+    def test_short_image(self) -> None:
+        image = ntag.build_image(self._SHORT_MESSAGE, ntag.NtagType.NTAG213)
+        self.assertEqual(bytes.fromhex("0306d10101550001fe000000"), image)
+        self.assertEqual(self._SHORT_MESSAGE, bytes(ntag.find_ndef_tlv(image)))
+
+    def test_long_image(self) -> None:
+        image = ntag.build_image(self._LONG_MESSAGE)
+        self.assertEqual(0, len(image) % ntag.PAGE_SIZE)
+        self.assertEqual(bytes.fromhex("03ff012c"), image[:4])
+        self.assertEqual(self._LONG_MESSAGE, bytes(ntag.find_ndef_tlv(image)))
+        with self.assertRaises(ValueError):
+            ntag.build_image(self._LONG_MESSAGE, ntag.NtagType.NTAG213)
+        self.assertTrue(ntag.fits(len(self._LONG_MESSAGE), ntag.NtagType.NTAG215))
+
+    def test_build_images(self) -> None:
+        messages = [self._SHORT_MESSAGE, memoryview(self._LONG_MESSAGE)]
+        images = ntag.build_images(messages)
+        self.assertEqual([ntag.build_image(i) for i in messages], [bytes(i) for i in images])
+
+    def test_parse_dump(self) -> None:
+        header = bytes(12) + ntag.NtagType.NTAG213.capability_container
+        dump = header + bytes.fromhex("000103a00c34") + ntag.build_image(self._SHORT_MESSAGE)
+        self.assertEqual(self._SHORT_MESSAGE, bytes(ntag.parse_dump(dump)))
+        self.assertIsNone(ntag.parse_dump(header + b"\xfe"))
+        with self.assertRaises(ValueError):
+            ntag.parse_dump(header + b"\x03\x10\x00")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,70 @@
+import unittest
+
+from xiaomi_ndef import ndef, ntag, rewrite, xiaomi
+
+
+def _message(write_time: int, bluetooth_mac: bytes = b"\x00" * 6, model: str = "xiaomi.wifispeaker.x08c") -> bytes:
+    return ndef.new_xiaomi_ndef_record_bytes(*xiaomi.new_mi_tap_sound_box(write_time, b"\x00" * 6, bluetooth_mac, model))
+
+
+class RewritePlanTestCase(unittest.TestCase):
+    def _provisioned(self, message: bytes) -> rewrite.TagMemory:
+        memory = rewrite.TagMemory.blank(ntag.NtagType.NTAG215)
+        memory.apply(rewrite.plan_rewrite(memory.dump(), message))
+        self.assertEqual(message, memory.ndef_message())
+        return memory
+
+    def test_blank_tag(self) -> None:
+        message = _message(0)
+        memory = rewrite.TagMemory.blank(ntag.NtagType.NTAG215)
+        self.assertEqual(ntag.NtagType.NTAG215, memory.tag_type)
+        self.assertEqual(ntag.NtagType.NTAG215.user_pages, memory.user_pages)
+        plan = rewrite.plan_rewrite(memory.dump(), message)
+        self.assertEqual(ntag.image_pages(len(message)), plan.image_pages)
+        self.assertEqual(ntag.USER_DATA_PAGE, plan.writes[-1].page)
+
+    def test_write_time(self) -> None:
+        memory = self._provisioned(_message(0))
+        message = _message(0x12345678)
+        plan = rewrite.plan_rewrite(memory.dump(), message)
+        self.assertLessEqual(len(plan), 2)
+        self.assertGreater(plan.skipped_pages, 30)
+        memory.apply(plan)
+        self.assertEqual(message, memory.ndef_message())
+        self.assertEqual(0, len(rewrite.plan_rewrite(memory.dump(), message)))
+
+    def test_length_change(self) -> None:
+        memory = self._provisioned(_message(0, model="xiaomi.wifispeaker.x08c.long"))
+        message = _message(0, b"\x01" * 6)
+        plan = rewrite.plan_rewrite(memory.dump(), message)
+        self.assertEqual(ntag.USER_DATA_PAGE, plan.writes[-1].page)
+        self.assertEqual(sorted(i.page for i in plan.writes[:-1]), [i.page for i in plan.writes[:-1]])
+        memory.apply(plan)
+        self.assertEqual(message, memory.ndef_message())
+
+    def test_torn_write(self) -> None:
+        old_message = _message(0)
+        memory = self._provisioned(old_message)
+        message = _message(0x12345678, b"\x01" * 6)
+        plan = rewrite.plan_rewrite(memory.dump(), message)
+        self.assertEqual([ntag.USER_DATA_PAGE] * 2, [plan.writes[0].page, plan.writes[-1].page])
+        self.assertEqual(len(plan) - 1, plan.image_pages - plan.skipped_pages)
+        states = []
+        for write in plan:
+            memory.write_page(write.page, write.data)
+            states.append(memory.ndef_message())
+        self.assertEqual([b""] * (len(plan) - 1) + [message], states)
+        self.assertNotIn(old_message, states)
+
+    def test_capacity(self) -> None:
+        memory = rewrite.TagMemory.blank(ntag.NtagType.NTAG213)
+        with self.assertRaises(ValueError):
+            rewrite.plan_rewrite(memory.dump(), _message(0))
+        with self.assertRaises(ValueError):
+            rewrite.plan_rewrite(memory.dump()[:ntag.USER_DATA_OFFSET + 8], _message(0), ntag.NtagType.NTAG216)
+        with self.assertRaises(ValueError):
+            memory.write_page(ntag.USER_DATA_PAGE - 1, bytes(ntag.PAGE_SIZE))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+import dataclasses
+import unittest
+from io import BytesIO
+
+from xiaomi_ndef import schema
+from xiaomi_ndef.base import BinaryData, UInt8BytesMap
+
+
+@dataclasses.dataclass(frozen=True)
+class _Item(BinaryData):
+    value: int
+
+    def size(self) -> int:
+        return _ITEM_CODEC.size(self)
+
+    def encode_into(self, buffer: BytesIO) -> None:
+        _ITEM_CODEC.encode_into(self, buffer)
+
+    @staticmethod
+    def decode(buffer: BytesIO) -> '_Item':
+        return _ITEM_CODEC.decode(buffer)
+
+
+@dataclasses.dataclass(frozen=True)
+class _Container(BinaryData):
+    version: int
+    name: str
+    blob: bytes
+    items: tuple[_Item, ...]
+    extras: UInt8BytesMap
+
+    def size(self) -> int:
+        return _CONTAINER_CODEC.size(self)
+
+    def encode_into(self, buffer: BytesIO) -> None:
+        _CONTAINER_CODEC.encode_into(self, buffer)
+
+
+_ITEM_CODEC = schema.compile_schema(_Item, (schema.UIntField("value", 4),))
+_CONTAINER_CODEC = schema.compile_schema(_Container, (
+    schema.UIntField("version", 2),
+    schema.StringField("name", 1),
+    schema.BytesField("blob", 2),
+    schema.RecordsField("items", _Item, 1),
+    schema.BytesMapField("extras", UInt8BytesMap),
+))
+
+
+class SchemaCodecTestCase(unittest.TestCase):
+    _DATA = _Container(
+        version=0x0102,
+        name="abc",
+        blob=b"\xff",
+        items=(_Item(1), _Item(0xffffffff)),
+        extras=UInt8BytesMap([(1, b"x")])
+    )
+    _BYTES = bytes.fromhex("0102" + "03616263" + "0001ff" + "02" + "00000001" + "ffffffff" + "010178")
+
+    def test_round_trip(self) -> None:
+        self.assertEqual(self._BYTES, self._DATA.encode())
+        self.assertEqual(len(self._BYTES), self._DATA.size())
+        self.assertEqual(self._DATA, _CONTAINER_CODEC.decode(BytesIO(self._BYTES)))
+
+    def test_header(self) -> None:
+        self.assertEqual(">HB", _CONTAINER_CODEC.header.format)
+        self.assertEqual(">I", _ITEM_CODEC.header.format)
+        self.assertIsNone(schema.compile_schema(_Item, (schema.BytesField("value"),)).header)
+
+    def test_errors(self) -> None:
+        with self.assertRaises(ValueError):
+            dataclasses.replace(self._DATA, version=0x10000).encode()
+        with self.assertRaises(ValueError):
+            _CONTAINER_CODEC.decode(BytesIO(self._BYTES[:8]))
+        with self.assertRaises(ValueError):
+            schema.UIntField("value", 3)._prefix()
+
+
+if __name__ == "__main__":
+    unittest.main()
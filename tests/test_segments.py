@@ -0,0 +1,71 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from xiaomi_ndef import handoff, segments, tag, xiaomi
+from xiaomi_ndef.corpus import CorpusFormatError
+from xiaomi_ndef.mi_connect import MiConnectData
+
+
+def _circulate(write_time: int) -> bytes:
+    payload = xiaomi.new_circulate(write_time, tag.DeviceType.MI_TV, b"\x01" * 6, b"\x02" * 6)[1]
+    return MiConnectData.from_nfc_payload(payload).to_bytes()
+
+
+class SegmentsTestCase(unittest.TestCase):
+    def test_query(self) -> None:
+        write_times = [50, 10, 40, 20, 30, 30, 70, 60, 90, 80]
+        handoff_data = MiConnectData.from_nfc_payload(
+            xiaomi.new_handoff_screen_mirror(handoff.DeviceType.PC, "00:11:22:33:44:55", True)[1]
+        ).to_bytes()
+        with tempfile.TemporaryDirectory() as directory:
+            with segments.SegmentWriter(directory, segment_size=4) as writer:
+                self.assertEqual(10, writer.extend(_circulate(i) for i in write_times))
+                self.assertFalse(writer.append(handoff_data))
+            self.assertEqual(1, writer.skipped)
+            self.assertEqual([(10, 50), (30, 70), (80, 90)], [(i.min_write_time, i.max_write_time) for i in writer.segments])
+
+            with segments.SegmentStore(directory) as store:
+                self.assertEqual(10, len(store))
+                self.assertEqual([30, 30, 40, 50], [i for i, _ in store.query(25, 50)])
+                self.assertEqual([], list(store.query(91, 100)))
+                decoded = list(store.decode_range(80, 85))
+                self.assertEqual([80], [i.appData.write_time for i in decoded])
+                self.assertEqual(_circulate(80), MiConnectData.from_nfc_payload(decoded[0]).to_bytes())
+
+            with segments.SegmentWriter(directory) as writer:
+                writer.append(_circulate(100))
+            self.assertEqual("00000003.xnds", writer.segments[0].path.name)
+
+    def test_concurrent_writers(self) -> None:
+        with tempfile.TemporaryDirectory() as directory:
+            first = segments.SegmentWriter(directory)
+            second = segments.SegmentWriter(directory)
+            first.extend(_circulate(i) for i in (10, 30, 50))
+            second.extend(_circulate(i) for i in (20, 40, 60))
+            first.close()
+            second.close()
+            self.assertEqual(["00000000.xnds", "00000001.xnds"], [i.name for i in sorted(Path(directory).iterdir())])
+            with segments.SegmentStore(directory) as store:
+                self.assertEqual([20, 30, 40, 50], [i for i, _ in store.query(15, 55)])
+
+    def test_close_with_views(self) -> None:
+        with tempfile.TemporaryDirectory() as directory:
+            with segments.SegmentWriter(directory, segment_size=2) as writer:
+                writer.extend(_circulate(i) for i in range(4))
+            with segments.SegmentStore(directory) as store:
+                rows = list(store.query(0, 10))
+            self.assertEqual([_circulate(i) for i in range(4)], [bytes(data) for _, data in rows])
+            del rows
+
+    def test_truncated(self) -> None:
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / "00000000.xnds"
+            segments.write_segment(path, [(1, _circulate(1))])
+            path.write_bytes(path.read_bytes()[:-1])
+            with self.assertRaises(CorpusFormatError):
+                segments.SegmentStore(directory)
+
+
+if __name__ == '__main__':
+    unittest.main()
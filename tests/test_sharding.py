@@ -0,0 +1,40 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from xiaomi_ndef import sharding, simulator
+from xiaomi_ndef.corpus import CorpusWriter
+
+
+class ShardingTestCase(unittest.TestCase):
+    def test_deterministic_merge(self) -> None:
+        generator = simulator.TrafficGenerator(simulator.TrafficMix(malformed_rate=0.1), seed=7)
+        with tempfile.TemporaryDirectory() as directory:
+            directory = Path(directory)
+            corpus_paths = [directory / "a.xndc", directory / "b.xndc"]
+            for path in corpus_paths:
+                with CorpusWriter(path) as writer:
+                    writer.extend(generator.frame()[0] for _ in range(150))
+
+            outputs = []
+            summaries = []
+            for shards in (1, 3, 4):
+                merged_path = directory / f"merged-{shards}.jsonl"
+                summaries.append(sharding.run_local(corpus_paths, directory / f"work-{shards}", merged_path, shards, processes=2))
+                outputs.append(merged_path.read_bytes())
+                self.assertEqual(shards, len(list((directory / f"work-{shards}").glob("*.stats.json"))))
+
+            self.assertEqual(outputs[0], outputs[1])
+            self.assertEqual(outputs[0], outputs[2])
+            self.assertEqual(300, len(outputs[0].splitlines()))
+            self.assertEqual(summaries[0], summaries[1])
+            self.assertEqual(300, summaries[2].total)
+            self.assertGreater(summaries[0].failed, 0)
+
+    def test_shard_of(self) -> None:
+        self.assertEqual(sharding.shard_of(b"\x01\x02", 8), sharding.shard_of(b"\x01\x02", 8))
+        self.assertEqual(0, sharding.shard_of(b"\x01\x02", 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,115 @@
+import os
+import pickle
+import subprocess
+import sys
+import textwrap
+import unittest
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import resource_tracker
+from pathlib import Path
+
+from xiaomi_ndef import base, handoff, nfc, shared, tag, xiaomi
+from xiaomi_ndef.mi_connect import MiConnectData
+
+
+class PickleTestCase(unittest.TestCase):
+    def test_round_trip(self) -> None:
+        payloads = [
+            xiaomi.new_mi_tap_sound_box(5, b"\x01" * 6, b"\x02" * 6, "model")[1],
+            xiaomi.new_handoff_screen_mirror(handoff.DeviceType.PC, "00:11:22:33:44:55", True)[1],
+        ]
+        for payload in payloads:
+            restored = pickle.loads(pickle.dumps(payload))
+            self.assertEqual(payload, restored)
+            self.assertIs(payload.protocol, restored.protocol)
+            self.assertLess(len(pickle.dumps(payload.appData)), len(pickle.dumps(payload.appData, protocol=0)))
+        mi_connect_data = MiConnectData.from_nfc_payload(payloads[0])
+        self.assertEqual(mi_connect_data.to_bytes(), pickle.loads(pickle.dumps(mi_connect_data)).to_bytes())
+        self.assertIs(nfc.V1NfcProtocol, pickle.loads(pickle.dumps(nfc.V1NfcProtocol)))
+
+    def test_fallback(self) -> None:
+        zero_key_map = base.UInt8BytesMap(OrderedDict([(0, b"\x01")]))
+        self.assertEqual(zero_key_map, pickle.loads(pickle.dumps(zero_key_map)))
+        app_data = tag.NfcTagAppData(1, 0, 0, 0, (tag.NfcTagRawRecord(tag_type=9, content=b"\x01\x02"),))
+        self.assertEqual(app_data, pickle.loads(pickle.dumps(app_data)))
+
+    def test_lossy_wire_form(self) -> None:
+        device_record = tag.NfcTagDeviceRecord(1, 0, 0, base.UInt16BytesMap([(0, b"x"), (2, b"y")]))
+        action_record = tag.NfcTagActionRecord(1, 2, 0, 0, condition_parameters=b"")
+        raw_record = tag.NfcTagRawRecord(tag_type=1, content=bytes(6))
+        for value in (device_record, action_record, raw_record, tag.NfcTagAppData(1, 0, 0, 0, (device_record, action_record))):
+            with self.subTest(value=value):
+                restored = pickle.loads(pickle.dumps(value))
+                self.assertEqual(value, restored)
+                self.assertIs(type(value), type(restored))
+
+
+def _read_batch(handle: shared.SharedBatchHandle) -> list:
+    with shared.SharedBatch(handle) as batch:
+        return list(batch)
+
+
+def _pack_batch(payloads: list) -> tuple[shared.SharedBatchHandle, int]:
+    handle = shared.pack_batch(payloads)
+    # noinspection PyProtectedMember
+    return handle, resource_tracker._resource_tracker._pid
+
+
+class SharedBatchTestCase(unittest.TestCase):
+    def test_round_trip(self) -> None:
+        payloads = [
+            xiaomi.new_mi_tap_sound_box(5, b"\x01" * 6, b"\x02" * 6, "model")[1],
+            xiaomi.new_handoff_screen_mirror(handoff.DeviceType.PC, "00:11:22:33:44:55", True)[1],
+        ]
+        handle = shared.pack_batch(payloads)
+        handle = pickle.loads(pickle.dumps(handle))
+        with shared.SharedBatch(handle) as batch:
+            self.assertEqual(2, len(batch))
+            self.assertEqual(MiConnectData.from_nfc_payload(payloads[1]).to_bytes(), bytes(batch.raw(-1)))
+            self.assertEqual(payloads, list(batch))
+            with self.assertRaises(IndexError):
+                batch.raw(2)
+
+    def test_process(self) -> None:
+        payloads = [
+            xiaomi.new_circulate(7, tag.DeviceType.MI_TV, b"\x01" * 6, b"\x02" * 6)[1],
+            xiaomi.new_handoff_tv_cast(handoff.DeviceType.TV, "00:11:22:33:44:55", "66:77:88:99:AA:BB")[1],
+        ]
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            self.assertEqual(payloads, executor.submit(_read_batch, shared.pack_batch(payloads)).result())
+
+    def test_packed_in_worker(self) -> None:
+        # A fresh interpreter, so the worker starts a resource tracker of its own that exits with it.
+        script = textwrap.dedent("""
+            import multiprocessing, os, time
+            from concurrent.futures import ProcessPoolExecutor
+            from test_shared import _pack_batch
+            from xiaomi_ndef import shared, xiaomi
+
+            payloads = [xiaomi.new_mi_tap_sound_box(5, b"\\x01" * 6, b"\\x02" * 6, "model")[1]]
+            with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("fork")) as executor:
+                handle, tracker_pid = executor.submit(_pack_batch, payloads).result()
+            deadline = time.monotonic() + 10
+            while time.monotonic() < deadline:
+                try:
+                    os.kill(tracker_pid, 0)
+                except ProcessLookupError:
+                    break
+                time.sleep(0.01)
+            with shared.SharedBatch(handle) as batch:
+                assert payloads == list(batch)
+        """)
+        root = Path(__file__).parent.parent
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join((str(root / "src"), str(root / "tests"))))
+        result = subprocess.run([sys.executable, "-c", script], cwd=root, env=env, capture_output=True, text=True)
+        self.assertEqual(0, result.returncode, result.stderr)
+        self.assertNotIn("leaked", result.stderr)
+
+    def test_empty(self) -> None:
+        with shared.SharedBatch(shared.pack_batch([])) as batch:
+            self.assertEqual([], list(batch))
+
+
+if __name__ == '__main__':
+    unittest.main()
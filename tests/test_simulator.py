@@ -0,0 +1,41 @@
+import io
+import unittest
+
+from xiaomi_ndef import handoff, simulator, xiaomi
+
+
+class SimulatorTestCase(unittest.TestCase):
+    def test_round_trip(self) -> None:
+        generator = simulator.TrafficGenerator(simulator.TrafficMix(malformed_rate=0.2), seed=1)
+        sink = io.BytesIO()
+        sent = simulator.send(generator, sink, 500)
+        self.assertEqual(500, sent.frames)
+        self.assertGreater(sent.malformed, 0)
+
+        report = simulator.consume(io.BytesIO(sink.getvalue()))
+        self.assertEqual(500, report.frames)
+        self.assertLessEqual(report.summary.failed, sent.malformed)
+        self.assertGreater(report.summary.failed, 0)
+        self.assertLessEqual(report.latency_percentiles[50], report.latency_percentiles[99])
+        self.assertLessEqual(report.latency_percentiles[99], report.max_latency)
+
+    def test_mix(self) -> None:
+        generator = simulator.TrafficGenerator(simulator.TrafficMix(mi_tap=0, circulate=0, screen_mirror=0, tv_cast=1), seed=1)
+        app_data = generator.payload().appData
+        self.assertEqual(b"TVCAST", app_data.payloads_map[handoff.PayloadKey.ACTION_SUFFIX.key_value])
+        with self.assertRaises(ValueError):
+            simulator.TrafficMix(mi_tap=0, circulate=0, screen_mirror=0, tv_cast=0)
+
+    def test_rate(self) -> None:
+        generator = simulator.TrafficGenerator(seed=1)
+        report = simulator.send(generator, io.BytesIO(), 50, rate=1000)
+        self.assertGreaterEqual(report.seconds, 0.045)
+
+    def test_tv_cast_wifi_mac(self) -> None:
+        payload = xiaomi.new_handoff_tv_cast(handoff.DeviceType.TV, "00:00:00:00:00:01", "00:00:00:00:00:02")[1]
+        self.assertEqual(b"00:00:00:00:00:01", payload.appData.payloads_map[handoff.PayloadKey.WIFI_MAC.key_value])
+        self.assertEqual(b"00:00:00:00:00:02", payload.appData.payloads_map[handoff.PayloadKey.BLUETOOTH_MAC.key_value])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+import unittest
+
+from xiaomi_ndef import handoff, ndef, ntag, stream, xiaomi
+from xiaomi_ndef.mi_connect import MiConnectData
+
+
+def _feed(parser: stream.PushParser, data: bytes, chunk_size: int) -> list[stream.ParserEvent]:
+    events = []
+    for i in range(0, len(data), chunk_size):
+        events.extend(parser.feed(data[i:i + chunk_size]))
+    return events
+
+
+class PushParserTestCase(unittest.TestCase):
+    def test_tag(self) -> None:
+        payload_type, payload = xiaomi.new_mi_tap_sound_box(5, b"\x01" * 6, b"\x02" * 6, "model")
+        data = ndef.new_mi_tap_ndef_message_bytes(payload_type, payload)
+        for chunk_size in (1, ntag.PAGE_SIZE, len(data)):
+            parser = stream.PushParser()
+            events = _feed(parser, data, chunk_size)
+            self.assertEqual(
+                [stream.NdefHeaderParsed, stream.ProtocolKnown, stream.TagHeaderParsed, stream.RecordParsed, stream.RecordParsed, stream.Done],
+                [type(i) for i in events]
+            )
+            self.assertEqual(payload.protocol, events[1].protocol)
+            self.assertEqual(payload.appData.records[1], events[4].record)
+            self.assertEqual(payload, events[-1].payload)
+            parser.close()
+
+    def test_handoff(self) -> None:
+        payload_type, payload = xiaomi.new_handoff_screen_mirror(handoff.DeviceType.PC, "00:11:22:33:44:55", True)
+        for layer, data in (
+                (stream.StreamLayer.TLV, ntag.build_image(ndef.new_mi_tap_ndef_message_bytes(payload_type, payload))),
+                (stream.StreamLayer.MI_CONNECT, MiConnectData.from_nfc_payload(payload).to_bytes()),
+        ):
+            events = _feed(stream.PushParser(layer), data, ntag.PAGE_SIZE)
+            header = next(i for i in events if isinstance(i, stream.HandoffHeaderParsed))
+            self.assertEqual(payload.appData.action, header.action)
+            self.assertEqual(payload, events[-1].payload)
+
+    def test_done_before_trailer(self) -> None:
+        payload_type, payload = xiaomi.new_mi_tap_sound_box(5, b"\x01" * 6, b"\x02" * 6, "model")
+        data = ndef.new_xiaomi_ndef_record_bytes(payload_type, payload)
+        parser = stream.PushParser()
+        self.assertIsInstance(parser.feed(data + b"\xff")[-1], stream.Done)
+        self.assertEqual([], parser.feed(b"\x00"))
+
+    def test_invalid(self) -> None:
+        payload_type, payload = xiaomi.new_mi_tap_sound_box(5, b"\x01" * 6, b"\x02" * 6, "model")
+        data = ndef.new_mi_tap_ndef_message_bytes(payload_type, payload)
+        parser = stream.PushParser()
+        parser.feed(data[:30])
+        with self.assertRaises(ValueError):
+            parser.close()
+        with self.assertRaises(ValueError):
+            stream.PushParser().feed(b"\xd1\x01\x01U\x00")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,7 +1,10 @@
 import unittest
+from collections import OrderedDict
 from typing import TypeVar
+from unittest import mock
 
 from xiaomi_ndef import handoff
+from xiaomi_ndef import mi_connect
 from xiaomi_ndef import nfc
 from xiaomi_ndef import tag
 from xiaomi_ndef.base import UInt8BytesMap, AppData
@@ -125,5 +128,48 @@ class XiaomiNfcTestCase(unittest.TestCase):
         self.assertEqual(len(self._TEST_PAYLOAD_HANDOFF.encode()), payload.appData.size())
 
 
+class DeviceAttributeTestCase(unittest.TestCase):
+    def test_parse(self) -> None:
+        self.assertEqual(tag.DeviceAttribute.MODEL, tag.DeviceAttribute.parse(18))
+        self.assertEqual(tag.DeviceAttribute.IOT_DEVICE_ID, tag.DeviceAttribute.parse_iot(6))
+        self.assertEqual(tag.DeviceAttribute.IOT_ENV_REGION, tag.DeviceAttribute.parse_iot_env(3))
+        self.assertEqual(tag.DeviceAttribute.UNKNOWN, tag.DeviceAttribute.parse(0xfff))
+        self.assertEqual(handoff.PayloadKey.EXT_ABILITY, handoff.PayloadKey.parse(121))
+
+    def test_all_attributes_maps(self) -> None:
+        app_data = tag.NfcTagDeviceRecord.encode_app_data_value_map(OrderedDict([tag.DeviceAttribute.MODEL.new_pair("model")]))
+        record = tag.NfcTagDeviceRecord(
+            device_type=tag.DeviceType.MI_SOUND_BOX,
+            flags=0,
+            device_number=0,
+            attributes_map=tag.NfcTagDeviceRecord.new_attributes_map([
+                tag.DeviceAttribute.BLUETOOTH_MAC_ADDRESS.new_pair(b"\x00" * 6),
+                tag.DeviceAttribute.APP_DATA.new_pair(app_data)
+            ])
+        )
+        full_map = record.get_all_attributes_map(tag.Action.AUTO, tag.XiaomiNdefTNF.MI_CONNECT_SERVICE)
+        self.assertEqual(b"model", full_map[tag.DeviceAttribute.MODEL])
+        batch = tag.NfcTagDeviceRecord.get_all_attributes_maps([record], tag.Action.AUTO, tag.XiaomiNdefTNF.MI_CONNECT_SERVICE)
+        self.assertNotIn(tag.DeviceAttribute.MODEL, batch[0])
+        self.assertEqual(app_data, batch[0][tag.DeviceAttribute.APP_DATA])
+        iot_map = record.get_all_attributes_map(tag.Action.IOT, tag.XiaomiNdefTNF.SMART_HOME)
+        self.assertEqual([tag.DeviceAttribute.IOT_DEVICE_MAC, tag.DeviceAttribute.IOT_APP_DATA], list(iot_map))
+
+
+class ProtobufBackendTestCase(unittest.TestCase):
+    def test_backend(self) -> None:
+        self.assertNotEqual(mi_connect.ProtobufBackend.UNKNOWN, mi_connect.get_protobuf_backend())
+
+    def test_require_fast_backend(self) -> None:
+        with mock.patch.object(mi_connect.api_implementation, "Type", return_value="python"):
+            self.assertEqual(mi_connect.ProtobufBackend.PYTHON, mi_connect.get_protobuf_backend())
+            with self.assertWarns(RuntimeWarning):
+                mi_connect.require_fast_protobuf_backend()
+            with self.assertRaises(RuntimeError):
+                mi_connect.require_fast_protobuf_backend(strict=True)
+        with mock.patch.object(mi_connect.api_implementation, "Type", return_value="upb"):
+            self.assertEqual(mi_connect.ProtobufBackend.UPB, mi_connect.require_fast_protobuf_backend(strict=True))
+
+
 if __name__ == "__main__":
     unittest.main()